@@ -1,3 +1,3 @@
 #!/bin/sh
 set -e
-gunicorn app:app -k gevent -w 1 -b 0.0.0.0:5000 --timeout 120
\ No newline at end of file
+python serve.py
\ No newline at end of file
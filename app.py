@@ -1,18 +1,30 @@
 from flask import Flask, render_template, request, session, redirect, url_for, jsonify
 import os
 import tempfile
-from flask_socketio import SocketIO, emit
+import time
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import atexit
 import logging
 from dotenv import load_dotenv
 import hmac
 
 # Load env before importing services that rely on it
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
-logging.basicConfig(level=logging.DEBUG)
 
+from service.logging_setup import configure_logging, shutdown_logging
+
+configure_logging()
+atexit.register(shutdown_logging)
+
+from handler.admin import create_admin_blueprint
 from handler.api import create_api_blueprint
-from service import model_service, session_service, game_service
+from handler.assets import init_assets
+from handler.compression import init_compression, render_template_cached
+from handler.timing import init_timing, timed
+from service.broadcast_service import broadcaster
+from service import model_service, session_service, game_service, telemetry_service, hub_monitor, job_service
 from service.constants import (
+    ADMIN_PATH_PREFIX,
     PROTECTED_PREFIXES,
     DEVICE_UNRESTRICTED_ENDPOINTS,
     UNRESTRICTED_ENDPOINTS,
@@ -20,6 +32,11 @@ from service.constants import (
     BEST_REFLEX_SESSION_KEY,
     CHARACTERISTIC_READY_SESSION_KEY,
     CHAT_DONE_SESSION_KEY,
+    DEFAULT_DEVICE_ID,
+    TELEMETRY_UDP_PORT,
+    SOCKETIO_MESSAGE_QUEUE,
+    SOCKETIO_WEBSOCKET_ONLY,
+    STUDENT_ID_SESSION_KEY,
 )
 
 
@@ -46,9 +63,59 @@ _bootstrap_google_credentials()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'secret!'
 app.config['ACCESS_KEY'] = os.environ.get('APP_ACCESS_KEY', 'enter-demo-key')  # change in production
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='gevent')
+app.config['ADMIN_KEY'] = os.environ.get('APP_ADMIN_KEY', '')  # empty disables /api/admin/
+def _socketio_queue_options(url):
+    """Message-queue kwargs for SocketIO.
+
+    ``redis://...`` (or any kombu URL) is used as is. ``filesystem://<dir>``
+    is a single-host stand-in that needs no broker: kombu's filesystem
+    transport exchanges messages through files under ``<dir>``.
+    """
+    if not url:
+        return {}
+    if not url.startswith('filesystem://'):
+        return {'message_queue': url}
+    import socketio as socketio_pkg
+
+    root = url[len('filesystem://'):] or 'socketio-queue'
+    folders = {name: os.path.join(root, name) for name in ('data', 'control', 'processed')}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+    transport_options = {
+        'data_folder_in': folders['data'],
+        'data_folder_out': folders['data'],
+        'control_folder': folders['control'],
+        'processed_folder': folders['processed'],
+        'store_processed': False,
+    }
+    return {
+        'client_manager': socketio_pkg.KombuManager(
+            'filesystem://',
+            connection_options={'transport_options': transport_options},
+        )
+    }
+
+# With several workers every emit goes through the message queue so it
+# reaches clients connected to any worker.
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    async_mode='gevent',
+    **_socketio_queue_options(SOCKETIO_MESSAGE_QUEUE),
+)
+broadcaster.init_app(socketio)
+job_service.init_app(socketio)
+
+@app.context_processor
+def inject_socketio_options():
+    # Long-polling needs sticky sessions across workers; websocket does not.
+    return {'socketio_transports': ['websocket'] if SOCKETIO_WEBSOCKET_ONLY else ['polling', 'websocket']}
 
+init_timing(app)
 app.register_blueprint(create_api_blueprint(socketio))
+app.register_blueprint(create_admin_blueprint())
+init_assets(app)
+init_compression(app)
 
 def has_access():
     return session.get('access_granted') is True
@@ -59,7 +126,7 @@ def enforce_access():
         return
     if request.endpoint in UNRESTRICTED_ENDPOINTS:
         return
-    if request.path in DEVICE_UNRESTRICTED_ENDPOINTS:
+    if request.path in DEVICE_UNRESTRICTED_ENDPOINTS or request.path.startswith(ADMIN_PATH_PREFIX):
         return
     if has_access():
         return
@@ -72,12 +139,11 @@ def enforce_access():
 def block_home_during_tests():
     if request.endpoint in UNRESTRICTED_ENDPOINTS or request.endpoint is None:
         return
-    if session.get('tests_in_progress') and not session.get('tests_completed'):
-        if request.endpoint == 'home':
-            if request.args.get('abandon') == '1':
-                session_service.reset_session_state()
-                return
-            return redirect(url_for('test_page'))
+    if request.endpoint == 'home' and session.get('tests_in_progress') and not session_service.tests_completed():
+        if request.args.get('abandon') == '1':
+            session_service.reset_session_state()
+            return
+        return redirect(url_for('test_page'))
 
 @app.route('/access', methods=['GET', 'POST'])
 def access_gate():
@@ -95,18 +161,21 @@ def access_gate():
 @app.route('/home')
 def home():
     session_service.reset_session_state()
-    model_service.ensure_model()
+    with timed('model'):
+        model_service.ensure_model()
     acc_val = round(model_service.get_accuracy() * 100, 2) if model_service.get_accuracy() else 0
-    return render_template('index.html', accuracy=acc_val)
+    return render_template_cached('index.html', accuracy=acc_val)
 
 @app.route('/test')
 def test_page():
-    model_service.ensure_model()
+    with timed('model'):
+        model_service.ensure_model()
     acc_val = round(model_service.get_accuracy() * 100, 2) if model_service.get_accuracy() else 0
     session['tests_in_progress'] = True
     session['tests_completed'] = False
+    session['tests_started_at'] = time.time()
     student_info = session.get('student_info')
-    return render_template(
+    return render_template_cached(
         'tests.html',
         accuracy=acc_val,
         student_info=student_info,
@@ -119,10 +188,11 @@ def test_page():
 
 @app.route('/result')
 def result_page():
-    model_service.ensure_model()
+    with timed('model'):
+        model_service.ensure_model()
     acc_val = round(model_service.get_accuracy() * 100, 2) if model_service.get_accuracy() else 0
     student_info = session.get('student_info')
-    return render_template(
+    return render_template_cached(
         'result.html',
         accuracy=acc_val,
         student_info=student_info,
@@ -131,12 +201,61 @@ def result_page():
 # ===== SOCKET.IO EVENTS (Web Client) =====
 @socketio.on('connect')
 def handle_connect():
-    print('Web Client connected')
-    emit('game_update', game_service.get_current_game_state())
+    app.logger.debug("Web client connected", extra={"component": "socketio"})
+    student_id = session.get(STUDENT_ID_SESSION_KEY)
+    if student_id:
+        # Background report upgrades are pushed to this room.
+        join_room(session_service.student_room(student_id))
+
+@socketio.on('pair_device')
+def handle_pair_device(data):
+    device_id = str((data or {}).get('device_id') or DEFAULT_DEVICE_ID)
+    previous = session.get('paired_device')
+    if previous and previous != device_id:
+        leave_room(game_service.device_room(previous))
+    session['paired_device'] = device_id
+    join_room(game_service.device_room(device_id))
+    emit('game_update', broadcaster.full_state(device_id))
+    emit('device_presence', {
+        'device_id': device_id,
+        'online': game_service.is_device_online(device_id),
+    })
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Web Client disconnected')
+    app.logger.debug("Web client disconnected", extra={"component": "socketio"})
+
+def _announce_device_update(device_id, event):
+    broadcaster.publish(device_id, immediate=event != 'update')
+
+def _announce_presence(device_id, online):
+    socketio.emit(
+        'device_presence',
+        {'device_id': device_id, 'online': online},
+        to=game_service.device_room(device_id),
+    )
+
+def _run_presence_timer():
+    while True:
+        socketio.sleep(1)
+        game_service.expire_presence()
+
+def start_background_services():
+    hub_monitor.start_monitor()
+    game_service.set_presence_listener(_announce_presence)
+    socketio.start_background_task(_run_presence_timer)
+    broadcaster.start()
+    if TELEMETRY_UDP_PORT:
+        telemetry_service.start_listener(TELEMETRY_UDP_PORT, _announce_device_update)
+
+# The debug reloader's parent process never serves requests; only start
+# listeners in the process that does. gunicorn.conf.py defers them to
+# post_worker_init so they are not started in the preloading master.
+# Spawned render processes re-import this script as __mp_main__.
+if os.environ.get('APP_DEFER_BACKGROUND_SERVICES') == '1' or __name__ == '__mp_main__':
+    pass
+elif __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_background_services()
 
 if __name__ == '__main__':
     model_service.train_model()
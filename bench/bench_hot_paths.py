@@ -0,0 +1,96 @@
+"""Microbenchmarks for per-request / per-turn pure-Python code paths.
+
+Not collected by a plain ``pytest`` run (the file is not named test_*);
+pass it explicitly. Needs ``pip install -r requirements-bench.txt``.
+
+    # record a baseline on this machine
+    python -m pytest bench/bench_hot_paths.py --benchmark-save=baseline
+    # later: compare and fail on >15% median regressions
+    python -m pytest bench/bench_hot_paths.py --benchmark-compare=0001 \\
+        --benchmark-compare-fail=median:15%
+
+Results are stored under .benchmarks/ (one directory per machine/python);
+compare only against baselines recorded on the same host.
+"""
+import itertools
+
+import pytest
+
+
+def test_model_predict(benchmark, trained_model):
+    benchmark(trained_model.predict_group, 42.5, 3, 21)
+
+
+def test_model_predict_with_features(benchmark, trained_model):
+    features = {'error_rate': 0.07, 'gap_mean': 4.1, 'gap_variance': 2.3, 'longest_clean': 12.5, 'burst_count': 1}
+    benchmark(trained_model.predict_group, 42.5, 3, 21, features)
+
+
+def test_is_chat_done_long_reply(benchmark, counselor, long_reply):
+    assert benchmark(counselor.is_chat_done, long_reply) is False
+
+
+def test_is_characteristic_ready_long_reply(benchmark, counselor, long_reply):
+    benchmark(counselor.is_characteristic_ready, long_reply)
+
+
+def test_chat_done_history_scan(benchmark, counselor, long_chat_history):
+    # /chat re-scans every assistant turn until one is marked done.
+    def scan():
+        return any(
+            counselor.is_chat_done(entry['text'])
+            for entry in long_chat_history
+            if entry['role'] == 'assistant'
+        )
+
+    assert benchmark(scan) is False
+
+
+def test_build_career_prompt(benchmark, counselor, student_profile, long_chat_history):
+    prompt = benchmark(
+        counselor._build_career_prompt,
+        student_profile=student_profile,
+        chat_history=long_chat_history,
+    )
+    assert prompt.startswith('Học sinh:')
+
+
+def test_build_test_context(benchmark, counselor):
+    assert 'PeerRank' in benchmark(counselor._build_test_context, 'bench')
+
+
+def test_extract_majors_from_large_summary(benchmark, counselor, large_summary):
+    assert len(benchmark(counselor._extract_majors_from_summary, large_summary)) == 40
+
+
+def test_parse_report_response(benchmark, counselor, report_text):
+    assert benchmark(counselor._parse_report_response, report_text)['class'] == '11A2'
+
+
+def test_game_state_update(benchmark):
+    from service import game_service
+
+    seq = itertools.count(10)
+    game_service.mark_game_start('bench01', 1)
+
+    def update():
+        value = next(seq)
+        return game_service.update_game_state(value / 5, value // 40, 'bench01', value)
+
+    assert benchmark(update)
+
+
+def test_device_snapshot(benchmark):
+    from service import game_service
+
+    game_service.mark_game_start('bench02', 1)
+    game_service.update_game_state(12.4, 2, 'bench02', 2)
+    benchmark(game_service.get_current_game_state, 'bench02')
+
+
+@pytest.mark.parametrize('path', ['/api/final_report', '/api/game_event', '/test'])
+def test_enforce_access(benchmark, flask_app, path):
+    from app import enforce_access
+
+    with flask_app.test_request_context(path):
+        benchmark(enforce_access)
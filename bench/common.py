@@ -0,0 +1,18 @@
+"""Helpers shared by the benchmark scripts."""
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(values_ms):
+    values_ms = sorted(values_ms)
+    return {
+        'count': len(values_ms),
+        'p50_ms': round(percentile(values_ms, 0.50), 2),
+        'p95_ms': round(percentile(values_ms, 0.95), 2),
+        'p99_ms': round(percentile(values_ms, 0.99), 2),
+    }
@@ -0,0 +1,125 @@
+"""Fixtures for the pytest-benchmark suite (bench/bench_hot_paths.py).
+
+The environment is pinned before any app module is imported so benchmarks
+never touch the real journal, results database, UDP port or a hosted model.
+"""
+import os
+import random
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='wl-bench-')
+os.environ.update({
+    'JOURNAL_DIR': os.path.join(_scratch, 'journal'),
+    'RESULTS_DB_PATH': os.path.join(_scratch, 'results.db'),
+    'CAREER_SESSION_BACKEND': 'memory',
+    'CAREER_AGENT_MODEL': 'stub',
+    'TELEMETRY_UDP_PORT': '0',
+    'APP_DEFER_BACKGROUND_SERVICES': '1',
+    'LOG_LEVEL': 'WARNING',
+})
+
+import json  # noqa: E402
+
+import pytest  # noqa: E402
+
+_RNG_SEED = 1234
+
+_STUDENT_LINES = [
+    "Mình thích làm việc nhóm nhưng thường là người lên kế hoạch trước khi bắt đầu.",
+    "Khi gặp áp lực mình vẫn giữ bình tĩnh và tìm cách giải quyết từng bước một.",
+    "Mình hay để ý đến chi tiết nhỏ, đôi khi hơi cầu toàn với bài tập của bản thân.",
+    "Trong lớp mình thường là người đưa ra ý tưởng mới cho các hoạt động ngoại khóa.",
+    "Mình không thích tranh luận gay gắt, mình muốn mọi người đều cảm thấy thoải mái.",
+]
+_ASSISTANT_LINES = [
+    "Cảm ơn bạn đã chia sẻ! Câu hỏi tiếp theo: khi nhóm bất đồng ý kiến, bạn thường làm gì?",
+    "Điều đó cho thấy bạn khá cẩn thận. Bạn có thích những công việc cần sự chính xác cao không?",
+    "Mình hiểu rồi. Nếu được chọn một vai trò trong dự án, bạn sẽ chọn vai trò nào và vì sao?",
+    "Rất thú vị! Bạn cảm thấy thế nào khi phải đưa ra quyết định nhanh trong thời gian ngắn?",
+]
+
+
+@pytest.fixture(scope='session')
+def rng():
+    return random.Random(_RNG_SEED)
+
+
+@pytest.fixture(scope='session')
+def long_chat_history(rng):
+    """80 turns of Vietnamese chat, about the longest a DISC session gets."""
+    history = []
+    for _ in range(40):
+        history.append({'role': 'user', 'text': ' '.join(rng.sample(_STUDENT_LINES, 3))})
+        history.append({'role': 'assistant', 'text': ' '.join(rng.sample(_ASSISTANT_LINES, 2))})
+    return history
+
+
+@pytest.fixture(scope='session')
+def long_reply(long_chat_history):
+    # A final assistant turn that does not contain the "Kết luận cuối" marker,
+    # so is_chat_done scans the whole text.
+    return '\n'.join(entry['text'] for entry in long_chat_history[-20:])
+
+
+@pytest.fixture(scope='session')
+def large_summary(rng):
+    """Career summary with a long narrative and a 40-item major list."""
+    narrative = '\n'.join(
+        f"**Điểm nổi bật tính cách {index}:** " + ' '.join(rng.sample(_STUDENT_LINES, 4))
+        for index in range(30)
+    )
+    majors = '\n'.join(f"- Ngành kỹ thuật số {index}: Cơ điện tử, Tự động hóa" for index in range(40))
+    return f"{narrative}\n**Ngành học phù hợp:**\n{majors}\n**Trường gợi ý:**\n- Đại học Bách khoa"
+
+
+@pytest.fixture(scope='session')
+def report_text():
+    report = {
+        'name': 'Nguyễn Văn An',
+        'class': '11A2',
+        'fit_job': 'Kỹ thuật phần mềm, Cơ điện tử, Tự động hóa, Thiết kế vi mạch',
+        'explanation': ' '.join(_STUDENT_LINES * 12),
+    }
+    return '```json\n' + json.dumps(report, ensure_ascii=False, indent=2) + '\n```'
+
+
+@pytest.fixture(scope='session')
+def student_profile():
+    return {'full_name': 'Nguyễn Văn An', 'grade': '11', 'class_name': '11A2'}
+
+
+@pytest.fixture(scope='session')
+def counselor():
+    """CareerCounselorService without agents or Vertex init; the benchmarked methods are pure."""
+    from collections import OrderedDict
+
+    from career_counselor_chat.service import CareerCounselorService
+
+    service = CareerCounselorService.__new__(CareerCounselorService)
+    service._app_name = 'agents'
+    service._test_metrics = OrderedDict()
+    service.update_test_metrics(
+        user_id='bench',
+        ingenuous={'time': 42.5, 'mistake': 3},
+        reflex={'time': 10.0, 'quantity': 21},
+        ranks={
+            'grade': {'name': '11', 'count': 480, 'wire_time': 63.0, 'wire_errors': 55.0, 'reflex_quantity': 71.0},
+            'class': {'name': '11A2', 'count': 42, 'wire_time': 58.0, 'wire_errors': 49.0, 'reflex_quantity': 66.0},
+        },
+    )
+    return service
+
+
+@pytest.fixture(scope='session')
+def trained_model():
+    from service import model_service
+
+    model_service.train_model()
+    return model_service
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    from app import app
+
+    return app
@@ -0,0 +1,306 @@
+"""Classroom-scale load test: virtual students and ESP32 stations.
+
+Start the server with the stub model so no hosted LLM is called:
+
+    CAREER_AGENT_MODEL=stub CAREER_STUB_LATENCY_MS=800 python serve.py
+    python -m bench.loadtest --url http://localhost:5000 --students 10,20,40,80 --devices 20
+
+Each virtual student repeats the full flow until the stage ends: access
+gate, GET /test, /api/student_info, Socket.IO ``pair_device`` (staying
+subscribed to ``game_update``), ``--chat-turns`` /chat turns,
+/api/reflex_result and /api/final_report (polling its job until done). Alongside, ``--devices`` virtual
+stations POST /api/game_event at ``--rate`` Hz in start/update.../finish
+cycles; students pair with station ``i % devices``.
+
+Stages run with increasing student counts. For each stage the report gives
+p50/p95/p99 per route, error counts, and Socket.IO delivery lag (station
+send to browser receipt, matched on (device_id, time)). The saturation point
+is the first stage where a route's p95 exceeds ``--slo-ms``, the error rate
+exceeds ``--max-error-rate`` or the lag p95 exceeds ``--lag-slo-ms``.
+
+Needs ``pip install -r requirements-bench.txt``. HTTP stations assume one
+worker (or sticky routing); see docs/production.md.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urljoin
+
+from bench.common import latency_summary
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lags = []
+        self.sent_at = {}
+
+    def record(self, route, started, ok):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.latencies[route].append(elapsed_ms)
+            if not ok:
+                self.errors[route] += 1
+
+    def mark_sent(self, device_id, time_val):
+        with self._lock:
+            self.sent_at[(device_id, time_val)] = time.perf_counter()
+
+    def mark_received(self, payload):
+        now = time.perf_counter()
+        key = (payload.get('device_id'), payload.get('time'))
+        with self._lock:
+            sent = self.sent_at.get(key)
+            if sent is not None:
+                self.lags.append((now - sent) * 1000)
+
+    def summary(self):
+        with self._lock:
+            routes = {
+                route: {**latency_summary(values), 'errors': self.errors[route]}
+                for route, values in sorted(self.latencies.items())
+            }
+            lag = latency_summary(self.lags)
+        return {'routes': routes, 'socketio_lag': lag}
+
+
+def _timed(recorder, route, call):
+    started = time.perf_counter()
+    try:
+        response = call()
+    except Exception:
+        recorder.record(route, started, False)
+        return None
+    recorder.record(route, started, response.status_code < 400)
+    return response
+
+
+def _await_job(recorder, route, http, base_url, response, timeout=180.0):
+    """Record a 202 job's time from submission to completion under ``route``."""
+    if response is None or response.status_code != 202:
+        return
+    started = time.perf_counter()
+    status_url = urljoin(base_url + '/', response.headers['Location'])
+    while time.perf_counter() - started < timeout:
+        time.sleep(0.5)
+        try:
+            status = http.get(status_url, timeout=10).json().get('status')
+        except Exception:
+            break
+        if status not in ('queued', 'running'):
+            recorder.record(route, started, status == 'done')
+            return
+    recorder.record(route, started, False)
+
+
+class VirtualStation(threading.Thread):
+    def __init__(self, url, device_id, rate, run_seconds, recorder, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.device_id = device_id
+        self.rate = rate
+        self.run_seconds = run_seconds
+        self.recorder = recorder
+        self.stop_event = stop
+        self.seq = int(time.time() * 10)
+
+    def _post(self, http, event, time_val=0.0, errors=0):
+        self.seq += 1
+        body = {'event': event, 'device_id': self.device_id, 'seq': self.seq, 'time': time_val, 'errors': errors}
+        _timed(self.recorder, f'POST /api/game_event {event}',
+               lambda: http.post(f'{self.url}/api/game_event', json=body, timeout=10))
+
+    def run(self):
+        import requests
+
+        http = requests.Session()
+        while not self.stop_event.is_set():
+            self._post(http, 'start')
+            started = time.monotonic()
+            errors = 0
+            tick = 0
+            while not self.stop_event.is_set() and time.monotonic() - started < self.run_seconds:
+                tick += 1
+                time_val = round(tick / self.rate, 2)
+                if random.random() < 0.05:
+                    errors += 1
+                self.recorder.mark_sent(self.device_id, time_val)
+                self._post(http, 'update', time_val, errors)
+                self.stop_event.wait(max(0.0, started + tick / self.rate - time.monotonic()))
+            self._post(http, 'finish', round(time.monotonic() - started, 2), errors)
+            self.stop_event.wait(1.0)
+
+
+class VirtualStudent(threading.Thread):
+    def __init__(self, url, index, device_id, access_key, chat_turns, recorder, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.index = index
+        self.device_id = device_id
+        self.access_key = access_key
+        self.chat_turns = chat_turns
+        self.recorder = recorder
+        self.stop_event = stop
+        self.flows = 0
+
+    def _connect_socket(self):
+        import socketio
+
+        client = socketio.Client(reconnection=False)
+        client.on('game_update', self.recorder.mark_received)
+        started = time.perf_counter()
+        try:
+            client.connect(self.url, transports=['websocket'], wait_timeout=10)
+            client.emit('pair_device', {'device_id': self.device_id})
+        except Exception:
+            self.recorder.record('socketio connect', started, False)
+            return None
+        self.recorder.record('socketio connect', started, True)
+        return client
+
+    def flow(self):
+        import requests
+
+        http = requests.Session()
+        record = self.recorder
+        _timed(record, 'POST /access', lambda: http.post(
+            f'{self.url}/access', data={'access_key': self.access_key}, allow_redirects=False, timeout=10))
+        _timed(record, 'GET /test', lambda: http.get(f'{self.url}/test', timeout=10))
+        student = {'full_name': f'Load Student {self.index}', 'grade': '11', 'class_name': f'11A{self.index % 8}'}
+        _timed(record, 'POST /api/student_info', lambda: http.post(
+            f'{self.url}/api/student_info', json=student, timeout=10))
+        client = self._connect_socket()
+        try:
+            for turn in range(self.chat_turns):
+                if self.stop_event.is_set():
+                    return
+                _timed(record, 'POST /chat', lambda: http.post(
+                    f'{self.url}/chat', json={'message': f'Câu trả lời số {turn + 1}'}, timeout=120))
+            reflex = {'time': 10, 'quantity': random.randint(5, 30)}
+            _timed(record, 'POST /api/reflex_result', lambda: http.post(
+                f'{self.url}/api/reflex_result', json=reflex, timeout=10))
+            body = {
+                'student_info': student,
+                'best_step1': {'time': round(random.uniform(10, 60), 2), 'errors': random.randint(0, 10)},
+                'best_reflex': reflex,
+            }
+            response = _timed(record, 'POST /api/final_report', lambda: http.post(
+                f'{self.url}/api/final_report', json=body, timeout=180))
+            _await_job(record, 'job final_report', http, self.url, response)
+            self.flows += 1
+        finally:
+            if client is not None:
+                client.disconnect()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.flow()
+
+
+def run_stage(args, students):
+    recorder = Recorder()
+    stop = threading.Event()
+    device_ids = [f'lt{index:03d}'[:8] for index in range(args.devices)]
+    stations = [
+        VirtualStation(args.url, device_id, args.rate, args.run_seconds, recorder, stop)
+        for device_id in device_ids
+    ]
+    for station in stations:
+        station.start()
+    workers = []
+    ramp_gap = args.ramp / students if students else 0
+    for index in range(students):
+        device_id = device_ids[index % len(device_ids)] if device_ids else 'default'
+        worker = VirtualStudent(args.url, index, device_id, args.access_key, args.chat_turns, recorder, stop)
+        worker.start()
+        workers.append(worker)
+        time.sleep(ramp_gap)
+    stop.wait(args.stage_seconds)
+    stop.set()
+    for thread in stations + workers:
+        thread.join(timeout=200)
+    summary = recorder.summary()
+    summary['students'] = students
+    summary['devices'] = args.devices
+    summary['completed_flows'] = sum(worker.flows for worker in workers)
+    return summary
+
+
+def evaluate(summary, args):
+    """Reasons the stage breaks the SLOs (empty list = sustained)."""
+    reasons = []
+    total = sum(route['count'] for route in summary['routes'].values())
+    errors = sum(route['errors'] for route in summary['routes'].values())
+    if total and errors / total > args.max_error_rate:
+        reasons.append(f'error rate {errors / total:.1%}')
+    for name, route in summary['routes'].items():
+        # LLM-backed routes are bounded by the stub latency; judge them against their own budget.
+        slo = args.llm_slo_ms if name in ('POST /chat', 'POST /api/final_report', 'job final_report') else args.slo_ms
+        if route['p95_ms'] > slo:
+            reasons.append(f'{name} p95 {route["p95_ms"]:.0f} ms')
+    if summary['socketio_lag']['count'] and summary['socketio_lag']['p95_ms'] > args.lag_slo_ms:
+        reasons.append(f'socket.io lag p95 {summary["socketio_lag"]["p95_ms"]:.0f} ms')
+    return reasons
+
+
+def print_stage(summary, reasons):
+    print(f"\n== {summary['students']} students, {summary['devices']} stations "
+          f"({summary['completed_flows']} flows completed) ==")
+    print(f"{'route':40} {'count':>7} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, route in summary['routes'].items():
+        print(f"{name:40} {route['count']:>7} {route['errors']:>5} "
+              f"{route['p50_ms']:>8.1f} {route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f}")
+    lag = summary['socketio_lag']
+    print(f"{'socket.io game_update lag':40} {lag['count']:>7} {'':>5} "
+          f"{lag['p50_ms']:>8.1f} {lag['p95_ms']:>8.1f} {lag['p99_ms']:>8.1f}")
+    print('SATURATED: ' + '; '.join(reasons) if reasons else 'within SLO')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--access-key', default='enter-demo-key')
+    parser.add_argument('--students', default='10,20,40,80', help='comma-separated student counts, one stage each')
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=5.0, help='station updates per second')
+    parser.add_argument('--run-seconds', type=float, default=20.0, help='length of one station run')
+    parser.add_argument('--chat-turns', type=int, default=4)
+    parser.add_argument('--stage-seconds', type=float, default=60.0)
+    parser.add_argument('--ramp', type=float, default=10.0, help='seconds to start all students of a stage')
+    parser.add_argument('--slo-ms', type=float, default=500.0, help='p95 budget for non-LLM routes')
+    parser.add_argument('--llm-slo-ms', type=float, default=5000.0, help='p95 budget for /chat and final_report')
+    parser.add_argument('--lag-slo-ms', type=float, default=1000.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--keep-going', action='store_true', help='run all stages even after saturation')
+    parser.add_argument('--json', help='write all stage summaries to this file')
+    args = parser.parse_args(argv)
+
+    stages = []
+    saturation = None
+    for students in [int(value) for value in args.students.split(',') if value.strip()]:
+        summary = run_stage(args, students)
+        reasons = evaluate(summary, args)
+        summary['slo_violations'] = reasons
+        stages.append(summary)
+        print_stage(summary, reasons)
+        if reasons and saturation is None:
+            saturation = students
+            if not args.keep_going:
+                break
+
+    sustained = [stage['students'] for stage in stages if not stage['slo_violations']]
+    print()
+    print(f"highest sustained load: {max(sustained) if sustained else 'none'} students; "
+          f"saturation: {saturation if saturation is not None else 'not reached'}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump({'stages': stages, 'saturation_students': saturation}, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Memory soak test: thousands of simulated conversations in one process.
+
+    python -m bench.soak_memory --conversations 3000 --max-growth-mb 8
+
+Drives the Flask app in-process with its test client and the stub model, so
+no server, network or hosted LLM is involved. Each conversation uses a fresh
+cookie jar and runs the access gate, /test, /api/student_info, ``--chat-turns``
+/chat turns, /api/reflex_result and /api/final_report, then polls the
+report job until it finishes.
+
+Memory is sampled after a full ``gc.collect()`` every ``--sample-every``
+conversations: tracemalloc's traced bytes (the Python heap) and RSS. The
+baseline is taken after ``--warmup`` conversations, once caches, the model
+and the stub agent are warm. The run fails (exit status 1) when traced or
+RSS growth after the baseline exceeds its bound. Peer-rank statistics
+(stats_service) keep one value per student and metric by design, so the
+bounds leave room for that linear term.
+Sessions use the in-memory ADK backend, the unbounded worst case, unless
+``--session-backend`` says otherwise.
+
+Needs the app's requirements; tracemalloc roughly halves throughput.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+MB = 1024 * 1024
+
+
+def _configure_env(args):
+    scratch = tempfile.mkdtemp(prefix='wl-soak-')
+    os.environ.update({
+        'JOURNAL_DIR': os.path.join(scratch, 'journal'),
+        'RESULTS_DB_PATH': os.path.join(scratch, 'results.db'),
+        'CAREER_SESSION_BACKEND': args.session_backend,
+        'CAREER_SESSION_DB_PATH': os.path.join(scratch, 'career_sessions.db'),
+        'CAREER_AGENT_MODEL': 'stub',
+        'CAREER_STUB_LATENCY_MS': '0',
+        'TELEMETRY_UDP_PORT': '0',
+        'APP_DEFER_BACKGROUND_SERVICES': '1',
+        'APP_ACCESS_KEY': 'soak-key',
+        'LOG_LEVEL': 'WARNING',
+    })
+
+
+def wait_for_job(client, socketio, response, timeout=30.0):
+    """True once a 202 job finished successfully; yields so the job worker runs."""
+    if response.status_code != 202:
+        return response.status_code < 400
+    status_url = response.headers['Location']
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        socketio.sleep(0.01)
+        response = client.get(status_url)
+        status = response.get_json().get('status') if response.status_code == 200 else None
+        if status not in ('queued', 'running'):
+            return status == 'done'
+    return False
+
+
+def run_conversation(app, socketio, index, chat_turns):
+    client = app.test_client()
+    student = {'full_name': f'Soak Student {index}', 'grade': '11', 'class_name': f'11A{index % 8}'}
+    reflex = {'time': 10, 'quantity': 5 + index % 25}
+    responses = [
+        client.post('/access', data={'access_key': 'soak-key'}),
+        client.get('/test'),
+        client.post('/api/student_info', json=student),
+    ]
+    for turn in range(chat_turns):
+        responses.append(client.post('/chat', json={'message': f'Câu trả lời số {turn + 1} của học sinh {index}'}))
+    responses.append(client.post('/api/reflex_result', json=reflex))
+    report_ok = wait_for_job(client, socketio, client.post('/api/final_report', json={
+        'student_info': student,
+        'best_step1': {'time': 20 + index % 40, 'errors': index % 7},
+        'best_reflex': reflex,
+    }))
+    return sum(1 for response in responses if response.status_code >= 400) + (not report_ok)
+
+
+def sample(memory_service):
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    traced, _peak = tracemalloc.get_traced_memory()
+    return traced, memory_service.process_memory().get('rss_bytes') or 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=3000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--sample-every', type=int, default=250)
+    parser.add_argument('--chat-turns', type=int, default=5)
+    parser.add_argument('--session-backend', default='memory', choices=('memory', 'sqlite'))
+    parser.add_argument('--max-growth-mb', type=float, default=8.0, help='traced heap growth bound')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=32.0)
+    args = parser.parse_args(argv)
+
+    _configure_env(args)
+    import tracemalloc
+
+    tracemalloc.start()
+    from app import app, socketio
+    from career_counselor_chat.service import career_service
+    from service import memory_service, model_service
+
+    model_service.train_model()
+    errors = 0
+    baseline = None
+    started = time.monotonic()
+    print(f"{'conversations':>13} {'traced MB':>10} {'rss MB':>8} {'errors':>7} {'conv/s':>7}")
+    for index in range(1, args.conversations + 1):
+        errors += run_conversation(app, socketio, index, args.chat_turns)
+        if index == args.warmup:
+            baseline = sample(memory_service)
+        if index % args.sample_every == 0 or index == args.conversations:
+            traced, rss = sample(memory_service)
+            rate = index / (time.monotonic() - started)
+            print(f"{index:>13} {traced / MB:>10.2f} {rss / MB:>8.1f} {errors:>7} {rate:>7.1f}")
+
+    traced, rss = sample(memory_service)
+    print('career_service:', career_service.memory_stats())
+    if baseline is None:
+        print('fewer conversations than --warmup; nothing to compare')
+        return 1
+    traced_growth = (traced - baseline[0]) / MB
+    rss_growth = (rss - baseline[1]) / MB
+    print(f"after warmup: traced +{traced_growth:.2f} MB (bound {args.max_growth_mb}), "
+          f"rss +{rss_growth:.1f} MB (bound {args.max_rss_growth_mb}), errors {errors}")
+    failed = traced_growth > args.max_growth_mb or rss_growth > args.max_rss_growth_mb or errors
+    if failed:
+        for stat in memory_service.tracemalloc_report(top=10)['top']:
+            print(f"  {stat['size_bytes'] / 1024:>10.1f} KiB  {stat['count']:>8}  {stat['location']}")
+    print('FAIL' if failed else 'PASS')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
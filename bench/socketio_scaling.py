@@ -0,0 +1,189 @@
+"""Throughput and cross-worker fan-out benchmark for the production server.
+
+Usage (server started with ``python serve.py``; see docs/production.md):
+    python -m bench.socketio_scaling --url http://localhost:5000 --duration 20
+    python -m bench.socketio_scaling --skip-http --clients 200 --devices 20
+
+Two phases:
+
+* http: ``--connections`` keep-alive connections POST /api/game_event as
+  fast as the server answers; reports requests/s and latency percentiles.
+* fanout: ``--clients`` Socket.IO clients (websocket only) pair with
+  ``--devices`` stations, which send UDP update frames at ``--rate`` Hz.
+  Clients land on arbitrary workers while only the UDP-owning worker sees
+  the frames, so every delivered game_update crossed the message queue
+  unless there is a single worker. Reports frames delivered per client and
+  send-to-receive lag.
+
+Needs ``pip install -r requirements-bench.txt``. Run the client on another
+machine (or pin it to separate cores) when measuring many workers so the
+client is not the bottleneck.
+"""
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from bench.common import latency_summary
+from service import telemetry_service
+
+
+def run_http_phase(url, connections, duration, devices):
+    parsed = urlparse(url)
+    deadline = time.monotonic() + duration
+    latencies = [[] for _ in range(connections)]
+    errors = [0] * connections
+
+    def worker(index):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+        device_id = f"hb{index % devices:02d}"
+        seq = int(time.time())
+        samples = latencies[index]
+        while time.monotonic() < deadline:
+            seq += 1
+            body = json.dumps({
+                'event': 'update',
+                'device_id': device_id,
+                'seq': seq,
+                'time': round(seq % 600 / 10, 1),
+                'errors': 0,
+            })
+            started = time.perf_counter()
+            try:
+                conn.request('POST', '/api/game_event', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors[index] += 1
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+                continue
+            samples.append((time.perf_counter() - started) * 1000)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(connections)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    all_latencies = [value for samples in latencies for value in samples]
+    return {
+        'requests': len(all_latencies),
+        'errors': sum(errors),
+        'requests_per_s': round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+        **latency_summary(all_latencies),
+    }
+
+
+def run_fanout_phase(url, udp_port, clients, devices, rate, duration):
+    import socketio
+
+    device_ids = [f"fo{index:02d}" for index in range(devices)]
+    # (device_id, time value) -> send timestamp; time values are unique per device.
+    sent_at = {}
+    lags = []
+    received = [0] * clients
+    lock = threading.Lock()
+    sio_clients = []
+
+    def make_client(index):
+        client = socketio.Client(reconnection=False)
+        device_id = device_ids[index % devices]
+
+        @client.on('connect')
+        def on_connect():
+            client.emit('pair_device', {'device_id': device_id})
+
+        @client.on('game_update')
+        def on_update(payload):
+            now = time.perf_counter()
+            with lock:
+                received[index] += 1
+                sent = sent_at.get((payload.get('device_id'), payload.get('time')))
+                if sent is not None:
+                    lags.append((now - sent) * 1000)
+
+        client.connect(url, transports=['websocket'])
+        return client
+
+    for index in range(clients):
+        sio_clients.append(make_client(index))
+    time.sleep(1.0)  # let pairing snapshots arrive before counting
+    with lock:
+        received[:] = [0] * clients
+
+    addr = (urlparse(url).hostname, udp_port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    seq_base = int(time.time())
+    frames_sent = 0
+    for device_id in device_ids:
+        sock.sendto(telemetry_service.encode_frames(
+            [telemetry_service.Frame('start', device_id, seq_base, 0.0, 0)]), addr)
+    started = time.monotonic()
+    tick = 0
+    while time.monotonic() - started < duration:
+        tick += 1
+        time_val = round(tick / rate, 3)
+        now = time.perf_counter()
+        frames = [
+            telemetry_service.Frame('update', device_id, seq_base + tick, time_val, 0)
+            for device_id in device_ids
+        ]
+        with lock:
+            for device_id in device_ids:
+                sent_at[(device_id, time_val)] = now
+        sock.sendto(telemetry_service.encode_frames(frames), addr)
+        frames_sent += len(frames)
+        next_tick = started + tick / rate
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    time.sleep(1.0)  # drain the last broadcast frame
+    sock.close()
+    for client in sio_clients:
+        client.disconnect()
+
+    elapsed = time.monotonic() - started
+    with lock:
+        delivered = sum(received)
+        starved = sum(1 for count in received if count == 0)
+        lag_summary = latency_summary(lags)
+    return {
+        'frames_sent': frames_sent,
+        'updates_delivered': delivered,
+        'updates_per_client_per_s': round(delivered / clients / elapsed, 2) if clients and elapsed else 0.0,
+        'clients_without_updates': starved,
+        **{f"lag_{key}": value for key, value in lag_summary.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--udp-port', type=int, default=5005)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per phase')
+    parser.add_argument('--connections', type=int, default=64, help='http phase keep-alive connections')
+    parser.add_argument('--clients', type=int, default=100, help='fanout phase Socket.IO clients')
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=5.0, help='fanout phase updates per device per second')
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--skip-fanout', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.skip_http:
+        results['http'] = run_http_phase(args.url, args.connections, args.duration, args.devices)
+    if not args.skip_fanout:
+        results['fanout'] = run_fanout_phase(
+            args.url, args.udp_port, args.clients, args.devices, args.rate, args.duration
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
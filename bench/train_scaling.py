@@ -0,0 +1,189 @@
+"""Training and prediction cost of ``model_service`` as the dataset grows.
+
+Usage:
+    python -m bench.train_scaling
+    python -m bench.train_scaling --rows 10000 100000 1000000 10000000 --json scaling.json
+
+For every row count, a synthetic dataset (``tools.synth_dataset``) is written
+once as a CSV and as a training store. Then each variant is measured in
+fresh processes, so peak RSS belongs to that variant alone:
+
+* ``csv``: the CSV path of ``model_service.train_model``, pandas
+  ``read_csv`` plus a fully grown ``DecisionTreeClassifier``.
+* ``store``: the same tree trained from the memory-mapped training store.
+* ``store-capped``: the store with ``max_depth=--capped-depth`` and
+  ``min_samples_leaf=--capped-leaf``. This is a candidate, not the production
+  setting.
+
+Columns:
+
+* ``load_s``: time to read the training matrix, from a separate process.
+* ``train_s``: time of ``train_model()`` from start to finish.
+* ``fit_s``: ``train_s - load_s``, which covers the split, the fit and the
+  test-set scoring.
+* ``predict_p50_us`` / ``predict_p99_us``: latency of ``predict_group`` per
+  call, the path a request takes.
+* ``peak_rss_mb`` / ``rss_delta_mb``: peak RSS of the train process after
+  its imports, and the same minus RSS before training. The app's imports
+  alone take several hundred MB, so the delta is what the dataset costs.
+* ``accuracy`` and ``nodes``: held-out accuracy and tree size.
+
+Needs the app's requirements. At 10^7 rows the CSV alone is about 300 MB;
+``--workdir`` picks where datasets go (default: a temporary directory,
+removed afterwards).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+VARIANTS = ('csv', 'store', 'store-capped')
+DEFAULT_ROWS = (10_000, 100_000, 1_000_000)
+PREDICT_CALLS = 2000
+COLUMNS = (
+    'rows', 'variant', 'load_s', 'fit_s', 'train_s', 'predict_p50_us', 'predict_p99_us',
+    'peak_rss_mb', 'rss_delta_mb', 'accuracy', 'nodes',
+)
+
+
+def _reset_peak_rss():
+    """Start a new peak-RSS window (Linux 4.0+); False if the kernel refuses."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _status_mb(field):
+    with open('/proc/self/status') as handle:
+        for line in handle:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024  # kB
+    return 0.0
+
+
+def measure(variant, phase, csv_path, store_dir, capped_depth, capped_leaf):
+    """One measurement in this process; the parent starts a fresh process per call."""
+    import random
+
+    from bench.common import percentile
+    from service import model_service
+
+    model_service.DATA_FILE = csv_path
+    model_service.TRAINING_STORE_DIR = store_dir if variant != 'csv' else os.path.join(store_dir, 'absent')
+    if variant == 'store-capped':
+        tree = model_service.DecisionTreeClassifier
+        model_service.DecisionTreeClassifier = lambda: tree(max_depth=capped_depth, min_samples_leaf=capped_leaf)
+    baseline = _status_mb('VmRSS')
+    windowed = _reset_peak_rss()
+
+    if phase == 'load':
+        started = time.perf_counter()
+        X, _, _, _ = model_service._load_csv() if variant == 'csv' else model_service._load_store()
+        return {'load_s': time.perf_counter() - started, 'matrix_mb': X.nbytes / (1024 * 1024)}
+
+    started = time.perf_counter()
+    message = model_service.train_model()
+    train_s = time.perf_counter() - started
+    if message != "Model trained successfully.":
+        raise RuntimeError(message)
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(PREDICT_CALLS):
+        time_val, errors_val, score_val = rng.uniform(5, 60), rng.randint(0, 10), rng.randint(0, 20)
+        started = time.perf_counter()
+        model_service.predict_group(time_val, errors_val, score_val)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    # Without a reset window the peak may date from the imports.
+    peak = _status_mb('VmHWM') if windowed else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'train_s': train_s,
+        'predict_p50_us': percentile(latencies, 0.50),
+        'predict_p99_us': percentile(latencies, 0.99),
+        'peak_rss_mb': peak,
+        'rss_delta_mb': peak - baseline,
+        'accuracy': model_service.get_accuracy(),
+        'nodes': model_service.ensure_model().tree_.node_count,
+    }
+
+
+def _run_child(args, variant, phase, csv_path, store_dir):
+    command = [
+        sys.executable, '-m', 'bench.train_scaling', '--child', variant, phase, csv_path, store_dir,
+        '--capped-depth', str(args.capped_depth), '--capped-leaf', str(args.capped_leaf),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _print_table(results):
+    print('| ' + ' | '.join(COLUMNS) + ' |')
+    print('| ' + ' | '.join('---' for _ in COLUMNS) + ' |')
+    for row in results:
+        cells = []
+        for column in COLUMNS:
+            value = row.get(column)
+            cells.append(f"{value:.3f}" if isinstance(value, float) else str(value))
+        print('| ' + ' | '.join(cells) + ' |')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=list(DEFAULT_ROWS))
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--capped-depth', type=int, default=12)
+    parser.add_argument('--capped-leaf', type=int, default=20)
+    parser.add_argument('--workdir', help='keep the generated datasets here')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--child', nargs=4, metavar=('VARIANT', 'PHASE', 'CSV', 'STORE'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        variant, phase, csv_path, store_dir = args.child
+        print(json.dumps(measure(variant, phase, csv_path, store_dir, args.capped_depth, args.capped_leaf)))
+        return 0
+
+    from tools import synth_dataset
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='train_scaling-')
+    os.makedirs(workdir, exist_ok=True)
+    profile = synth_dataset.fit_profile()
+    results = []
+    try:
+        for rows in args.rows:
+            csv_path = os.path.join(workdir, f"synth_{rows}.csv")
+            store_dir = os.path.join(workdir, f"synth_{rows}_store")
+            if not os.path.exists(csv_path):
+                shutil.rmtree(store_dir, ignore_errors=True)
+                synth_dataset.write(
+                    synth_dataset.generate(profile, rows, seed=args.seed), csv_path=csv_path, store_dir=store_dir
+                )
+            for variant in args.variants:
+                row = {'rows': rows, 'variant': variant}
+                row.update(_run_child(args, variant, 'load', csv_path, store_dir))
+                row.update(_run_child(args, variant, 'train', csv_path, store_dir))
+                row['fit_s'] = row['train_s'] - row['load_s']
+                results.append(row)
+                print(json.dumps(row), file=sys.stderr, flush=True)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump({'python': sys.version.split()[0], 'cpus': os.cpu_count(), 'results': results}, handle, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Deterministic final report built without any model call.
+
+Produces the same JSON shape as ``CareerCounselorService._parse_report_response``
+(``name``, ``class``, ``fit_job``, ``explanation``). It combines:
+
+* the wire-loop group predicted by ``model_service`` and that group's careers;
+* the wire-loop and reflex bests from the test metrics;
+* DISC evidence counted from the student's own chat turns against a small
+  accent-free keyword lexicon.
+
+The wording follows the ReportAgent's output rules in instructions/report_agent.md.
+
+It is used when REPORT_MODE is ``local``, or in ``auto`` mode while the LLM
+backend is saturated, failing or too slow. It runs in well under a millisecond.
+"""
+from __future__ import annotations
+
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+DISC_KEYWORDS = {
+    "D": (
+        "quyet doan", "lanh dao", "canh tranh", "thu thach", "chu dong", "quyet dinh",
+        "muc tieu", "dan dat", "ket qua", "manh me",
+    ),
+    "I": (
+        "giao tiep", "noi chuyen", "y tuong", "thuyet phuc", "ket ban", "nang dong",
+        "vui ve", "the hien", "hoat ngon", "truyen cam hung",
+    ),
+    "S": (
+        "binh tinh", "kien nhan", "giup do", "lang nghe", "on dinh", "hoa dong",
+        "thoai mai", "ho tro", "tin cay", "khong thich tranh luan",
+    ),
+    "C": (
+        "chi tiet", "cau toan", "ke hoach", "chinh xac", "phan tich", "can than",
+        "quy tac", "logic", "nguyen tac", "tung buoc",
+    ),
+}
+DISC_LABELS = {
+    "D": "Quyết đoán (D)",
+    "I": "Ảnh hưởng (I)",
+    "S": "Kiên định (S)",
+    "C": "Tuân thủ (C)",
+}
+DISC_TRAITS = {
+    "D": "thích thử thách, chủ động ra quyết định và hướng tới kết quả",
+    "I": "cởi mở, giỏi giao tiếp và dễ truyền cảm hứng cho người khác",
+    "S": "điềm tĩnh, kiên nhẫn và là chỗ dựa đáng tin cậy trong nhóm",
+    "C": "cẩn thận, chú ý chi tiết và làm việc có kế hoạch, có nguyên tắc",
+}
+DISC_CAREERS = {
+    "D": ("Quản trị kinh doanh", "Quản lý dự án", "Khởi nghiệp"),
+    "I": ("Truyền thông - Marketing", "Sư phạm", "Quan hệ công chúng"),
+    "S": ("Điều dưỡng", "Công tác xã hội", "Quản trị nhân sự"),
+    "C": ("Kế toán - Kiểm toán", "Công nghệ thông tin", "Kỹ thuật"),
+}
+GROUP_TRAITS = {
+    "A": "phản xạ nhanh",
+    "B": "sự khéo léo và tỉ mỉ của đôi tay",
+    "C": "tư duy phân tích hơn là thao tác tay",
+}
+MAX_FIT_JOBS = 6
+# The explanation names fewer careers to stay under the 120-word limit.
+MENTIONED_JOBS = 3
+
+
+def _strip_accents(text: str) -> str:
+    lowered = (text or "").lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFKD", lowered)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def disc_evidence(chat_history: Iterable[dict]) -> List[Dict[str, Any]]:
+    """Keyword hits per DISC dimension in the student's turns, strongest first.
+
+    Each item is ``{"dimension", "hits", "quote"}``; ``quote`` is the student
+    turn with the most hits for that dimension. Dimensions without hits are
+    left out.
+    """
+    totals = {dimension: 0 for dimension in DISC_KEYWORDS}
+    quotes: Dict[str, tuple] = {}
+    for entry in chat_history or ():
+        if entry.get("role") != "user":
+            continue
+        text = entry.get("text") or ""
+        plain = _strip_accents(text)
+        for dimension, keywords in DISC_KEYWORDS.items():
+            hits = sum(plain.count(keyword) for keyword in keywords)
+            if not hits:
+                continue
+            totals[dimension] += hits
+            if hits > quotes.get(dimension, (0, ""))[0]:
+                quotes[dimension] = (hits, text.strip())
+    ranked = sorted(
+        (dimension for dimension, hits in totals.items() if hits),
+        key=lambda dimension: totals[dimension],
+        reverse=True,
+    )
+    return [
+        {"dimension": dimension, "hits": totals[dimension], "quote": quotes[dimension][1]}
+        for dimension in ranked
+    ]
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    seen = []
+    for value in values:
+        if value and value not in seen:
+            seen.append(value)
+    return seen
+
+
+def _test_sentences(test_metrics: Optional[Dict[str, Any]]) -> List[str]:
+    metrics = test_metrics or {}
+    sentences = []
+    ingenuous = metrics.get("ingenuous")
+    if ingenuous:
+        sentences.append(
+            f"Ở Kiểm tra khéo léo, bạn hoàn thành trong {ingenuous['time']:.1f} giây "
+            f"với {ingenuous['mistake']} lần chạm dây."
+        )
+    reflex = metrics.get("reflex")
+    if reflex:
+        sentences.append(
+            f"Ở Kiểm tra phản xạ, bạn đập trúng {reflex['quantity']} chú chuột trong {reflex['time']:.0f} giây."
+        )
+    return sentences
+
+
+def build_local_report(
+    *,
+    student_profile: Dict[str, Any],
+    chat_history: List[dict],
+    test_metrics: Optional[Dict[str, Any]],
+    group: Optional[str],
+    group_careers: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Final report dict in the ReportAgent's shape, from local data only.
+
+    Follows the ReportAgent's output rules: one short plain paragraph that
+    names the student, covers both tests and ends with encouragement.
+    """
+    name = student_profile.get("full_name", "")
+    evidence = disc_evidence(chat_history)
+    top = [item["dimension"] for item in evidence[:2]]
+    careers = list(DISC_CAREERS[top[0]]) if top else []
+    careers += list(group_careers)[:2]
+    if len(top) > 1:
+        careers += list(DISC_CAREERS[top[1]])[:1]
+    fit_jobs = _unique(careers)[:MAX_FIT_JOBS]
+
+    sentences = [f"Chào {name}!" if name else "Chào bạn!"]
+    sentences.extend(_test_sentences(test_metrics))
+    if group in GROUP_TRAITS:
+        sentences.append(f"Kết quả này xếp bạn vào Nhóm {group}, nổi bật về {GROUP_TRAITS[group]}.")
+    if top:
+        sentence = f"Qua trò chuyện, bạn thể hiện rõ xu hướng {DISC_LABELS[top[0]]}: {DISC_TRAITS[top[0]]}"
+        if len(top) > 1:
+            sentence += f", kèm theo nét {DISC_LABELS[top[1]]}"
+        sentences.append(sentence + ".")
+    if fit_jobs:
+        sentences.append(
+            f"Vì vậy các hướng như {', '.join(fit_jobs[:MENTIONED_JOBS])} rất đáng để bạn tìm hiểu thêm."
+        )
+    sentences.append("Hãy tự tin khám phá nhé, con đường phù hợp đang chờ bạn!")
+
+    return {
+        "name": name,
+        "class": student_profile.get("class_name", ""),
+        "fit_job": ", ".join(fit_jobs),
+        "explanation": " ".join(sentences),
+    }
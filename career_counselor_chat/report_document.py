@@ -0,0 +1,43 @@
+"""Printable HTML and PDF for a final report.
+
+Kept free of app and service imports: ``render_pdf`` runs in a spawned
+process-pool worker, which imports only this module.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+TEMPLATE_NAME = "report_print.html"
+
+_environment = None
+
+
+def _template():
+    global _environment
+    if _environment is None:
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            autoescape=select_autoescape(("html",)),
+        )
+    return _environment.get_template(TEMPLATE_NAME)
+
+
+def render_html(report: Dict[str, Any], *, created_at: float) -> str:
+    """Self-contained printable page (inline CSS, no scripts)."""
+    return _template().render(
+        report=report,
+        fit_jobs=[job.strip() for job in (report.get("fit_job") or "").split(",") if job.strip()],
+        created=datetime.fromtimestamp(created_at).strftime("%d/%m/%Y %H:%M"),
+    )
+
+
+def render_pdf(html: str) -> bytes:
+    """PDF bytes for ``render_html`` output; needs the optional weasyprint."""
+    from weasyprint import HTML
+
+    return HTML(string=html, base_url=TEMPLATES_DIR).write_pdf()
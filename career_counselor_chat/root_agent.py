@@ -51,6 +51,11 @@ def _read_root_agent_instruction() -> str:
 
 # Cho phép override model qua env, default là gemini-2.5-flash
 DEFAULT_MODEL = os.getenv("CAREER_AGENT_MODEL", "gemini-2.5-flash")
+if DEFAULT_MODEL == "stub":
+    # Offline stand-in for load tests; see stub_llm.py.
+    from .stub_llm import StubLlm
+
+    DEFAULT_MODEL = StubLlm()
 
 
 def build_agent() -> LlmAgent:
@@ -1,29 +1,38 @@
 from __future__ import annotations
 
 import asyncio
+from collections import OrderedDict
 from dataclasses import dataclass
 import json
+import time
 import unicodedata
 import os
 from logging import getLogger
 from typing import Optional, Dict, Any
 
 from google.adk.runners import (
-    InMemorySessionService,
     RunConfig,
     Runner,
     types,
 )
+from google.adk.sessions import BaseSessionService
 
 from .root_agent import build_agent, DEFAULT_MODEL
 from .career_agent import build_career_agent
 from .report_agent import build_report_agent
 from .uni_search_agent import build_university_search_agent
+from .session_store import build_session_service, ensure_pruner, prune_memory_session, session_stats
 from vertexai import init as vertexai_init
 
 logger = getLogger(__name__)
 
 DEFAULT_APP_NAME = "agents"
+# Users whose test metrics are kept for prompts; least recently updated go first.
+TEST_METRICS_MAX_USERS = int(os.getenv("CAREER_TEST_METRICS_MAX_USERS", "1000"))
+# LLM reports in flight at which llm_degraded() reports saturation.
+REPORT_MAX_INFLIGHT = int(os.getenv("CAREER_REPORT_MAX_INFLIGHT", "8"))
+# Seconds after a failed or timed-out LLM report during which llm_degraded() stays true.
+REPORT_COOLDOWN_SECONDS = float(os.getenv("CAREER_REPORT_COOLDOWN_SECONDS", "60"))
 
 
 @dataclass(slots=True)
@@ -45,7 +54,7 @@ class CareerCounselorService:
         report_agent=None,
         university_agent=None,
         app_name: str = DEFAULT_APP_NAME,
-        session_service: Optional[InMemorySessionService] = None,
+        session_service: Optional[BaseSessionService] = None,
     ) -> None:
         self._app_name = app_name
         self._agent = agent or build_agent()
@@ -54,8 +63,10 @@ class CareerCounselorService:
         self._university_agent = (
             university_agent or build_university_search_agent(model=DEFAULT_MODEL)
         )
-        self._session_service = session_service or InMemorySessionService()
-        self._test_metrics: Dict[str, Dict[str, Optional[Dict[str, Any]]]] = {}
+        self._session_service = session_service or build_session_service()
+        self._test_metrics: OrderedDict[str, Dict[str, Optional[Dict[str, Any]]]] = OrderedDict()
+        self._reports_inflight = 0
+        self._report_failed_at = 0.0
         self._ensure_vertex_ai()
 
     def _ensure_vertex_ai(self) -> None:
@@ -159,17 +170,25 @@ class CareerCounselorService:
         chat_history: list[dict[str, str]],
         user_id: str = "user123",
         session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """Sync wrapper to create the JSON final report via ReportAgent."""
+        """Sync wrapper to create the JSON final report via ReportAgent.
+
+        With ``timeout`` (seconds) the agent run is cancelled when it takes
+        longer and ``asyncio.TimeoutError`` is raised.
+        """
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
             return asyncio.run(
-                self.generate_final_report_async(
-                    student_profile=student_profile,
-                    chat_history=chat_history,
-                    user_id=user_id,
-                    session_id=session_id,
+                asyncio.wait_for(
+                    self.generate_final_report_async(
+                        student_profile=student_profile,
+                        chat_history=chat_history,
+                        user_id=user_id,
+                        session_id=session_id,
+                    ),
+                    timeout,
                 )
             )
         else:
@@ -211,30 +230,49 @@ class CareerCounselorService:
         user_id: str = "user123",
         session_id: Optional[str] = None,
     ) -> Dict[str, Any]:
+        # Bad input is the caller's fault, not the agent's: checked before
+        # the try so it never starts the cooldown for everyone.
         if not student_profile:
             raise ValueError("Missing student profile for final report.")
+        if not chat_history:
+            raise ValueError("Missing chat history for career summary.")
         logger.info(
             "Generating final report via RootAgent",
             extra={"component": "career_counseling", "user_id": user_id},
         )
-        career_summary = await self._generate_career_summary_async(
-            student_profile=student_profile,
-            chat_history=chat_history,
-            user_id=user_id,
-        )
-        prompt = self._build_root_report_prompt(
-            student_profile=student_profile,
-            career_summary=career_summary,
-            user_id=user_id,
-        )
-        final_text = await self._run_root_task_async(
-            prompt=prompt,
-            user_id=user_id,
-            session_id=session_id or f"{self._app_name}_{user_id}_report_root",
-        )
-        if not final_text:
-            raise RuntimeError("Root agent returned no output for report.")
-        return self._parse_report_response(final_text)
+        self._reports_inflight += 1
+        try:
+            career_summary = await self._generate_career_summary_async(
+                student_profile=student_profile,
+                chat_history=chat_history,
+                user_id=user_id,
+            )
+            prompt = self._build_root_report_prompt(
+                student_profile=student_profile,
+                career_summary=career_summary,
+                user_id=user_id,
+            )
+            final_text = await self._run_root_task_async(
+                prompt=prompt,
+                user_id=user_id,
+                session_id=session_id or f"{self._app_name}_{user_id}_report_root",
+            )
+            if not final_text:
+                raise RuntimeError("Root agent returned no output for report.")
+            return self._parse_report_response(final_text)
+        except BaseException:
+            # Agent and parse failures; cancellation by a timeout lands here too.
+            self._report_failed_at = time.monotonic()
+            raise
+        finally:
+            self._reports_inflight -= 1
+
+    def llm_degraded(self) -> bool:
+        """True while LLM reports are saturated or one failed recently."""
+        if self._reports_inflight >= REPORT_MAX_INFLIGHT:
+            return True
+        failed_at = self._report_failed_at
+        return bool(failed_at) and time.monotonic() - failed_at < REPORT_COOLDOWN_SECONDS
 
     async def generate_university_recommendations_async(
         self,
@@ -294,6 +332,7 @@ class CareerCounselorService:
         user_id: str,
         session_id: Optional[str],
     ):
+        ensure_pruner()
         session_key = session_id or f"{self._app_name}_{user_id}"
         session = await self._session_service.get_session(
             app_name=self._app_name,
@@ -306,6 +345,12 @@ class CareerCounselorService:
                 user_id=user_id,
                 session_id=session_key,
             )
+        prune_memory_session(
+            self._session_service,
+            app_name=self._app_name,
+            user_id=user_id,
+            session_id=session_key,
+        )
         return session
 
     def update_test_metrics(
@@ -314,11 +359,16 @@ class CareerCounselorService:
         user_id: str,
         ingenuous: Optional[Dict[str, Any]] = None,
         reflex: Optional[Dict[str, Any]] = None,
+        ranks: Optional[Dict[str, Any]] = None,
     ) -> None:
         """Store the latest Ingeous/Reflex test metrics for downstream prompts."""
-        payload = self._test_metrics.setdefault(
-            user_id, {"ingenuous": None, "reflex": None}
-        )
+        payload = self._test_metrics.get(user_id)
+        if payload is None:
+            payload = self._test_metrics[user_id] = {"ingenuous": None, "reflex": None, "ranks": None}
+            while len(self._test_metrics) > TEST_METRICS_MAX_USERS:
+                self._test_metrics.popitem(last=False)
+        else:
+            self._test_metrics.move_to_end(user_id)
         if ingenuous:
             payload["ingenuous"] = {
                 "time": float(ingenuous.get("time", 0.0) or 0.0),
@@ -329,11 +379,27 @@ class CareerCounselorService:
                 "time": float(reflex.get("time", 0.0) or 0.0),
                 "quantity": int(reflex.get("quantity", 0) or 0),
             }
+        if ranks:
+            payload["ranks"] = ranks
+
+    def get_test_metrics(self, user_id: str) -> Dict[str, Any]:
+        """Copy of the cached test metrics for a user (empty when unknown)."""
+        metrics = self._test_metrics.get(user_id)
+        return {key: dict(value) if value else value for key, value in metrics.items()} if metrics else {}
 
     def reset_test_metrics(self, *, user_id: str) -> None:
         """Clear cached test metrics for a user after a session finishes."""
         self._test_metrics.pop(user_id, None)
 
+    def memory_stats(self) -> Dict[str, Any]:
+        """Sizes of the per-process state this service accumulates."""
+        return {
+            "test_metrics_users": len(self._test_metrics),
+            "test_metrics_approx_bytes": len(json.dumps(self._test_metrics, default=str)),
+            "reports_inflight": self._reports_inflight,
+            "adk_sessions": session_stats(self._session_service),
+        }
+
     def _build_root_report_prompt(
         self,
         *,
@@ -554,6 +620,17 @@ class CareerCounselorService:
                 "ReflexTest: "
                 f"time={reflex['time']:.2f}s, quantity={reflex['quantity']}"
             )
+        for scope, rank in (metrics.get("ranks") or {}).items():
+            values = ", ".join(
+                f"{key}={rank[key]:.0f}"
+                for key in ("wire_time", "wire_errors", "reflex_quantity")
+                if key in rank
+            )
+            if values:
+                lines.append(
+                    f"PeerRank {scope}={rank.get('name', '')} (n={rank.get('count', 0)}, "
+                    f"percent of peers beaten): {values}"
+                )
         if not lines:
             return None
         return (
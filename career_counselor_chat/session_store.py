@@ -0,0 +1,309 @@
+"""Pluggable ADK session storage for the career counselor.
+
+CAREER_SESSION_BACKEND selects the backend:
+
+* ``sqlite`` (default): ADK's DatabaseSessionService over a local SQLite
+  file in WAL mode, so every worker process and restarts see the same
+  conversations without sticky sessions.
+* ``database``: DatabaseSessionService over CAREER_SESSION_DB_URL (any
+  SQLAlchemy URL, e.g. PostgreSQL); no local pruning.
+* ``memory``: ADK's InMemorySessionService (per process, lost on restart).
+  The same event cap and TTL are applied in process, see
+  ``prune_memory_session``.
+
+DatabaseSessionService runs on async SQLAlchemy (``google-adk[db]``), so
+URLs need an async driver. The SQLite URL uses ``sqlite+aiosqlite``, and a
+plain ``sqlite:///`` CAREER_SESSION_DB_URL is rewritten to it. Any fallback
+to in-memory sessions is logged as an error: conversations are then lost on
+restart and not shared between workers.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Optional
+
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+
+logger = getLogger(__name__)
+
+SESSION_BACKEND = os.getenv("CAREER_SESSION_BACKEND", "sqlite").lower()
+SESSION_DB_PATH = os.getenv("CAREER_SESSION_DB_PATH", "career_sessions.db")
+SESSION_DB_URL = os.getenv("CAREER_SESSION_DB_URL", "")
+SESSION_POOL_SIZE = int(os.getenv("CAREER_SESSION_POOL_SIZE", "5"))
+# Events kept per session; older turns are pruned in the background.
+SESSION_MAX_EVENTS = int(os.getenv("CAREER_SESSION_MAX_EVENTS", "200"))
+SESSION_TTL_SECONDS = float(os.getenv("CAREER_SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_PRUNE_INTERVAL = float(os.getenv("CAREER_SESSION_PRUNE_INTERVAL", "300"))
+
+_BUSY_TIMEOUT_SECONDS = 30
+
+
+def _enable_wal(path: str) -> None:
+    # journal_mode=WAL is persistent in the database file, so setting it once
+    # here covers the connections SQLAlchemy opens later.
+    conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT_SECONDS)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+
+
+def _sqlite_path(url: str) -> Optional[str]:
+    prefix, sep, path = url.partition(":///")
+    if not sep or not prefix.startswith("sqlite") or not path or path == ":memory:":
+        return None
+    return path
+
+
+def _async_url(url: str) -> str:
+    """``url`` with the aiosqlite driver when it names plain SQLite."""
+    prefix, sep, rest = url.partition("://")
+    return f"sqlite+aiosqlite://{rest}" if sep and prefix == "sqlite" else url
+
+
+def build_session_service(backend: str = SESSION_BACKEND) -> BaseSessionService:
+    """Create the configured session service; falls back to memory on failure."""
+    if backend == "memory":
+        return InMemorySessionService()
+    url = SESSION_DB_URL
+    if backend == "sqlite" and not url:
+        url = f"sqlite+aiosqlite:///{SESSION_DB_PATH}"
+    if not url:
+        logger.error(
+            "CAREER_SESSION_DB_URL missing for backend %s; using in-memory sessions",
+            backend,
+            extra={"component": "career_counseling"},
+        )
+        return InMemorySessionService()
+
+    url = _async_url(url)
+    sqlite_path = _sqlite_path(url)
+    engine_kwargs = {"pool_pre_ping": True}
+    if sqlite_path:
+        engine_kwargs["connect_args"] = {"timeout": _BUSY_TIMEOUT_SECONDS, "check_same_thread": False}
+    engine_kwargs["pool_size"] = SESSION_POOL_SIZE
+    engine_kwargs["max_overflow"] = SESSION_POOL_SIZE
+    try:
+        if sqlite_path:
+            _enable_wal(sqlite_path)
+        from google.adk.sessions import DatabaseSessionService
+
+        service = DatabaseSessionService(db_url=url, **engine_kwargs)
+    except Exception as exc:
+        logger.error(
+            "Database session backend unavailable (%s); using in-memory sessions",
+            exc,
+            exc_info=True,
+            extra={"component": "career_counseling", "error": str(exc)},
+        )
+        return InMemorySessionService()
+
+    _reset_pool_after_fork(service)
+    if sqlite_path and SESSION_PRUNE_INTERVAL > 0:
+        global _prune_path
+        _prune_path = sqlite_path
+    logger.info(
+        "ADK sessions stored in %s",
+        url,
+        extra={"component": "career_counseling"},
+    )
+    return service
+
+
+def _reset_pool_after_fork(service) -> None:
+    # gunicorn preloads the app, so the engine and its first pooled
+    # connection are created in the master; children must not reuse them.
+    engine = getattr(service, "db_engine", None)
+    engine = getattr(engine, "sync_engine", engine)
+    if engine is not None and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+
+def prune_sessions(
+    path: str,
+    *,
+    max_events: int = SESSION_MAX_EVENTS,
+    ttl_seconds: float = SESSION_TTL_SECONDS,
+    now: Optional[float] = None,
+) -> dict:
+    """Drop expired sessions and all but the newest ``max_events`` per session.
+
+    Works on ADK's ``sessions``/``events`` tables directly over sqlite3.
+    Returns the number of deleted rows per table.
+    """
+    conn = sqlite3.connect(path, timeout=_BUSY_TIMEOUT_SECONDS)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if not {"sessions", "events"} <= tables:
+            return {"sessions": 0, "events": 0}
+        deleted = {"sessions": 0, "events": 0}
+        with conn:
+            if ttl_seconds > 0:
+                cutoff = datetime.fromtimestamp((now or time.time()) - ttl_seconds, timezone.utc)
+                cursor = conn.execute(
+                    "DELETE FROM sessions WHERE update_time < ?",
+                    (cutoff.replace(tzinfo=None).isoformat(sep=" "),),
+                )
+                deleted["sessions"] = cursor.rowcount
+                cursor = conn.execute(
+                    """
+                    DELETE FROM events WHERE NOT EXISTS (
+                        SELECT 1 FROM sessions s
+                        WHERE s.app_name = events.app_name
+                          AND s.user_id = events.user_id
+                          AND s.id = events.session_id
+                    )
+                    """
+                )
+                deleted["events"] += cursor.rowcount
+            if max_events > 0:
+                cursor = conn.execute(
+                    """
+                    DELETE FROM events WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY app_name, user_id, session_id
+                                ORDER BY timestamp DESC
+                            ) AS position
+                            FROM events
+                        ) WHERE position > ?
+                    )
+                    """,
+                    (max_events,),
+                )
+                deleted["events"] += cursor.rowcount
+        return deleted
+    finally:
+        conn.close()
+
+
+_prune_path: Optional[str] = None
+_pruner_pid: Optional[int] = None
+_memory_swept_at = 0.0
+
+
+def _memory_sessions(service):
+    """Yield ``(app_name, user_id, session_id, session)`` held by an in-memory service."""
+    for app_name, users in getattr(service, "sessions", {}).items():
+        for user_id, sessions in users.items():
+            for session_id, session in sessions.items():
+                yield app_name, user_id, session_id, session
+
+
+def prune_memory_session(
+    service,
+    *,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    max_events: int = SESSION_MAX_EVENTS,
+    ttl_seconds: float = SESSION_TTL_SECONDS,
+    interval: float = SESSION_PRUNE_INTERVAL,
+    now: Optional[float] = None,
+) -> dict:
+    """In-memory counterpart of ``prune_sessions``.
+
+    Trims the stored copy of the given session to its newest ``max_events``
+    events on every call, and at most every ``interval`` seconds drops
+    sessions idle for longer than ``ttl_seconds``. It runs on the request
+    path rather than on a thread because InMemorySessionService is not
+    thread-safe.
+    """
+    global _memory_swept_at
+    deleted = {"sessions": 0, "events": 0}
+    if not isinstance(service, InMemorySessionService):
+        return deleted
+    stored = getattr(service, "sessions", {}).get(app_name, {}).get(user_id, {}).get(session_id)
+    if stored is not None and max_events > 0 and len(stored.events) > max_events:
+        deleted["events"] = len(stored.events) - max_events
+        del stored.events[:deleted["events"]]
+    now = now or time.time()
+    if ttl_seconds <= 0 or interval <= 0 or now - _memory_swept_at < interval:
+        return deleted
+    _memory_swept_at = now
+    expired = [
+        (app, user, sid)
+        for app, user, sid, session in _memory_sessions(service)
+        if now - (session.last_update_time or now) > ttl_seconds
+    ]
+    for app, user, sid in expired:
+        users = service.sessions[app]
+        del users[user][sid]
+        if not users[user]:
+            del users[user]
+    deleted["sessions"] = len(expired)
+    return deleted
+
+
+def session_stats(service) -> dict:
+    """Session/event counts and approximate payload bytes for the admin memory report."""
+    if isinstance(service, InMemorySessionService):
+        sessions = events = payload_bytes = 0
+        for _app, _user, _sid, session in _memory_sessions(service):
+            sessions += 1
+            events += len(session.events)
+            payload_bytes += sum(len(event.model_dump_json()) for event in session.events)
+        return {
+            "backend": "memory",
+            "sessions": sessions,
+            "events": events,
+            "approx_bytes": payload_bytes,
+        }
+    if _prune_path is None:
+        return {"backend": type(service).__name__}
+    conn = sqlite3.connect(_prune_path, timeout=_BUSY_TIMEOUT_SECONDS)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("sessions", "events")
+            if table in tables
+        }
+    finally:
+        conn.close()
+    file_bytes = sum(
+        os.path.getsize(path)
+        for path in (_prune_path, f"{_prune_path}-wal")
+        if os.path.exists(path)
+    )
+    return {"backend": "sqlite", **counts, "file_bytes": file_bytes}
+
+
+def ensure_pruner(interval: float = SESSION_PRUNE_INTERVAL) -> None:
+    """Start the pruning thread in this process if it is not running yet.
+
+    Called lazily from request paths rather than at import: threads started
+    in a preloading gunicorn master do not survive the fork into workers.
+    """
+    global _pruner_pid
+    path = _prune_path
+    if path is None or _pruner_pid == os.getpid():
+        return
+    _pruner_pid = os.getpid()
+    from service.threads import native_sleep, start_native_thread
+
+    def loop():
+        while True:
+            native_sleep(interval)
+            try:
+                deleted = prune_sessions(path)
+            except sqlite3.Error as exc:
+                logger.warning(
+                    "Session pruning failed: %s",
+                    exc,
+                    extra={"component": "career_counseling"},
+                )
+                continue
+            if deleted["sessions"] or deleted["events"]:
+                logger.info(
+                    "Pruned %d sessions and %d events",
+                    deleted["sessions"],
+                    deleted["events"],
+                    extra={"component": "career_counseling"},
+                )
+
+    start_native_thread(loop)
@@ -0,0 +1,72 @@
+"""Deterministic stand-in for Gemini, selected with ``CAREER_AGENT_MODEL=stub``.
+
+Used by bench/loadtest.py so load tests exercise the real ADK runner and
+session storage without calling (or paying for) a hosted model. Replies are
+canned per task and arrive after ``CAREER_STUB_LATENCY_MS`` (+/- 25%).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+STUB_MODEL_NAME = "stub"
+# Chat turns before the stub closes the conversation ("Kết luận cuối").
+STUB_CHAT_TURNS = 4
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user":
+            return "\n".join(part.text for part in content.parts or [] if part.text)
+    return ""
+
+
+def _user_turns(llm_request: LlmRequest) -> int:
+    return sum(1 for content in llm_request.contents or [] if content.role == "user")
+
+
+class StubLlm(BaseLlm):
+    model: str = STUB_MODEL_NAME
+    latency_ms: float = float(os.getenv("CAREER_STUB_LATENCY_MS", "800"))
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [STUB_MODEL_NAME]
+
+    def _reply(self, llm_request: LlmRequest) -> str:
+        text = _last_user_text(llm_request)
+        if "TASK: REPORT" in text:
+            return json.dumps(
+                {
+                    "name": "Học sinh",
+                    "class": "",
+                    "fit_job": "Kỹ thuật, Công nghệ thông tin",
+                    "explanation": "Báo cáo mẫu từ mô hình giả lập dùng cho kiểm thử tải.",
+                },
+                ensure_ascii=False,
+            )
+        if "TASK: UNIVERSITY" in text:
+            return "- Đại học Bách khoa Hà Nội: Kỹ thuật máy tính\n- Đại học Công nghệ: Khoa học máy tính"
+        if "Lịch sử hội thoại" in text:
+            return (
+                "**Điểm nổi bật tính cách:** chủ động, cẩn thận.\n"
+                "**Ngành học phù hợp:**\n- Kỹ thuật phần mềm\n- Cơ điện tử"
+            )
+        if _user_turns(llm_request) >= STUB_CHAT_TURNS:
+            return "Điểm nổi bật tính cách: bạn chủ động và cẩn thận. Kết luận cuối: nhóm ngành kỹ thuật."
+        return "Câu hỏi DISC tiếp theo: khi làm việc nhóm, bạn thường đảm nhận vai trò nào?"
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        delay = self.latency_ms / 1000.0
+        await asyncio.sleep(delay * random.uniform(0.75, 1.25))
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=self._reply(llm_request))])
+        )
@@ -1,5 +1,5 @@
 #include <WiFi.h>
-#include <HTTPClient.h> // Switch to Standard HTTP Client
+#include <WiFiUdp.h>
 #include <Wire.h>
 #include <LiquidCrystal_I2C.h> // Library: "LiquidCrystal I2C" by Frank de Brabander
 
@@ -13,7 +13,21 @@
 const char* WIFI_SSID = "Phong Tin Nha A";
 const char* WIFI_PASS = "phongtin2";
 const char* SERVER_IP = "192.168.1.9"; // Update IP if needed
-const int SERVER_PORT = 5000;
+const int TELEMETRY_PORT = 5005; // UDP telemetry listener (TELEMETRY_UDP_PORT on the server)
+const char* DEVICE_ID = "st01"; // Unique per station (max 8 chars); students pair with this id on /test
+
+// ===== TELEMETRY FRAMES =====
+// Datagram: 'W' 'L' | u8 count | count x frame
+// Frame (24 bytes, little-endian): u8 version | u8 event | 8s device | u32 boot | u32 seq | f32 time | u16 errors
+#define PROTOCOL_VERSION 2
+#define EVENT_START  0
+#define EVENT_UPDATE 1
+#define EVENT_FINISH 2
+#define EVENT_HEARTBEAT 3
+#define FRAME_SIZE   24
+#define MAX_FRAMES   16
+const unsigned long BATCH_WINDOW_MS = 500; // Updates are sampled every 200ms and sent together
+const unsigned long HEARTBEAT_MS = 2000;    // Keeps the station "online" on the server while idle
 
 LiquidCrystal_I2C lcd(0x27, 16, 2); // Address 0x27 usually, sometimes 0x3F
 
@@ -23,6 +37,14 @@ bool finished = false;
 unsigned long startTime = 0;
 int errorCount = 0;
 unsigned long lastUpdate = 0;
+uint32_t eventSeq = 0; // Monotonic; lets the server drop out-of-order or duplicate frames
+uint32_t bootId = 0;   // Random per power-up; a new value restarts the sequence on the server
+
+WiFiUDP udp;
+uint8_t batchBuf[3 + MAX_FRAMES * FRAME_SIZE];
+int batchCount = 0;
+unsigned long batchStartedAt = 0;
+unsigned long lastSentAt = 0;
 
 // Buzzer State
 int buzChannel = 0;
@@ -60,34 +82,66 @@ void updateLCDGame(float time, int errors) {
     lcd.print("Err: " + String(errors) + "      ");
 }
 
-// ===== HTTP SENDER (ROBUST) =====
-void sendEvent(String eventType, float timePlay, int errors) {
-    if(WiFi.status() == WL_CONNECTED){
-        HTTPClient http;
-        String url = "http://" + String(SERVER_IP) + ":" + String(SERVER_PORT) + "/api/game_event";
-        
-        http.begin(url);
-        http.addHeader("Content-Type", "application/json");
-        
-        String json = "{\"event\":\"" + eventType + "\",\"time\":" + String(timePlay, 2) + ",\"errors\":" + String(errors) + "}";
-        
-        // POST asynchronously essentially (we don't wait long for response or check strict validity to keep game smooth)
-        // For 'update' events, we might want to skip waiting, but for start/finish we wait.
-        int httpResponseCode = http.POST(json);
-        
-        if (httpResponseCode > 0) {
-           Serial.print("HTTP Sent: "); Serial.println(eventType);
-        } else {
-           Serial.print("Error on sending POST: "); Serial.println(httpResponseCode);
-        }
-        http.end();
-    } else {
+// ===== UDP SENDER (BATCHED) =====
+void flushBatch(bool important) {
+    if (batchCount == 0) return;
+    if (WiFi.status() != WL_CONNECTED) {
         Serial.println("WiFi Disconnected");
+        batchCount = 0;
+        return;
+    }
+    batchBuf[0] = 'W';
+    batchBuf[1] = 'L';
+    batchBuf[2] = (uint8_t)batchCount;
+    size_t len = 3 + batchCount * FRAME_SIZE;
+    // start/finish must not be lost: send twice, the server drops the duplicate by seq
+    int copies = important ? 2 : 1;
+    for (int i = 0; i < copies; i++) {
+        udp.beginPacket(SERVER_IP, TELEMETRY_PORT);
+        udp.write(batchBuf, len);
+        udp.endPacket();
+    }
+    batchCount = 0;
+    lastSentAt = millis();
+}
+
+void queueFrame(uint8_t eventType, float timePlay, int errors) {
+    if (batchCount == MAX_FRAMES) flushBatch(false);
+    uint8_t* frame = batchBuf + 3 + batchCount * FRAME_SIZE;
+    // Heartbeats repeat the last seq: they carry no game state to order.
+    if (eventType != EVENT_HEARTBEAT) eventSeq++;
+    uint16_t errors16 = (uint16_t)errors;
+    frame[0] = PROTOCOL_VERSION;
+    frame[1] = eventType;
+    memset(frame + 2, 0, 8);
+    strncpy((char*)frame + 2, DEVICE_ID, 8);
+    memcpy(frame + 10, &bootId, 4);    // ESP32 is little-endian
+    memcpy(frame + 14, &eventSeq, 4);
+    memcpy(frame + 18, &timePlay, 4);
+    memcpy(frame + 22, &errors16, 2);
+    if (batchCount == 0) batchStartedAt = millis();
+    batchCount++;
+}
+
+void sendEvent(uint8_t eventType, float timePlay, int errors) {
+    queueFrame(eventType, timePlay, errors);
+    if (eventType != EVENT_UPDATE) {
+        flushBatch(true);
+    }
+}
+
+void serviceTelemetry() {
+    if (batchCount > 0 && millis() - batchStartedAt >= BATCH_WINDOW_MS) {
+        flushBatch(false);
+    } else if (batchCount == 0 && millis() - lastSentAt >= HEARTBEAT_MS) {
+        queueFrame(EVENT_HEARTBEAT, 0, 0);
+        flushBatch(false);
     }
 }
 
 void setup() {
     Serial.begin(115200);
+    bootId = esp_random() | 1; // never 0, which means "no nonce" to the server
 
     // Initialise LCD
     Wire.begin(22, 23); // SDA=21, SCL=22
@@ -113,6 +167,7 @@ void setup() {
         Serial.print(".");
     }
     Serial.println("\nWiFi Connected!");
+    udp.begin(TELEMETRY_PORT);
     updateLCD("Connected!", "Touch Start Pt");
     
     startBuzzer(1000, 200);
@@ -131,6 +186,7 @@ void resetGame() {
 
 void loop() {
     updateBuzzer();
+    serviceTelemetry();
 
     int startState = digitalRead(PIN_START);
     int errorState = digitalRead(PIN_ERROR);
@@ -151,7 +207,7 @@ void loop() {
         startTime = millis();
         lastUpdate = millis();
         startBuzzer(2000, 300);
-        sendEvent("start", 0, 0);
+        sendEvent(EVENT_START, 0, 0);
         lcd.clear();
     }
 
@@ -167,16 +223,16 @@ void loop() {
             static unsigned long lastErrorTime = 0;
             if (millis() - lastErrorTime > 200) {
                  errorCount++;
-                 sendEvent("update", currentTime, errorCount);
+                 sendEvent(EVENT_UPDATE, currentTime, errorCount);
                  lastErrorTime = millis();
             }
             digitalWrite(PIN_LED, LOW);
         }
 
         // Periodic Update (LCD + Server)
-        // Reduce network spam: Only send every 200ms
+        // Sampled every 200ms, sent in one datagram per BATCH_WINDOW_MS
         if (millis() - lastUpdate > 200) { 
-            sendEvent("update", currentTime, errorCount);
+            sendEvent(EVENT_UPDATE, currentTime, errorCount);
             updateLCDGame(currentTime, errorCount);
             lastUpdate = millis();
         }
@@ -185,7 +241,7 @@ void loop() {
         if (finishState == LOW) {
             finished = true;
             startBuzzer(2000, 500); // Long beep
-            sendEvent("finish", currentTime, errorCount);
+            sendEvent(EVENT_FINISH, currentTime, errorCount);
             
             lcd.clear();
             lcd.setCursor(0, 0);
@@ -0,0 +1,45 @@
+"""Production gunicorn settings: ``gunicorn -c gunicorn.conf.py app:app``.
+
+Workers are gevent websocket workers. Without SOCKETIO_MESSAGE_QUEUE there
+is a single worker, since an emit from one worker would never reach browsers
+connected to another. With a queue the default is one worker per core, and
+asking for several workers without one fails at startup. Keep
+SOCKETIO_WEBSOCKET_ONLY on (the default here), since long-polling needs
+sticky sessions.
+"""
+import multiprocessing
+import os
+
+# preload_app imports the app in the master; patch before anything creates
+# locks or sockets so workers inherit cooperative primitives.
+from gevent import monkey
+
+monkey.patch_all()
+
+# Background services (UDP listener, presence timer, broadcaster) must start
+# in workers after fork, not in the preloading master.
+os.environ.setdefault('APP_DEFER_BACKGROUND_SERVICES', '1')
+os.environ.setdefault('SOCKETIO_WEBSOCKET_ONLY', '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+_message_queue = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() if _message_queue else 1))
+if workers > 1 and not _message_queue:
+    raise SystemExit(
+        f"WEB_CONCURRENCY={workers} needs SOCKETIO_MESSAGE_QUEUE (redis://... or filesystem://<dir>); "
+        "without it Socket.IO emits stay inside one worker."
+    )
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', '1000'))
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # unset = no access log on the hot path
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+
+    start_background_services()
@@ -0,0 +1,151 @@
+"""Operator endpoints under /api/admin/, guarded by APP_ADMIN_KEY.
+
+The access gate does not apply here. Every request must send the key in an
+``X-Admin-Key`` header. Without APP_ADMIN_KEY the routes answer 404.
+Profiler and tracemalloc state is per worker process. Run one worker while
+profiling, or repeat the call until it reaches the worker you care about.
+"""
+import hmac
+import json
+from functools import wraps
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, send_from_directory, stream_with_context
+
+from career_counselor_chat.service import career_service
+from handler.timing import profiler
+from service import faq_service, memory_service, report_service, results_store, stats_service
+from service.constants import BULK_REPORT_CONCURRENCY, BULK_REPORT_RPM, PROFILE_DIR
+
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_KEY')
+        if not expected:
+            abort(404)
+        provided = request.headers.get('X-Admin-Key', '')
+        if not hmac.compare_digest(provided, expected):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def create_admin_blueprint():
+    admin = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+    @admin.route('/profile', methods=['GET'])
+    @admin_required
+    def profile_status():
+        return jsonify(profiler.status())
+
+    @admin.route('/profile', methods=['POST'])
+    @admin_required
+    def start_profile():
+        payload = request.json or {}
+        endpoint = payload.get('endpoint')
+        if endpoint not in current_app.view_functions or endpoint.startswith('admin.'):
+            return jsonify({'error': f'Unknown endpoint: {endpoint}'}), 400
+        try:
+            requests = max(1, int(payload.get('requests', 5)))
+            interval_ms = float(payload.get('interval_ms', 5))
+            profiler.arm(endpoint, requests, interval_ms)
+        except (TypeError, ValueError) as exc:
+            return jsonify({'error': str(exc)}), 400
+        except RuntimeError as exc:
+            return jsonify({'error': str(exc)}), 409
+        current_app.logger.info(
+            "Profiling next %d requests of %s", requests, endpoint, extra={"component": "admin"}
+        )
+        return jsonify(profiler.status()), 202
+
+    @admin.route('/profile/<path:name>')
+    @admin_required
+    def download_profile(name):
+        return send_from_directory(PROFILE_DIR, name, mimetype='text/plain')
+
+    @admin.route('/memory', methods=['GET'])
+    @admin_required
+    def memory_report():
+        top = request.args.get('top', default=20, type=int)
+        key_type = request.args.get('group_by', 'lineno')
+        if key_type not in ('lineno', 'filename'):
+            return jsonify({'error': 'group_by must be lineno or filename'}), 400
+        return jsonify({
+            'process': memory_service.process_memory(),
+            'gc': memory_service.gc_summary(),
+            'career_service': career_service.memory_stats(),
+            'tracemalloc': memory_service.tracemalloc_report(top, key_type),
+        })
+
+    @admin.route('/memory', methods=['DELETE'])
+    @admin_required
+    def stop_memory_tracing():
+        memory_service.stop_tracing()
+        return '', 204
+
+    @admin.route('/stats')
+    @admin_required
+    def class_stats():
+        grade = request.args.get('grade')
+        class_name = request.args.get('class_name')
+        try:
+            summary = stats_service.get_summary(grade=grade, class_name=class_name)
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        return jsonify({'summary': summary})
+
+    @admin.route('/export/<table>.csv')
+    @admin_required
+    def export_csv(table):
+        """Stored results as CSV; reports and FAQ lookups carry students' own text."""
+        if table not in results_store.EXPORT_COLUMNS:
+            return jsonify({'error': f'Unknown export: {table}'}), 404
+        try:
+            chunks = results_store.iter_csv(
+                table,
+                class_name=request.args.get('class_name'),
+                grade=request.args.get('grade'),
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+            )
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        return Response(
+            chunks,
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={table}.csv'},
+        )
+
+    @admin.route('/faq/<lookup_id>', methods=['POST'])
+    @admin_required
+    def faq_verdict(lookup_id):
+        payload = request.json or {}
+        if not isinstance(payload.get('correct'), bool):
+            return jsonify({'error': 'correct must be true or false'}), 400
+        faq_service.record_verdict(lookup_id, payload['correct'])
+        return '', 204
+
+    @admin.route('/reports/bulk', methods=['POST'])
+    @admin_required
+    def bulk_reports():
+        """Generate a class's missing reports, streaming progress as NDJSON."""
+        payload = request.json or {}
+        class_name = (payload.get('class_name') or '').strip()
+        if not class_name:
+            return jsonify({'error': 'class_name is required'}), 400
+        try:
+            concurrency = max(1, int(payload.get('concurrency', BULK_REPORT_CONCURRENCY)))
+            rate_per_minute = max(0.0, float(payload.get('rate_per_minute', BULK_REPORT_RPM)))
+        except (TypeError, ValueError) as exc:
+            return jsonify({'error': str(exc)}), 400
+        events = report_service.generate_class_reports(
+            class_name,
+            (payload.get('grade') or '').strip() or None,
+            concurrency=concurrency,
+            rate_per_minute=rate_per_minute,
+        )
+        lines = (json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+    return admin
@@ -1,42 +1,83 @@
-from flask import Blueprint, current_app, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, send_file, session, url_for
 import json
+import os
+import random
+import re
+import time
 
 from career_counselor_chat.service import career_service
-from service import model_service, game_service
+from handler import compression, timing
+from handler.timing import timed
+from service import (
+    document_service,
+    faq_service,
+    game_service,
+    hub_monitor,
+    job_service,
+    model_service,
+    report_service,
+    results_store,
+    session_service,
+    telemetry_service,
+)
+from service.broadcast_service import broadcaster
 from service.constants import (
     BEST_STEP1_SESSION_KEY,
     BEST_REFLEX_SESSION_KEY,
+    CAREERS_MAP,
     CHAT_HISTORY_SESSION_KEY,
     CAREER_SUMMARY_SESSION_KEY,
     CHARACTERISTIC_READY_SESSION_KEY,
     CHAT_DONE_SESSION_KEY,
+    DEFAULT_DEVICE_ID,
+    REPORT_LLM_TIMEOUT,
+    REPORT_MODE,
+    REPORT_UPGRADE_MAX_ATTEMPTS,
+    REPORT_UPGRADE_MAX_WAIT,
+    STUDENT_ID_SESSION_KEY,
     TEST_USER_ID,
 )
 
+REPORT_UPGRADE_POLL_SECONDS = 5
+REPORT_UPGRADE_BACKOFF_MAX_SECONDS = 120
+_DIGEST_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def _upgrade_backoff(attempt):
+    """Seconds to wait before retry ``attempt`` (from 1), with equal jitter: half fixed, half random."""
+    ceiling = min(REPORT_UPGRADE_POLL_SECONDS * 2 ** attempt, REPORT_UPGRADE_BACKOFF_MAX_SECONDS)
+    return ceiling * (0.5 + random.random() / 2)
+
+
+def _accuracy_percent():
+    return round(model_service.get_accuracy() * 100, 2) if model_service.get_accuracy() else 0
+
+
+def _build_local_report(student_profile, chat_history, best_step1, best_reflex, test_metrics):
+    with timed('model'):
+        return report_service.build_local(student_profile, chat_history, best_step1, best_reflex, test_metrics)
+
 
 def create_api_blueprint(socketio):
     api = Blueprint('api', __name__)
 
     @api.route('/predict', methods=['POST'])
     def predict():
-        model_service.ensure_model()
+        with timed('model'):
+            model_service.ensure_model()
         try:
             data = request.json or {}
             time_val = float(data['time'])
             errors_val = int(data['errors'])
             score_val = int(data.get('score', 0))
+            features = data.get('features')
+            if features is None and data.get('device_id'):
+                features = game_service.get_run_features(str(data['device_id']))
 
-            model = model_service.ensure_model()
-            prediction = model.predict([[time_val, errors_val, score_val]])[0]
-            group = prediction
+            with timed('model'):
+                group = model_service.predict_group(time_val, errors_val, score_val, features)
 
-            careers_map = {
-                'A': ['Phi công', 'Game thủ', 'Lái xe', 'An ninh mạng'],
-                'B': ['Bác sĩ', 'Thủ công mỹ nghệ', 'Kỹ thuật nha khoa'],
-                'C': ['Kinh tế', 'Sư phạm', 'Luật', 'Ngành ít thao tác tay']
-            }
-
-            suggested_careers = careers_map.get(group, [])
+            suggested_careers = CAREERS_MAP.get(group, [])
             return jsonify({
                 'group': group,
                 'careers': suggested_careers
@@ -44,10 +85,117 @@ def create_api_blueprint(socketio):
         except Exception as exc:
             return jsonify({'error': str(exc)}), 400
 
+    def with_document(report, student_id, digest):
+        if not student_id:
+            return report
+        return dict(report, document_id=digest, download=document_service.links(digest))
+
+    def llm_report(student_id, student_profile, chat_history, test_metrics, *, digest, user_id, timeout=None):
+        # Own metrics slot: TEST_USER_ID is shared and may have moved on.
+        career_service.update_test_metrics(user_id=user_id, **test_metrics)
+        try:
+            report = career_service.generate_final_report(
+                student_profile=student_profile,
+                chat_history=chat_history,
+                user_id=user_id,
+                timeout=timeout,
+            )
+        finally:
+            career_service.reset_test_metrics(user_id=user_id)
+        report['source'] = 'llm'
+        results_store.record_report(student_id, student_profile, report)
+        document_service.store(student_id, digest, report, created_at=time.time())
+        return with_document(report, student_id, digest)
+
+    def upgrade_report(app, student_id, student_profile, chat_history, test_metrics, digest):
+        """Replace a local report with the LLM's once it has capacity again.
+
+        Every failed attempt backs off exponentially, whether or not it marked
+        the agent degraded, and at most REPORT_UPGRADE_MAX_ATTEMPTS are made.
+        """
+        deadline = time.monotonic() + REPORT_UPGRADE_MAX_WAIT
+        with app.app_context():
+            for attempt in range(REPORT_UPGRADE_MAX_ATTEMPTS):
+                if attempt:
+                    socketio.sleep(min(_upgrade_backoff(attempt), max(deadline - time.monotonic(), 0)))
+                # Jitter so queued upgrades do not all retry at once.
+                while career_service.llm_degraded() and time.monotonic() < deadline:
+                    socketio.sleep(REPORT_UPGRADE_POLL_SECONDS * (1 + random.random()))
+                if time.monotonic() >= deadline:
+                    break
+                try:
+                    report = llm_report(
+                        student_id, student_profile, chat_history, test_metrics,
+                        digest=digest, user_id=f"upgrade-{student_id}", timeout=REPORT_LLM_TIMEOUT,
+                    )
+                except Exception:
+                    app.logger.exception("Report upgrade failed for %s", student_id, extra={"component": "report"})
+                    continue
+                socketio.emit('report_upgraded', report, to=session_service.student_room(student_id))
+                return
+            app.logger.warning(
+                "Gave up upgrading local report for %s", student_id,
+                extra={"component": "report"},
+            )
+
+    def local_report_for(
+        app, student_id, student_profile, chat_history, best_step1, best_reflex, test_metrics, digest
+    ):
+        report = _build_local_report(student_profile, chat_history, best_step1, best_reflex, test_metrics)
+        results_store.record_report(student_id, student_profile, report)
+        if student_id and REPORT_MODE == 'auto':
+            report['upgrade_pending'] = True
+            socketio.start_background_task(
+                upgrade_report, app, student_id, student_profile, list(chat_history), test_metrics, digest
+            )
+        return report
+
+    def final_report_job(
+        app, student_id, student_profile, chat_history, best_step1, best_reflex, test_metrics, digest
+    ):
+        with app.app_context():
+            try:
+                return llm_report(
+                    student_id, student_profile, chat_history, test_metrics,
+                    digest=digest,
+                    user_id=f"report-{student_id or TEST_USER_ID}",
+                    timeout=REPORT_LLM_TIMEOUT if REPORT_MODE == 'auto' else None,
+                )
+            except Exception as exc:
+                if REPORT_MODE != 'auto':
+                    raise
+                app.logger.warning(
+                    "Agent report failed, answering locally: %r", exc, extra={"component": "report"}
+                )
+                return local_report_for(
+                    app, student_id, student_profile, chat_history, best_step1, best_reflex, test_metrics, digest
+                )
+
+    def mark_tests_completed():
+        session['tests_in_progress'] = False
+        session['tests_completed'] = True
+
+    def job_accepted(job):
+        status_url = url_for('api.job_status', job_id=job['id'])
+        response = jsonify({'job_id': job['id'], 'status': job['status'], 'status_url': status_url})
+        response.status_code = 202
+        response.headers['Location'] = status_url
+        return response
+
+    def jobs_full():
+        response = jsonify({'error': 'Hệ thống đang bận, bạn vui lòng thử lại sau ít phút.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
     @api.route('/api/final_report', methods=['POST'])
     def generate_final_report():
         payload = request.json or {}
-        current_app.logger.info("Final report payload: %s", payload)
+        current_app.logger.info(
+            "Final report requested with keys %s",
+            sorted(payload),
+            extra={"component": "report"},
+        )
         student_profile = payload.get('student_info') or session.get('student_info')
         if not student_profile:
             return jsonify({'error': 'Chưa có thông tin học sinh.'}), 400
@@ -66,25 +214,58 @@ def create_api_blueprint(socketio):
                 )
             }), 400
 
-        try:
-            career_service.update_test_metrics(
-                user_id=TEST_USER_ID,
-                ingenuous={'time': best_step1.get('time'), 'mistake': best_step1.get('errors')},
-                reflex={'time': best_reflex.get('time'), 'quantity': best_reflex.get('quantity')},
-            )
-            report = career_service.generate_final_report(
+        student_id = session.get(STUDENT_ID_SESSION_KEY)
+        if not student_id:
+            return jsonify({'error': 'Chưa có thông tin học sinh.'}), 400
+        digest = document_service.input_digest(student_profile, best_step1, best_reflex, chat_history)
+        cached = document_service.load(student_id, digest)
+        if cached is not None:
+            mark_tests_completed()
+            return jsonify(with_document(cached, student_id, digest))
+
+        career_service.update_test_metrics(
+            user_id=TEST_USER_ID,
+            ingenuous={'time': best_step1.get('time'), 'mistake': best_step1.get('errors')},
+            reflex={'time': best_reflex.get('time'), 'quantity': best_reflex.get('quantity')},
+        )
+        args = (
+            current_app._get_current_object(),
+            student_id,
+            student_profile,
+            list(chat_history),
+            best_step1,
+            best_reflex,
+            career_service.get_test_metrics(TEST_USER_ID),
+            digest,
+        )
+        if REPORT_MODE == 'local' or (REPORT_MODE == 'auto' and career_service.llm_degraded()):
+            report = local_report_for(*args)
+            mark_tests_completed()
+            return jsonify(report)
+        job = job_service.submit('final_report', student_id, final_report_job, *args)
+        if job is not None:
+            # The job stores the report; session_service.tests_completed() finds it.
+            return job_accepted(job)
+        if REPORT_MODE == 'auto':
+            report = local_report_for(*args)
+            mark_tests_completed()
+            return jsonify(report)
+        return jobs_full()
+
+    def university_job(app, student_profile, chat_history, career_summary, user_id):
+        with app.app_context():
+            if not career_summary:
+                career_summary = career_service.generate_career_summary(
+                    student_profile=student_profile,
+                    chat_history=chat_history,
+                    user_id=user_id,
+                )
+            recommendations = career_service.generate_university_recommendations(
+                career_summary=career_summary,
                 student_profile=student_profile,
-                chat_history=chat_history,
-                user_id=TEST_USER_ID,
+                user_id=user_id,
             )
-            session['tests_in_progress'] = False
-            session['tests_completed'] = True
-            return jsonify(report)
-        except ValueError as exc:
-            return jsonify({'error': str(exc)}), 400
-        except Exception:
-            current_app.logger.exception("Failed to generate final report")
-            return jsonify({'error': 'Không thể tạo báo cáo cuối.'}), 500
+            return {'recommendations': recommendations}
 
     @api.route('/api/university_recommendations', methods=['POST'])
     def university_recommendations():
@@ -93,38 +274,65 @@ def create_api_blueprint(socketio):
         if not student_profile:
             return jsonify({'error': 'Chưa có thông tin học sinh.'}), 400
         fit_jobs = (payload.get('fit_jobs') or '').strip()
+        chat_history = []
         if fit_jobs:
             career_summary = f"Ngành nghề phù hợp: {fit_jobs}"
         else:
             chat_history = session.get(CHAT_HISTORY_SESSION_KEY, [])
             if not chat_history:
                 return jsonify({'error': 'Chưa có lịch sử trò chuyện.'}), 400
-
+            # A summary generated inside the job is not written back to the cookie session.
             career_summary = session.get(CAREER_SUMMARY_SESSION_KEY)
-            if not career_summary:
-                try:
-                    career_summary = career_service.generate_career_summary(
-                        student_profile=student_profile,
-                        chat_history=chat_history,
-                        user_id=TEST_USER_ID,
-                    )
-                    session[CAREER_SUMMARY_SESSION_KEY] = career_summary
-                except Exception:
-                    current_app.logger.exception("Failed to generate career summary for university search")
-                    return jsonify({'error': 'Không thể tạo tóm tắt nghề nghiệp.'}), 500
 
+        student_id = session.get(STUDENT_ID_SESSION_KEY)
+        if not student_id:
+            return jsonify({'error': 'Chưa có thông tin học sinh.'}), 400
+        job = job_service.submit(
+            'university_recommendations',
+            student_id,
+            university_job,
+            current_app._get_current_object(),
+            student_profile,
+            list(chat_history),
+            career_summary,
+            f"university-{student_id or TEST_USER_ID}",
+        )
+        if job is None:
+            return jobs_full()
+        return job_accepted(job)
+
+    @api.route('/api/jobs/<job_id>')
+    def job_status(job_id):
+        job = job_service.get(job_id, owner=session.get(STUDENT_ID_SESSION_KEY))
+        if job is None:
+            return jsonify({'error': 'Không tìm thấy yêu cầu.'}), 404
+        return jsonify(job_service.public_view(job))
+
+    @api.route('/api/report/<digest>.<fmt>')
+    def download_report(digest, fmt):
+        student_id = session.get(STUDENT_ID_SESSION_KEY)
+        if not student_id or fmt not in document_service.FORMATS or not _DIGEST_RE.fullmatch(digest):
+            return jsonify({'error': 'Không tìm thấy báo cáo.'}), 404
         try:
-            recommendations = career_service.generate_university_recommendations(
-                career_summary=career_summary,
-                student_profile=student_profile,
-                user_id=TEST_USER_ID,
-            )
-            return jsonify({'recommendations': recommendations})
-        except ValueError as exc:
-            return jsonify({'error': str(exc)}), 400
+            path = document_service.render(student_id, digest, fmt)
+        except RuntimeError as exc:
+            return jsonify({'error': str(exc)}), 501
         except Exception:
-            current_app.logger.exception("Failed to generate university recommendations")
-            return jsonify({'error': 'Không thể tìm đại học phù hợp.'}), 500
+            current_app.logger.exception("Failed to render report %s as %s", digest, fmt)
+            return jsonify({'error': 'Không thể tạo tệp báo cáo.'}), 500
+        if path is None:
+            return jsonify({'error': 'Không tìm thấy báo cáo.'}), 404
+        # Documents never change once written.
+        response = send_file(
+            os.path.abspath(path),
+            mimetype=document_service.FORMATS[fmt],
+            as_attachment=fmt == 'pdf',
+            download_name=f"bao-cao-{digest[:8]}.{fmt}",
+            max_age=31536000,
+        )
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
 
     @api.route('/chat', methods=['POST'])
     def chat_with_ai():
@@ -141,6 +349,22 @@ def create_api_blueprint(socketio):
         if not message:
             return jsonify({'error': 'Missing message'}), 400
 
+        with timed('faq'):
+            faq = faq_service.lookup(
+                message,
+                student_id=session.get(STUDENT_ID_SESSION_KEY),
+                profile=student_profile,
+                accuracy=_accuracy_percent(),
+            )
+        if faq is not None:
+            # Procedural questions are not part of the counselling transcript.
+            return jsonify({
+                'reply': faq.answer,
+                'characteristic_ready': session.get(CHARACTERISTIC_READY_SESSION_KEY, False),
+                'chat_done': False,
+                'faq': faq.intent,
+            })
+
         try:
             enriched_message = message
             if student_profile:
@@ -152,7 +376,8 @@ def create_api_blueprint(socketio):
                 )
                 enriched_message = info_str
             session.pop(CAREER_SUMMARY_SESSION_KEY, None)
-            agent_reply = career_service.ask(enriched_message, user_id=TEST_USER_ID).text
+            with timed('agent'):
+                agent_reply = career_service.ask(enriched_message, user_id=TEST_USER_ID).text
             parsed_reply = agent_reply
             try:
                 reply_data = json.loads(agent_reply)
@@ -171,6 +396,8 @@ def create_api_blueprint(socketio):
             chat_history.append({"role": "user", "text": message})
             chat_history.append({"role": "assistant", "text": parsed_reply})
             session[CHAT_HISTORY_SESSION_KEY] = chat_history
+            if session.get(STUDENT_ID_SESSION_KEY):
+                results_store.record_chat(session.get(STUDENT_ID_SESSION_KEY), student_profile, chat_history)
             if not chat_done:
                 for entry in chat_history:
                     if entry.get("role") == "assistant" and career_service.is_chat_done(
@@ -187,25 +414,10 @@ def create_api_blueprint(socketio):
             })
         except Exception:
             current_app.logger.exception("Career agent failed, returning fallback response")
-            normalized = message.lower()
-            if 'accuracy' in normalized or 'độ chính xác' in normalized:
-                acc_val = round(model_service.get_accuracy() * 100, 2) if model_service.get_accuracy() else 0
-                response = f"Độ chính xác hiện tại của mô hình là khoảng {acc_val}% dựa trên dữ liệu huấn luyện."
-            elif 'bước' in normalized or 'quy trình' in normalized:
-                response = (
-                    "Bạn hoàn thành 2 bước: (1) Nhập kết quả Wire Loop hoặc nhận từ thiết bị ESP32; "
-                    "(2) Chơi đập chuột 10 giây. Sau đó nhấn Phân Tích để xem gợi ý nghề."
-                )
-            elif 'nhóm' in normalized or 'group' in normalized:
-                response = (
-                    "Nhóm A thiên về phản xạ nhanh, Nhóm B chú trọng sự khéo léo, "
-                    "còn Nhóm C phù hợp tư duy phân tích với ít thao tác tay."
-                )
-            else:
-                response = (
-                    "Xin chào! Tính năng tư vấn nghề thông minh đang có lỗi tạm thời, "
-                    "bạn có thể hỏi về quy trình kiểm tra, kết quả hoặc cách hệ thống tư vấn nghề."
-                )
+            response = faq_service.best_answer(message, accuracy=_accuracy_percent()) or (
+                "Xin chào! Tính năng tư vấn nghề thông minh đang có lỗi tạm thời, "
+                "bạn có thể hỏi về quy trình kiểm tra, kết quả hoặc cách hệ thống tư vấn nghề."
+            )
             return jsonify({'reply': response, 'fallback': True}), 200
 
     @api.route('/api/student_info', methods=['POST'])
@@ -223,40 +435,66 @@ def create_api_blueprint(socketio):
             'grade': grade,
             'class_name': class_name,
         }
-        return jsonify({'message': 'Đã lưu thông tin học sinh.', 'student_info': student_info}), 200
+        student_id = session.get(STUDENT_ID_SESSION_KEY) or results_store.new_student_id()
+        session[STUDENT_ID_SESSION_KEY] = student_id
+        session['student_info'] = student_info
+        results_store.save_student(student_id, student_info)
+        return jsonify({
+            'message': 'Đã lưu thông tin học sinh.',
+            'student_info': student_info,
+            'student_id': student_id,
+        }), 200
 
     @api.route('/api/game_event', methods=['POST'])
     def game_event_http():
         try:
             data = request.json or {}
-            current_app.logger.info("RAW DATA FROM ESP32 (HTTP): %s", data)
+            current_app.logger.debug(
+                "Device event (HTTP): %s",
+                data,
+                extra={"component": "device", "sampled": True},
+            )
             event = data.get('event')
+            device_id = str(data.get('device_id') or DEFAULT_DEVICE_ID)
+            seq = data.get('seq')
+            boot = data.get('boot')
             response_payload = {"status": "ok"}
+            if data.get('device_id'):
+                game_service.touch_device(device_id)
 
+            if event == 'heartbeat':
+                game_service.record_heartbeat(device_id, seq)
+                return jsonify(response_payload)
             if event == 'start':
-                game_service.mark_game_start()
-                current_app.logger.info(">>> GAME STARTED")
+                accepted = game_service.mark_game_start(device_id, seq, boot)
+                current_app.logger.info("Game started on %s", device_id, extra={"component": "device"})
             elif event == 'update':
-                game_service.update_game_state(
-                    float(data.get('time', 0)),
-                    int(data.get('errors', 0)),
-                )
+                time_val, errors_val = game_service.validate_reading(data.get('time') or 0, data.get('errors') or 0)
+                accepted = game_service.update_game_state(time_val, errors_val, device_id, seq, boot)
             elif event == 'finish':
-                time_val = float(data.get('time') or 0)
-                errors_val = int(data.get('errors') or 0)
-                _, best_value, improved = game_service.mark_game_finish(time_val, errors_val)
-                response_payload.update({
-                    "best": best_value,
-                    "improved": improved,
-                })
-
-            socket_payload = dict(game_service.get_current_game_state())
+                time_val, errors_val = game_service.validate_reading(data.get('time') or 0, data.get('errors') or 0)
+                accepted = game_service.mark_game_finish(
+                    time_val, errors_val, device_id, seq, boot, station=data.get('station')
+                )
+                if accepted:
+                    _, best_value, improved = accepted
+                    response_payload.update({
+                        "best": best_value,
+                        "improved": improved,
+                    })
+            else:
+                accepted = True
+
+            if not accepted:
+                return jsonify({"status": "stale"})
+
+            extra = None
             if event == 'finish':
-                socket_payload.update({
+                extra = {
                     "best": response_payload.get("best"),
                     "improved": response_payload.get("improved"),
-                })
-            socketio.emit('game_update', socket_payload)
+                }
+            broadcaster.publish(device_id, immediate=event in ('start', 'finish'), extra=extra)
             return jsonify(response_payload)
         except Exception as exc:
             current_app.logger.exception("Error processing ESP32 data")
@@ -278,12 +516,30 @@ def create_api_blueprint(socketio):
         except Exception as exc:
             return jsonify({"error": str(exc)}), 400
 
+    @api.route('/api/metrics')
+    def metrics():
+        return jsonify({
+            "broadcast": broadcaster.get_metrics(),
+            "telemetry": telemetry_service.get_metrics(),
+            "http_compression": compression.get_metrics(),
+            "http_timing": timing.get_metrics(),
+            "hub": hub_monitor.get_metrics(),
+            "faq": faq_service.get_metrics(),
+            "jobs": job_service.get_metrics(),
+            "report_documents": document_service.get_metrics(),
+            "report": {"mode": REPORT_MODE, "llm_degraded": career_service.llm_degraded()},
+        })
+
     @api.route('/health')
     def health_check():
         status = {
             "status": "ok",
             "model_loaded": model_service.is_model_loaded(),
             "game_state": game_service.get_current_game_state().get('status'),
+            "devices": {
+                state.device_id: state.status for state in game_service.list_devices()
+            },
+            "presence": game_service.get_presence(),
         }
         return jsonify(status), 200
 
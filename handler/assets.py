@@ -0,0 +1,107 @@
+"""Serve the fingerprinted assets produced by ``python -m tools.build_assets``.
+
+When ``static/dist/manifest.json`` exists:
+
+* ``url_for('static', filename='js/tests.js')`` resolves to the hashed copy
+  (``dist/js/tests.3f2a9c1d.js``);
+* files under ``dist/`` are served with ``Cache-Control: immutable`` and,
+  when the client accepts it, from their ``.br``/``.gz`` siblings;
+* templates get ``assets_built`` so they can drop the CDN tags.
+
+Without a build everything falls back to the plain files and CDNs.
+"""
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+from service.constants import ASSET_MANIFEST_FILE, SOCKETIO_CLIENT_VERSION, STATIC_DIST_DIR
+
+SOCKETIO_CDN_URL = f"https://cdn.socket.io/{SOCKETIO_CLIENT_VERSION}/socket.io.min.js"
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# (Accept-Encoding token, file suffix), best first.
+_PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_manifest(static_folder: str):
+    path = os.path.join(static_folder, STATIC_DIST_DIR, ASSET_MANIFEST_FILE)
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def _accepts(encoding: str) -> bool:
+    return request.accept_encodings[encoding] > 0
+
+
+def init_assets(app):
+    manifest = load_manifest(app.static_folder)
+    files = manifest.get('files', {})
+    images = manifest.get('images', {})
+    fonts = manifest.get('preload_fonts', [])
+    app.extensions['asset_manifest'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static':
+            hashed = files.get(values.get('filename'))
+            if hashed:
+                values['filename'] = hashed
+
+    def serve_static(filename):
+        if not filename.startswith(STATIC_DIST_DIR + '/'):
+            return current_app.send_static_file(filename)
+        static_folder = current_app.static_folder
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in _PRECOMPRESSED:
+            if os.path.isfile(os.path.join(static_folder, filename + suffix)) and _accepts(encoding):
+                response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(static_folder, filename, mimetype=mimetype)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = serve_static
+
+    def responsive_image(filename, alt='', sizes='100vw', class_='', loading='lazy', **attrs):
+        """``<picture>`` with AVIF/WebP sources for a built image, plain ``<img>`` otherwise."""
+        attrs = {'alt': alt, 'class': class_, 'loading': loading, 'decoding': 'async', **attrs}
+        entry = images.get(filename)
+        if entry:
+            attrs.setdefault('width', entry['width'])
+            attrs.setdefault('height', entry['height'])
+        img_attrs = ' '.join(
+            f'{name}="{escape(value)}"' for name, value in attrs.items() if value not in (None, '')
+        )
+        img = f'<img src="{escape(url_for("static", filename=filename))}" {img_attrs}>'
+        if not entry:
+            return Markup(img)
+        sources = []
+        for fmt, variants in entry['sources'].items():
+            srcset = ', '.join(
+                f"{url_for('static', filename=path)} {width}w" for width, path in variants
+            )
+            sources.append(
+                f'<source type="image/{escape(fmt)}" srcset="{escape(srcset)}" sizes="{escape(sizes)}">'
+            )
+        return Markup(f"<picture>{''.join(sources)}{img}</picture>")
+
+    @app.context_processor
+    def inject_assets():
+        return {
+            'assets_built': 'css/app.css' in files,
+            'preload_fonts': fonts,
+            'socketio_client_url': (
+                url_for('static', filename='vendor/socket.io.min.js')
+                if 'vendor/socket.io.min.js' in files
+                else SOCKETIO_CDN_URL
+            ),
+            'responsive_image': responsive_image,
+        }
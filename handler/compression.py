@@ -0,0 +1,215 @@
+"""Response compression, strong ETags and conditional GETs.
+
+``init_compression(app)`` installs an after_request hook that, for HTML,
+JSON, CSS and JS responses:
+
+* tags GET/HEAD 200 responses with a strong ETag over the uncompressed body
+  and answers a matching ``If-None-Match`` with 304;
+* tags JSON answers to other methods with an ETag too, so clients can tell
+  whether a regenerated report changed (no 304 there: RFC 9110 only makes
+  GET/HEAD conditional that way);
+* gzip- or brotli-encodes bodies of at least COMPRESSION_MIN_BYTES. The
+  encoded representation gets its own ETag (``"<tag>-br"``) as strong
+  validators must differ per encoding.
+
+``render_template_cached`` computes a page's ETag from the template files
+and its context before rendering, so a revalidation costs no rendering.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app, make_response, render_template, request
+
+from service.constants import COMPRESSION_MIN_BYTES, COMPRESSION_STATIC_MAX_BYTES, SOCKETIO_WEBSOCKET_ONLY
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'image/svg+xml',
+}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # dynamic content: level 11 costs too much CPU per response
+PAGE_CACHE_CONTROL = 'private, no-cache'
+_ENCODING_SUFFIXES = ('-br', '-gz')
+_SIZE_CACHE_LIMIT = 1024
+
+_lock = threading.Lock()
+_metrics = {
+    'compressed_responses': 0,
+    'bytes_before_compression': 0,
+    'bytes_after_compression': 0,
+    'not_modified': 0,
+    'not_modified_bytes_saved': 0,
+    'renders_skipped': 0,
+}
+# ETag -> identity body size, to credit 304s with the bytes they saved.
+_sizes = OrderedDict()
+
+
+def get_metrics():
+    with _lock:
+        metrics = dict(_metrics)
+    metrics['compression_bytes_saved'] = (
+        metrics['bytes_before_compression'] - metrics['bytes_after_compression']
+    )
+    return metrics
+
+
+def _count(**deltas):
+    with _lock:
+        for key, value in deltas.items():
+            _metrics[key] += value
+
+
+def _remember_size(etag: str, size: int):
+    with _lock:
+        _sizes[etag] = size
+        _sizes.move_to_end(etag)
+        while len(_sizes) > _SIZE_CACHE_LIMIT:
+            _sizes.popitem(last=False)
+
+
+def _client_etags():
+    """If-None-Match tags with any encoding suffix removed."""
+    tags = set()
+    for tag in request.if_none_match.as_set():
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[: -len(suffix)]
+                break
+        tags.add(tag)
+    return tags
+
+
+def _is_fresh(etag: str) -> bool:
+    return request.method in ('GET', 'HEAD') and (
+        etag in _client_etags() or request.if_none_match.star_tag
+    )
+
+
+def _not_modified(etag: str, cache_control=None):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    with _lock:
+        saved = _sizes.get(etag, 0)
+    _count(not_modified=1, not_modified_bytes_saved=saved)
+    return response
+
+
+def _template_version(app) -> str:
+    """Latest mtime under the template folder; changes whenever a template does."""
+    newest = 0.0
+    for folder, _dirs, names in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in names:
+            newest = max(newest, os.path.getmtime(os.path.join(folder, name)))
+    return repr(newest)
+
+
+def render_template_cached(template_name: str, **context):
+    """render_template with an ETag derived from its inputs, checked before rendering."""
+    app = current_app._get_current_object()
+    manifest = app.extensions.get('asset_manifest', {})
+    key = json.dumps(
+        [
+            template_name,
+            _template_version(app),
+            request.script_root,
+            SOCKETIO_WEBSOCKET_ONLY,
+            manifest.get('files', {}),
+            context,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    if _is_fresh(etag):
+        _count(renders_skipped=1)
+        return _not_modified(etag, PAGE_CACHE_CONTROL)
+    response = make_response(render_template(template_name, **context))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = PAGE_CACHE_CONTROL
+    return response
+
+
+def _preferred_encoding():
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br'] > 0:
+        return 'br'
+    if encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def process_response(response):
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    if response.is_streamed:
+        # Generators (CSV export) and files: only small static files are read in.
+        if not (
+            response.direct_passthrough
+            and request.endpoint == 'static'
+            and response.content_length is not None
+            and response.content_length <= COMPRESSION_STATIC_MAX_BYTES
+        ):
+            return response
+        response.direct_passthrough = False
+
+    data = response.get_data()
+    etag, weak = response.get_etag()
+    if etag is None or weak:
+        if request.method in ('GET', 'HEAD') or response.mimetype == 'application/json':
+            etag = hashlib.sha256(data).hexdigest()[:32]
+            response.set_etag(etag)
+    if etag:
+        _remember_size(etag, len(data))
+        if _is_fresh(etag):
+            return _not_modified(etag, response.headers.get('Cache-Control'))
+
+    response.vary.add('Accept-Encoding')
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+    encoding = _preferred_encoding()
+    if encoding is None:
+        return response
+    compressed = _compress(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(f"{etag}-{'br' if encoding == 'br' else 'gz'}")
+    _count(
+        compressed_responses=1,
+        bytes_before_compression=len(data),
+        bytes_after_compression=len(compressed),
+    )
+    return response
+
+
+def init_compression(app):
+    app.after_request(process_response)
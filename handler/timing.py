@@ -0,0 +1,251 @@
+"""Per-request timing: Server-Timing headers, endpoint histograms, profiler.
+
+``init_timing(app)`` times every request and the phases inside it:
+
+* ``session``: cookie session decode and encode (wrapped session interface);
+* ``render``: Jinja rendering, via Flask's template signals;
+* anything wrapped in ``with timed('model'):`` / ``timed('agent')`` at the
+  call sites in app.py and handler/api.py.
+
+Each response carries ``Server-Timing: total;dur=.., session;dur=.., ...``.
+Totals feed a per-endpoint histogram with fixed millisecond buckets, see
+``get_metrics()``.
+
+``profiler.arm(endpoint, requests, interval_ms)`` (admin route in
+handler/admin.py) arms a SIGPROF sampling profiler for
+the next N requests of that endpoint, one at a time. Only samples taken
+while the profiled request's greenlet is running are kept. The result is
+written as folded stacks (``frame;frame;frame count``), the input format of
+flamegraph.pl and speedscope.
+"""
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, template_rendered, before_render_template
+from flask.sessions import SecureCookieSessionInterface
+
+from service.constants import PROFILE_DIR
+
+try:
+    from gevent import getcurrent
+except ImportError:  # pragma: no cover - gevent is a hard dependency in prod
+    getcurrent = threading.current_thread
+
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+MAX_STACK_DEPTH = 128
+
+_lock = threading.Lock()
+_histograms = {}
+
+
+@contextmanager
+def timed(name: str):
+    """Add the block's duration to the current request's ``name`` phase."""
+    if not has_app_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_phase(name, (time.perf_counter() - started) * 1000)
+
+
+def _add_phase(name: str, elapsed_ms: float):
+    phases = g.setdefault('_timing_phases', {})
+    phases[name] = phases.get(name, 0.0) + elapsed_ms
+
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    def open_session(self, app, request):
+        started = time.perf_counter()
+        try:
+            return super().open_session(app, request)
+        finally:
+            _add_phase('session', (time.perf_counter() - started) * 1000)
+
+    def save_session(self, app, session, response):
+        started = time.perf_counter()
+        try:
+            return super().save_session(app, session, response)
+        finally:
+            # save_session runs after the after_request hooks have built the
+            # header, so the encode time is appended to it here.
+            _append_server_timing(response, 'session-save', (time.perf_counter() - started) * 1000)
+
+
+def _append_server_timing(response, name, elapsed_ms):
+    entry = f"{name};dur={elapsed_ms:.2f}"
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = f"{existing}, {entry}" if existing else entry
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        index = len(HISTOGRAM_BUCKETS_MS)
+        for position, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if value_ms <= bound:
+                index = position
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def as_dict(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(HISTOGRAM_BUCKETS_MS, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 2),
+            'buckets': buckets,
+        }
+
+
+def _observe(endpoint: str, phases: dict, total_ms: float):
+    with _lock:
+        for name, value in (('total', total_ms), *phases.items()):
+            key = (endpoint, name)
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = _Histogram()
+            histogram.observe(value)
+
+
+def get_metrics():
+    with _lock:
+        snapshot = {key: histogram.as_dict() for key, histogram in _histograms.items()}
+    metrics = {}
+    for (endpoint, phase), values in sorted(snapshot.items()):
+        metrics.setdefault(endpoint, {})[phase] = values
+    return metrics
+
+
+class SamplingProfiler:
+    """SIGPROF-driven stack sampler for the next N requests of one endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoint = None
+        self.remaining = 0
+        self.interval = 0.005
+        self._target = None
+        self._stacks = Counter()
+        self._samples = 0
+        self.last_output = None
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(signal, 'setitimer') and hasattr(signal, 'SIGPROF')
+
+    def arm(self, endpoint: str, requests: int, interval_ms: float):
+        if not self.available():
+            raise RuntimeError("SIGPROF sampling is not available on this platform")
+        with self._lock:
+            if self.remaining:
+                raise RuntimeError(f"already profiling {self.endpoint}")
+            self.endpoint = endpoint
+            self.remaining = requests
+            self.interval = max(interval_ms, 1.0) / 1000.0
+            self._stacks = Counter()
+            self._samples = 0
+        signal.signal(signal.SIGPROF, self._on_sample)
+
+    def status(self):
+        return {
+            'endpoint': self.endpoint,
+            'remaining_requests': self.remaining,
+            'samples': self._samples,
+            'last_output': self.last_output,
+        }
+
+    def begin(self, endpoint):
+        if endpoint != self.endpoint or not self.remaining or self._target is not None:
+            return False
+        self._target = getcurrent()
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return True
+
+    def end(self):
+        if self._target is None or self._target is not getcurrent():
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        self._target = None
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.last_output = self._dump()
+
+    def _on_sample(self, _signum, frame):
+        if self._target is None or getcurrent() is not self._target:
+            return
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            stack.append(f"{module}:{code.co_name}:{code.co_firstlineno}")
+            frame = frame.f_back
+        self._stacks[';'.join(reversed(stack))] += 1
+        self._samples += 1
+
+    def _dump(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{self.endpoint}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        path = os.path.join(PROFILE_DIR, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            for stack, count in self._stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+        return name
+
+
+profiler = SamplingProfiler()
+
+
+def init_timing(app):
+    app.session_interface = TimedSessionInterface()
+
+    @app.before_request
+    def start_request_timer():
+        g._timing_started = time.perf_counter()
+        g._timing_profiled = profiler.begin(request.endpoint)
+
+    def on_before_render(sender, template, context, **extra):
+        g._timing_render_started = time.perf_counter()
+
+    def on_rendered(sender, template, context, **extra):
+        started = g.pop('_timing_render_started', None)
+        if started is not None:
+            _add_phase('render', (time.perf_counter() - started) * 1000)
+
+    before_render_template.connect(on_before_render, app)
+    template_rendered.connect(on_rendered, app)
+
+    @app.after_request
+    def add_server_timing(response):
+        started = g.get('_timing_started')
+        if started is None:
+            return response
+        total_ms = (time.perf_counter() - started) * 1000
+        phases = dict(g.get('_timing_phases', {}))
+        entries = [f"total;dur={total_ms:.2f}"]
+        entries += [f"{name};dur={value:.2f}" for name, value in phases.items()]
+        response.headers['Server-Timing'] = ', '.join(entries)
+        _observe(request.endpoint or 'unmatched', phases, total_ms)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(_exc):
+        if g.get('_timing_profiled'):
+            profiler.end()
@@ -0,0 +1,20 @@
+"""Production entry point: ``python serve.py [extra gunicorn args]``.
+
+Equivalent to ``gunicorn -c gunicorn.conf.py app:app``; worker count,
+message queue and transports are configured through the environment
+(see gunicorn.conf.py and docs/production.md).
+"""
+import os
+import sys
+
+
+def main(argv=None):
+    from gunicorn.app.wsgiapp import run
+
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    sys.argv = ['gunicorn', '-c', config, *(sys.argv[1:] if argv is None else argv), 'app:app']
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,38 @@ from . import constants
 from . import model_service
 from . import game_service
 from . import session_service
+from . import results_store
+from . import stats_service
+from . import telemetry_service
+from . import broadcast_service
+from . import journal_service
+from . import telemetry_features
+from . import logging_setup
+from . import hub_monitor
+from . import memory_service
+from . import faq_service
+from . import job_service
+from . import report_service
+from . import document_service
+from . import training_store
 
 __all__ = [
     "constants",
     "model_service",
     "game_service",
     "session_service",
+    "results_store",
+    "stats_service",
+    "telemetry_service",
+    "broadcast_service",
+    "journal_service",
+    "telemetry_features",
+    "logging_setup",
+    "hub_monitor",
+    "memory_service",
+    "faq_service",
+    "job_service",
+    "report_service",
+    "document_service",
+    "training_store",
 ]
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+
+from . import game_service
+from .constants import BROADCAST_FPS, BROADCAST_KEYFRAME_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class GameBroadcaster:
+    """Sits between game_service and Socket.IO and rate-limits game_update.
+
+    Updates are coalesced latest-wins per device and flushed at most
+    ``fps`` times per second; each emit carries only the fields that changed
+    since the previous one plus a per-device broadcast sequence (``bseq``) so
+    clients can spot a gap. ``start`` and ``finish`` bypass the frame clock
+    and flush immediately as full frames.
+
+    Every ``keyframe_seconds`` each online device also gets a full frame
+    carrying its presence. With several workers only the one that owns the
+    device sees its events, so a client that missed a delta, or that paired
+    through another worker, catches up at the next keyframe.
+    """
+
+    def __init__(self, fps: float = BROADCAST_FPS, keyframe_seconds: float = BROADCAST_KEYFRAME_SECONDS):
+        self._socketio = None
+        self._interval = 1.0 / fps if fps > 0 else 0.0
+        self._keyframe_seconds = keyframe_seconds
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_sent = {}
+        self._bseq = {}
+        self._task = None
+        self._metrics = {
+            'published': 0,
+            'broadcasts': 0,
+            'immediate_broadcasts': 0,
+            'coalesced_frames': 0,
+            'unchanged_frames': 0,
+            'keyframes': 0,
+        }
+
+    def init_app(self, socketio):
+        self._socketio = socketio
+
+    def start(self):
+        """Start the frame clock now rather than on the first publish."""
+        self._ensure_task()
+
+    def publish(self, device_id: str, *, immediate: bool = False, extra=None):
+        with self._lock:
+            self._metrics['published'] += 1
+            if device_id in self._pending:
+                self._metrics['coalesced_frames'] += 1
+                if extra:
+                    self._pending[device_id].update(extra)
+            else:
+                self._pending[device_id] = dict(extra or {})
+        if immediate or not self._interval:
+            self._flush_device(device_id, immediate=True)
+        else:
+            self._ensure_task()
+
+    def full_state(self, device_id: str):
+        """Snapshot for a newly paired client; deltas continue from its bseq."""
+        state = game_service.get_current_game_state(device_id)
+        with self._lock:
+            state['bseq'] = self._bseq.get(device_id, 0)
+        state['full'] = True
+        state['online'] = game_service.is_device_online(device_id)
+        return state
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending_devices'] = len(self._pending)
+        return metrics
+
+    def _ensure_task(self):
+        if self._task is None and self._socketio is not None:
+            self._task = self._socketio.start_background_task(self._run)
+
+    def _run(self):
+        interval = self._interval or 0.2
+        next_keyframe = time.monotonic() + self._keyframe_seconds
+        while True:
+            self._socketio.sleep(interval)
+            with self._lock:
+                device_ids = list(self._pending)
+            for device_id in device_ids:
+                try:
+                    self._flush_device(device_id)
+                except Exception:
+                    logger.exception("Failed to broadcast game_update for %s", device_id)
+            if self._keyframe_seconds > 0 and time.monotonic() >= next_keyframe:
+                next_keyframe = time.monotonic() + self._keyframe_seconds
+                self._send_keyframes()
+
+    def _send_keyframes(self):
+        for device_id, info in game_service.get_presence().items():
+            if not info['online']:
+                continue
+            try:
+                self._send_keyframe(device_id)
+            except Exception:
+                logger.exception("Failed to send keyframe for %s", device_id)
+
+    def _send_keyframe(self, device_id: str):
+        state = game_service.get_current_game_state(device_id)
+        with self._lock:
+            self._last_sent[device_id] = dict(state)
+            bseq = self._bseq.get(device_id, 0) + 1
+            self._bseq[device_id] = bseq
+            self._metrics['keyframes'] += 1
+        payload = {'device_id': device_id, 'bseq': bseq, 'full': True, 'online': True, **state}
+        if self._socketio is not None:
+            self._socketio.emit('game_update', payload, to=game_service.device_room(device_id))
+
+    def _flush_device(self, device_id: str, immediate: bool = False):
+        state = game_service.get_current_game_state(device_id)
+        with self._lock:
+            if device_id not in self._pending:
+                return
+            extra = self._pending.pop(device_id)
+            last = self._last_sent.get(device_id, {})
+            if immediate:
+                delta = dict(state, full=True)
+            else:
+                delta = {key: value for key, value in state.items() if last.get(key) != value}
+            if not delta and not extra:
+                self._metrics['unchanged_frames'] += 1
+                return
+            self._last_sent[device_id] = state
+            bseq = self._bseq.get(device_id, 0) + 1
+            self._bseq[device_id] = bseq
+            self._metrics['broadcasts'] += 1
+            if immediate:
+                self._metrics['immediate_broadcasts'] += 1
+        payload = {'device_id': device_id, 'bseq': bseq, **delta, **extra}
+        if self._socketio is not None:
+            self._socketio.emit('game_update', payload, to=game_service.device_room(device_id))
+
+
+broadcaster = GameBroadcaster()
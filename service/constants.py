@@ -1,8 +1,59 @@
+import os
+
 DATA_FILE = 'career_data.csv'
+TRAINING_STORE_DIR = os.environ.get('TRAINING_STORE_DIR', 'training_store')  # columnar training data, preferred over DATA_FILE
+RESULTS_DB_FILE = os.environ.get('RESULTS_DB_PATH', 'results.db')
+RESULTS_WRITE_BATCH_SIZE = int(os.environ.get('RESULTS_WRITE_BATCH_SIZE', '200'))
 PROTECTED_PREFIXES = ('/api/', '/predict', '/chat')
 DEVICE_UNRESTRICTED_ENDPOINTS = ('/api/game_event',)
 UNRESTRICTED_ENDPOINTS = ('static', 'access_gate', 'health_check')
+ADMIN_PATH_PREFIX = '/api/admin/'  # guarded by APP_ADMIN_KEY instead of the access gate
 TEST_USER_ID = "web_chat_user"
+DEFAULT_DEVICE_ID = "default"
+DEVICE_ID_PATTERN = r'[A-Za-z0-9_-]{1,8}'  # station ids; an id is also its journal's file name and fills a UDP frame's 8 bytes
+MAX_DEVICES = int(os.environ.get('MAX_DEVICES', '256'))  # stations one worker tracks and journals
+PRESENCE_TIMEOUT_SECONDS = float(os.environ.get('PRESENCE_TIMEOUT_SECONDS', '6'))
+MAX_RUN_ERRORS = 10000  # device and manual readings above this are rejected
+MAX_RUN_SECONDS = 3600.0
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', 'journal')
+JOURNAL_CAPACITY = int(os.environ.get('JOURNAL_CAPACITY', '65536'))  # records per device
+BROADCAST_FPS = float(os.environ.get('BROADCAST_FPS', '5'))
+BROADCAST_KEYFRAME_SECONDS = float(os.environ.get('BROADCAST_KEYFRAME_SECONDS', '2'))
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')  # e.g. redis://localhost:6379/0
+SOCKETIO_WEBSOCKET_ONLY = os.environ.get('SOCKETIO_WEBSOCKET_ONLY', '') == '1'
+SOCKETIO_CLIENT_VERSION = "4.7.5"  # keep in step with the python-socketio server
+STATIC_DIST_DIR = "dist"  # build output under static/, see tools/build_assets.py
+ASSET_MANIFEST_FILE = "manifest.json"
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_STATIC_MAX_BYTES = 2 * 1024 * 1024  # larger static files are streamed as is
+HUB_BLOCK_THRESHOLD_MS = float(os.environ.get('HUB_BLOCK_THRESHOLD_MS', '100'))  # 0 disables the hub monitor
+FAQ_MIN_SCORE = float(os.environ.get('FAQ_MIN_SCORE', '0.65'))  # cosine; above 1 disables local answers
+FAQ_MIN_MARGIN = float(os.environ.get('FAQ_MIN_MARGIN', '0.2'))  # over the runner-up intent
+FAQ_REVIEW_BAND = 0.15  # near misses this far below FAQ_MIN_SCORE are logged for review
+FAQ_MAX_CHARS = 160
+CAREERS_MAP = {
+    'A': ['Phi công', 'Game thủ', 'Lái xe', 'An ninh mạng'],
+    'B': ['Bác sĩ', 'Thủ công mỹ nghệ', 'Kỹ thuật nha khoa'],
+    'C': ['Kinh tế', 'Sư phạm', 'Luật', 'Ngành ít thao tác tay'],
+}
+REPORT_MODE = os.environ.get('REPORT_MODE', 'auto')  # llm | local | auto (local while the LLM is degraded)
+REPORT_LLM_TIMEOUT = float(os.environ.get('REPORT_LLM_TIMEOUT', '25'))  # seconds before auto falls back
+REPORT_UPGRADE_MAX_WAIT = float(os.environ.get('REPORT_UPGRADE_MAX_WAIT', '600'))  # give up upgrading after
+REPORT_UPGRADE_MAX_ATTEMPTS = int(os.environ.get('REPORT_UPGRADE_MAX_ATTEMPTS', '4'))  # LLM tries per upgrade
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))  # agent jobs running at once per worker process
+JOB_QUEUE_MAX = int(os.environ.get('JOB_QUEUE_MAX', '64'))  # queued jobs before submissions are refused
+JOB_RESULT_TTL_SECONDS = float(os.environ.get('JOB_RESULT_TTL_SECONDS', '900'))
+JOB_RESULTS_MAX = 1000
+BULK_REPORT_CONCURRENCY = int(os.environ.get('BULK_REPORT_CONCURRENCY', '4'))  # class reports in flight
+BULK_REPORT_RPM = float(os.environ.get('BULK_REPORT_RPM', '30'))  # report starts per minute; 0 = unlimited
+BULK_REPORT_RETRIES = 3  # retries of one report after a model rate-limit error
+BULK_REPORT_DIR = os.environ.get('BULK_REPORT_DIR', 'bulk_reports')  # JSONL checkpoints
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', 'report_cache')  # immutable report documents
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', '2'))  # PDF render processes per worker
+RENDER_TIMEOUT_SECONDS = 60
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')  # folded stacks from the admin profiler
+TELEMETRY_UDP_PORT = int(os.environ.get('TELEMETRY_UDP_PORT', '5005'))  # 0 disables
+STUDENT_ID_SESSION_KEY = "student_id"
 BEST_STEP1_SESSION_KEY = "best_step1"
 BEST_REFLEX_SESSION_KEY = "best_reflex"
 CHAT_HISTORY_SESSION_KEY = "chat_history"
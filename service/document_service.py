@@ -0,0 +1,149 @@
+"""Immutable report documents cached by student and inputs.
+
+A report is stored once per student under a digest of everything it was
+generated from (profile, wire-loop and reflex bests, chat transcript). The
+layout is ``REPORT_CACHE_DIR/<student_id>/<digest>.json``. A later request
+with the same inputs is answered from the file without calling the agents.
+Files are written atomically and never rewritten, so every worker process
+can serve them. Only agent reports are stored. A local report is a stopgap
+until its upgrade arrives.
+
+Printable HTML is rendered from the stored JSON on first download and kept
+next to it. PDF needs the optional ``weasyprint`` package. It is rendered in
+a process pool of ``RENDER_WORKERS`` spawned processes, so layout work
+never runs on a gevent worker's hub. The pool is started on first use, in
+the serving worker.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+
+from career_counselor_chat import report_document
+
+from .constants import RENDER_TIMEOUT_SECONDS, RENDER_WORKERS, REPORT_CACHE_DIR
+
+FORMATS = {
+    'json': 'application/json',
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+# weasyprint is imported only in the render processes.
+PDF_AVAILABLE = find_spec('weasyprint') is not None
+
+_pool = None
+_pool_lock = threading.Lock()
+_metrics = {'hits': 0, 'misses': 0, 'stored': 0, 'html_renders': 0, 'pdf_renders': 0, 'pdf_failures': 0}
+
+
+def input_digest(student_profile, best_step1, best_reflex, chat_history) -> str:
+    """Stable hash of a report's inputs (key order and whitespace do not matter)."""
+    canonical = json.dumps(
+        [student_profile, best_step1, best_reflex, chat_history],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def document_path(student_id: str, digest: str, fmt: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, student_id, f"{digest}.{fmt}")
+
+
+def links(digest: str) -> dict:
+    """Download URLs of a stored document; ``pdf`` is None without weasyprint."""
+    return {
+        'html': f"/api/report/{digest}.html",
+        'pdf': f"/api/report/{digest}.pdf" if PDF_AVAILABLE else None,
+    }
+
+
+def _write_once(path: str, data: bytes) -> bool:
+    if os.path.exists(path):
+        return False
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def load(student_id, digest: str):
+    """The stored report for these inputs, or None."""
+    if not student_id:
+        return None
+    try:
+        with open(document_path(student_id, digest, 'json'), encoding='utf-8') as handle:
+            document = json.load(handle)
+    except FileNotFoundError:
+        _metrics['misses'] += 1
+        return None
+    _metrics['hits'] += 1
+    return document
+
+
+def store(student_id, digest: str, report: dict, *, created_at: float):
+    """Keep ``report`` as the document for these inputs (first write wins)."""
+    if not student_id or report.get('source') == 'local':
+        return
+    document = dict(report, created_at=created_at)
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    if _write_once(document_path(student_id, digest, 'json'), data):
+        _metrics['stored'] += 1
+
+
+def _render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: a fork would copy the gevent hub and
+            # the locks of the native writer threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def render(student_id: str, digest: str, fmt: str):
+    """Path of the document in ``fmt``, rendering it on first use; None if unknown.
+
+    Raises ``RuntimeError`` for PDF when weasyprint is not installed.
+    """
+    path = document_path(student_id, digest, fmt)
+    if os.path.exists(path):
+        return path
+    document = load(student_id, digest)
+    if document is None:
+        return None
+    html = report_document.render_html(document, created_at=document.get('created_at', 0))
+    if fmt == 'html':
+        _write_once(path, html.encode('utf-8'))
+        _metrics['html_renders'] += 1
+        return path
+    if not PDF_AVAILABLE:
+        raise RuntimeError('PDF export needs the weasyprint package.')
+    try:
+        pdf = _render_pool().submit(report_document.render_pdf, html).result(timeout=RENDER_TIMEOUT_SECONDS)
+    except Exception:
+        _metrics['pdf_failures'] += 1
+        raise
+    _write_once(path, pdf)
+    _metrics['pdf_renders'] += 1
+    return path
+
+
+def get_metrics():
+    return dict(_metrics, pdf_available=PDF_AVAILABLE)
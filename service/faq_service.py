@@ -0,0 +1,294 @@
+"""Local answers for procedural chat questions, before any LLM call.
+
+Messages are normalised without accents (``"Độ chính xác?"`` and
+``"do chinh xac"`` are the same), split into character 3-5-grams padded at
+word boundaries, and weighted with TF-IDF over the example questions in
+``FAQ_ENTRIES``. A message is answered locally when its cosine similarity
+to an intent's closest example is at least ``FAQ_MIN_SCORE``, it beats the
+next intent by ``FAQ_MIN_MARGIN``, and it names the intent's topic (one of
+its ``keywords``, e.g. "nhóm" or "đập chuột"). "Mình nên làm gì tiếp
+theo?" resembles the test-steps examples but is a counselling question.
+Examples are impersonal for the same reason. Only short messages that look
+like questions are considered (a ``?`` or a question word such as "gì", "sao",
+"bao nhiêu", or a trailing "không"). Answers to the counsellor like "Mình
+thích chơi trò đập chuột" share n-grams with the FAQ topics but are
+conversation and go to the agent.
+
+Every hit, and every near miss within ``FAQ_REVIEW_BAND`` below the
+threshold, is written to the ``faq_lookups`` results table with its score,
+so false positives and negatives can be reviewed (``/api/admin/export/faq_lookups.csv``)
+and marked through the admin API.
+"""
+import math
+import re
+import time
+import unicodedata
+import uuid
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from . import results_store
+from .constants import FAQ_MAX_CHARS, FAQ_MIN_MARGIN, FAQ_MIN_SCORE, FAQ_REVIEW_BAND
+
+NGRAM_SIZES = (3, 4, 5)
+
+
+class FaqEntry(NamedTuple):
+    intent: str
+    keywords: tuple  # accent-free; the message must contain one
+    examples: tuple
+    answer: str  # may use {accuracy}
+
+
+FAQ_ENTRIES = (
+    FaqEntry(
+        'model_accuracy',
+        ('chinh xac', 'accuracy', 'mo hinh', 'ai', 'phan tram'),
+        (
+            'độ chính xác của mô hình là bao nhiêu',
+            'mô hình dự đoán có chính xác không',
+            'accuracy của AI là bao nhiêu',
+            'kết quả phân nhóm đúng bao nhiêu phần trăm',
+            'AI đoán có đúng không',
+        ),
+        'Độ chính xác hiện tại của mô hình là khoảng {accuracy}% dựa trên dữ liệu huấn luyện.',
+    ),
+    FaqEntry(
+        'test_steps',
+        ('buoc', 'quy trinh', 'bai test', 'bai kiem tra'),
+        (
+            'quy trình kiểm tra gồm những bước nào',
+            'các bước làm bài test là gì',
+            'bước tiếp theo của bài test là gì',
+            'bắt đầu bài kiểm tra như thế nào',
+            'có mấy bước',
+        ),
+        'Bạn hoàn thành 2 bước: (1) Nhập kết quả Wire Loop hoặc nhận từ thiết bị ESP32; '
+        '(2) Chơi đập chuột 10 giây. Sau đó trò chuyện với AI và nhấn "Nhận báo cáo" để xem gợi ý nghề.',
+    ),
+    FaqEntry(
+        'group_meaning',
+        ('nhom', 'group'),
+        (
+            'nhóm A B C nghĩa là gì',
+            'nhóm A là gì',
+            'các nhóm có ý nghĩa gì',
+            'phân nhóm A B C dựa trên cái gì',
+            'group A B C là gì',
+        ),
+        'Nhóm A thiên về phản xạ nhanh, Nhóm B chú trọng sự khéo léo, '
+        'còn Nhóm C phù hợp tư duy phân tích với ít thao tác tay.',
+    ),
+    FaqEntry(
+        'wire_loop_rules',
+        ('wire loop', 'vong day', 'kheo leo'),
+        (
+            'wire loop là gì',
+            'chơi wire loop như thế nào',
+            'cách chơi vòng dây',
+            'bài kiểm tra khéo léo tính điểm ra sao',
+        ),
+        'Wire Loop: đưa vòng kim loại đi dọc theo dây mà không chạm dây. Thiết bị ghi lại thời gian '
+        'và số lần chạm; càng nhanh và càng ít lỗi thì kết quả càng tốt.',
+    ),
+    FaqEntry(
+        'reflex_rules',
+        ('reflex', 'dap chuot', 'phan xa'),
+        (
+            'reflex test là gì',
+            'trò đập chuột chơi thế nào',
+            'bài test phản xạ tính điểm ra sao',
+            'đập chuột tính điểm thế nào',
+            'có được chơi lại trò đập chuột không',
+        ),
+        'Reflex Test: trong 10 giây, bấm vào chú chuột xuất hiện trên màn hình càng nhiều càng tốt. '
+        'Bạn có thể chơi lại, hệ thống ghi nhận điểm của lượt mới nhất.',
+    ),
+    FaqEntry(
+        'report_access',
+        ('bao cao', 'ket qua'),
+        (
+            'khi nào có báo cáo',
+            'làm sao để xem kết quả',
+            'xem báo cáo ở đâu',
+            'nút nhận báo cáo không bấm được',
+        ),
+        'Sau khi hoàn thành hai bài test và trò chuyện với AI tới phần kết luận, '
+        'nút "Nhận báo cáo" sẽ sáng lên để bạn xem báo cáo và gợi ý nghề.',
+    ),
+    FaqEntry(
+        'disc_meaning',
+        ('disc', 'd i s c'),
+        (
+            'DISC là gì',
+            'trắc nghiệm DISC là gì',
+            'D I S C nghĩa là gì',
+        ),
+        'DISC mô tả bốn xu hướng hành vi: D (Quyết đoán), I (Ảnh hưởng), S (Kiên định) và C (Tuân thủ). '
+        'AI sẽ hỏi vài câu để ước lượng xu hướng nổi bật của bạn.',
+    ),
+)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+_QUESTION_WORDS = frozenset({'gi', 'nao', 'sao', 'dau', 'bao', 'may', 'hem'})
+_QUESTION_ENDINGS = frozenset({'khong', 'ko', 'k', 'chua', 'ha', 'hong'})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip Vietnamese diacritics and punctuation."""
+    lowered = (text or '').lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFKD', lowered)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', stripped).strip()
+
+
+def is_question(text: str) -> bool:
+    if '?' in text:
+        return True
+    words = normalize(text).split()
+    return bool(words) and (words[-1] in _QUESTION_ENDINGS or not _QUESTION_WORDS.isdisjoint(words))
+
+
+def has_keyword(entry: FaqEntry, message: str) -> bool:
+    """Whether ``message`` names the entry's topic, so the similarity is about the app."""
+    padded = f" {normalize(message)} "
+    return any(f" {keyword} " in padded for keyword in entry.keywords)
+
+
+def _ngrams(normalized: str) -> Counter:
+    grams = Counter()
+    for word in normalized.split():
+        padded = f' {word} '
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                grams[padded[start:start + size]] += 1
+    return grams
+
+
+class FaqIndex:
+    """Inverted TF-IDF index over the example questions."""
+
+    def __init__(self, entries=FAQ_ENTRIES):
+        self.entries = entries
+        documents = []
+        for entry_index, entry in enumerate(entries):
+            for example in entry.examples:
+                documents.append((entry_index, _ngrams(normalize(example))))
+        frequency = Counter(gram for _, grams in documents for gram in grams)
+        total = len(documents)
+        self._idf = {gram: math.log((1 + total) / (1 + count)) + 1.0 for gram, count in frequency.items()}
+        # Grams no example contains still count towards the query's norm, so
+        # a long message sharing a few grams with an example scores low.
+        self._unseen_idf = math.log(1 + total) + 1.0
+        self._doc_entry = []
+        self._postings = {}
+        for doc_index, (entry_index, grams) in enumerate(documents):
+            self._doc_entry.append(entry_index)
+            weights = self._weigh(grams)
+            for gram, weight in weights.items():
+                self._postings.setdefault(gram, []).append((doc_index, weight))
+
+    def _weigh(self, grams: Counter) -> dict:
+        weights = {
+            gram: (1.0 + math.log(count)) * self._idf.get(gram, self._unseen_idf)
+            for gram, count in grams.items()
+        }
+        norm = math.sqrt(sum(value * value for value in weights.values()))
+        return {gram: value / norm for gram, value in weights.items()} if norm else {}
+
+    def scores(self, message: str) -> list:
+        """``(score, entry)`` per intent, best first; score is the closest example's cosine."""
+        query = self._weigh(_ngrams(normalize(message)))
+        doc_scores = Counter()
+        for gram, weight in query.items():
+            for doc_index, doc_weight in self._postings.get(gram, ()):
+                doc_scores[doc_index] += weight * doc_weight
+        best = {}
+        for doc_index, score in doc_scores.items():
+            entry_index = self._doc_entry[doc_index]
+            best[entry_index] = max(score, best.get(entry_index, 0.0))
+        return sorted(
+            ((score, self.entries[entry_index]) for entry_index, score in best.items()),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+
+
+class FaqMatch(NamedTuple):
+    intent: str
+    answer: str
+    score: float
+    margin: float
+    lookup_id: Optional[str]
+
+
+_index = FaqIndex()
+_metrics = {
+    'lookups': 0,
+    'hits': 0,
+    'near_misses': 0,
+    'skipped': 0,
+    'lookup_us_total': 0.0,
+    'reviewed_correct': 0,
+    'reviewed_wrong': 0,
+}
+_intent_hits = Counter()
+
+
+def _record(outcome, message, score, margin, intent, student_id, profile):
+    lookup_id = uuid.uuid4().hex
+    results_store.record_faq_lookup(
+        lookup_id, student_id, profile,
+        message=message, intent=intent, score=score, margin=margin, outcome=outcome,
+    )
+    return lookup_id
+
+
+def lookup(message: str, *, student_id=None, profile=None, **answer_fields) -> Optional[FaqMatch]:
+    """Local answer for ``message`` or None; ``answer_fields`` fill the answer template."""
+    _metrics['lookups'] += 1
+    if len(message) > FAQ_MAX_CHARS or not is_question(message):
+        _metrics['skipped'] += 1
+        return None
+    started = time.perf_counter()
+    ranked = _index.scores(message)
+    _metrics['lookup_us_total'] += (time.perf_counter() - started) * 1e6
+    if not ranked:
+        return None
+    score, entry = ranked[0]
+    margin = score - (ranked[1][0] if len(ranked) > 1 else 0.0)
+    if score >= FAQ_MIN_SCORE and margin >= FAQ_MIN_MARGIN and has_keyword(entry, message):
+        _metrics['hits'] += 1
+        _intent_hits[entry.intent] += 1
+        lookup_id = _record('hit', message, score, margin, entry.intent, student_id, profile)
+        return FaqMatch(entry.intent, entry.answer.format(**answer_fields), score, margin, lookup_id)
+    if score >= FAQ_MIN_SCORE - FAQ_REVIEW_BAND:
+        _metrics['near_misses'] += 1
+        _record('near_miss', message, score, margin, entry.intent, student_id, profile)
+    return None
+
+
+def best_answer(message: str, **answer_fields) -> Optional[str]:
+    """Closest intent's answer at the near-miss bar, for when the agent is down."""
+    ranked = _index.scores(message)
+    if not ranked or ranked[0][0] < FAQ_MIN_SCORE - FAQ_REVIEW_BAND or not has_keyword(ranked[0][1], message):
+        return None
+    return ranked[0][1].answer.format(**answer_fields)
+
+
+def record_verdict(lookup_id: str, correct: bool):
+    """Store a reviewer's verdict on a logged lookup (wrong hit = false positive)."""
+    _metrics['reviewed_correct' if correct else 'reviewed_wrong'] += 1
+    results_store.record_faq_verdict(lookup_id, 'correct' if correct else 'wrong')
+
+
+def get_metrics():
+    metrics = dict(_metrics)
+    lookups = metrics['lookups']
+    metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0.0
+    scored = lookups - metrics['skipped']
+    metrics['mean_lookup_us'] = round(metrics.pop('lookup_us_total') / scored, 1) if scored else 0.0
+    metrics['intents'] = dict(_intent_hits)
+    metrics['min_score'] = FAQ_MIN_SCORE
+    metrics['min_margin'] = FAQ_MIN_MARGIN
+    return metrics
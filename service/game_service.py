@@ -1,54 +1,315 @@
+import re
+import threading
 import time as t
 from flask import session
 
 from career_counselor_chat.service import career_service
+from . import journal_service, results_store, session_service, stats_service
+from .telemetry_features import RunFeatures
 from .constants import (
     BEST_STEP1_SESSION_KEY,
     BEST_REFLEX_SESSION_KEY,
     CHAT_DONE_SESSION_KEY,
     CHARACTERISTIC_READY_SESSION_KEY,
+    DEFAULT_DEVICE_ID,
+    DEVICE_ID_PATTERN,
+    MAX_DEVICES,
+    MAX_RUN_ERRORS,
+    MAX_RUN_SECONDS,
+    PRESENCE_TIMEOUT_SECONDS,
     TEST_USER_ID,
 )
 
-_current_game_state = {
-    'status': 'idle',
-    'time': 0.0,
-    'errors': 0,
-    'group': None,
-    'careers': [],
-    'timestamp': 0.0,
-}
+# A device counts its events from 1 after boot; a start whose seq went back
+# into this window means the station restarted rather than replayed an old post.
+_SEQ_RESTART_WINDOW = 4
+_DEVICE_ID = re.compile(DEVICE_ID_PATTERN)
 
 
-def get_current_game_state():
-    return _current_game_state
+class DeviceState:
+    """Live wire-loop state for one ESP32 station."""
 
+    __slots__ = ('device_id', 'status', 'time', 'errors', 'timestamp', 'seq', 'boot', 'lock', 'features')
 
-def mark_game_start():
-    now = t.time()
-    _current_game_state['status'] = 'playing'
-    _current_game_state['time'] = 0.0
-    _current_game_state['errors'] = 0
-    _current_game_state['timestamp'] = now
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.status = 'idle'
+        self.time = 0.0
+        self.errors = 0
+        self.timestamp = 0.0
+        self.seq = -1
+        self.boot = None
+        self.lock = threading.Lock()
+        self.features = RunFeatures()
+
+    def accept(self, seq, reset: bool = False, boot=None) -> bool:
+        """Advance the sequence number; HTTP posts can arrive out of order.
+
+        Posts without a seq (manual browser submissions, older firmware) are
+        always accepted. Firmware that sends a ``boot`` nonce starts a new
+        sequence whenever the nonce changes. Without one, a ``start`` whose
+        seq went backwards to a low value is taken as a device reboot and
+        resets the counter instead of being dropped as stale. A repeated
+        start (same seq) is a duplicate.
+        """
+        if seq is None:
+            return True
+        seq = int(seq)
+        if boot and boot != self.boot:
+            self.boot = boot
+            self.seq = seq
+            return True
+        rebooted = reset and seq < self.seq and seq <= _SEQ_RESTART_WINDOW
+        if seq <= self.seq and not rebooted:
+            return False
+        self.seq = seq
+        return True
+
+    def snapshot(self):
+        return {
+            'device_id': self.device_id,
+            'status': self.status,
+            'time': self.time,
+            'errors': self.errors,
+            'timestamp': self.timestamp,
+            'seq': self.seq,
+        }
+
+
+_devices = {}
+_devices_lock = threading.Lock()
+
+
+def validate_reading(time_val, errors_val):
+    """``(time, errors)`` as float/int; ValueError when out of range."""
+    time_val = float(time_val)
+    errors_val = int(errors_val)
+    if not 0.0 <= time_val <= MAX_RUN_SECONDS:
+        raise ValueError(f"time must be between 0 and {MAX_RUN_SECONDS:g} seconds")
+    if not 0 <= errors_val <= MAX_RUN_ERRORS:
+        raise ValueError(f"errors must be between 0 and {MAX_RUN_ERRORS}")
+    return time_val, errors_val
+
+
+def device_room(device_id: str) -> str:
+    return f"device:{device_id}"
+
+
+def get_device(device_id=None) -> DeviceState:
+    """The device's state, registered on first use.
+
+    Device ids are unauthenticated, so a new id must match DEVICE_ID_PATTERN
+    and at most MAX_DEVICES are registered; ValueError otherwise.
+    """
+    device_id = device_id or DEFAULT_DEVICE_ID
+    state = _devices.get(device_id)
+    if state is None:
+        if not _DEVICE_ID.fullmatch(device_id):
+            raise ValueError("invalid device id")
+        with _devices_lock:
+            state = _devices.get(device_id)
+            if state is None:
+                if len(_devices) >= MAX_DEVICES:
+                    raise ValueError(f"more than {MAX_DEVICES} devices")
+                state = _devices[device_id] = DeviceState(device_id)
+    return state
+
+
+def _peek_device(device_id=None) -> DeviceState:
+    """The device's state for reading; an idle one for unknown ids, which stay unregistered."""
+    device_id = device_id or DEFAULT_DEVICE_ID
+    return _devices.get(device_id) or DeviceState(device_id)
+
+
+def list_devices():
+    return list(_devices.values())
+
+
+def get_current_game_state(device_id=None):
+    return _peek_device(device_id).snapshot()
+
+
+class _TimerWheel:
+    """Hashed timer wheel: O(1) schedule, one slot scanned per tick.
+
+    Rescheduling does not remove the old entry; expiry compares against the
+    latest deadline so superseded entries are skipped when their slot comes up.
+    """
+
+    __slots__ = ('tick', 'slots', 'deadlines')
+
+    def __init__(self, size: int, tick: int):
+        self.tick = tick
+        self.slots = [set() for _ in range(size)]
+        self.deadlines = {}
+
+    def schedule(self, key, deadline: int):
+        self.deadlines[key] = deadline
+        self.slots[deadline % len(self.slots)].add(key)
+
+    def advance(self, to_tick: int):
+        expired = []
+        while self.tick < to_tick:
+            self.tick += 1
+            slot = self.slots[self.tick % len(self.slots)]
+            for key in slot:
+                if self.deadlines.get(key) == self.tick:
+                    del self.deadlines[key]
+                    expired.append(key)
+            slot.clear()
+        return expired
+
+
+_PRESENCE_TICKS = max(1, int(PRESENCE_TIMEOUT_SECONDS))
+_presence_lock = threading.Lock()
+_presence_wheel = _TimerWheel(size=_PRESENCE_TICKS + 2, tick=int(t.monotonic()))
+_last_seen = {}
+_presence_listener = None
+
+
+def set_presence_listener(listener):
+    """``listener(device_id, online)`` is called once per online/offline transition."""
+    global _presence_listener
+    _presence_listener = listener
+
+
+def touch_device(device_id=None):
+    """Record device traffic or a heartbeat; notifies when the device comes online."""
+    device_id = get_device(device_id).device_id
+    tick = int(t.monotonic())
+    with _presence_lock:
+        # Catch the wheel up first so the new deadline never laps it.
+        expired = _presence_wheel.advance(tick)
+        came_online = device_id not in _presence_wheel.deadlines
+        _last_seen[device_id] = t.time()
+        _presence_wheel.schedule(device_id, max(tick, _presence_wheel.tick) + _PRESENCE_TICKS)
+    if _presence_listener is not None:
+        for expired_id in expired:
+            if expired_id != device_id:
+                _presence_listener(expired_id, False)
+        if came_online and device_id not in expired:
+            _presence_listener(device_id, True)
+    return came_online
+
+
+def expire_presence(now=None):
+    """Advance the wheel to ``now``; called from the single presence timer."""
+    with _presence_lock:
+        expired = _presence_wheel.advance(int(now if now is not None else t.monotonic()))
+    if _presence_listener is not None:
+        for device_id in expired:
+            _presence_listener(device_id, False)
+    return expired
+
+
+def is_device_online(device_id=None) -> bool:
+    return (device_id or DEFAULT_DEVICE_ID) in _presence_wheel.deadlines
+
+
+def get_presence():
+    with _presence_lock:
+        online = set(_presence_wheel.deadlines)
+        last_seen = dict(_last_seen)
+    return {
+        device_id: {'online': device_id in online, 'last_seen': seen}
+        for device_id, seen in last_seen.items()
+    }
+
+
+def record_heartbeat(device_id=None, seq=None):
+    device_id = get_device(device_id).device_id
+    journal_service.record(device_id, 'heartbeat', timestamp=t.time(), seq=seq)
+    touch_device(device_id)
+
+
+def mark_game_start(device_id=None, seq=None, boot=None):
+    state = get_device(device_id)
+    journal_service.record(state.device_id, 'start', timestamp=t.time(), seq=seq)
+    with state.lock:
+        if not state.accept(seq, reset=True, boot=boot):
+            return None
+        now = t.time()
+        state.status = 'playing'
+        state.time = 0.0
+        state.errors = 0
+        state.timestamp = now
+        state.features.reset()
+    return now
+
+
+def update_game_state(time_val: float, errors_val: int, device_id=None, seq=None, boot=None):
+    state = get_device(device_id)
+    journal_service.record(
+        state.device_id, 'update', timestamp=t.time(), seq=seq, time_val=time_val, errors=errors_val
+    )
+    with state.lock:
+        if not state.accept(seq, boot=boot):
+            return None
+        now = t.time()
+        state.status = 'playing'
+        state.time = float(time_val)
+        state.errors = int(errors_val)
+        state.timestamp = now
+        state.features.observe(state.time, state.errors)
     return now
 
 
-def update_game_state(time_val: float, errors_val: int):
-    now = t.time()
-    _current_game_state['status'] = 'playing'
-    _current_game_state['time'] = float(time_val)
-    _current_game_state['errors'] = int(errors_val)
-    _current_game_state['timestamp'] = now
+def finish_game_state(time_val: float, errors_val: int, device_id=None, seq=None, boot=None):
+    state = get_device(device_id)
+    journal_service.record(
+        state.device_id, 'finish', timestamp=t.time(), seq=seq, time_val=time_val, errors=errors_val
+    )
+    with state.lock:
+        if not state.accept(seq, boot=boot):
+            return None
+        now = t.time()
+        state.status = 'finished'
+        state.time = float(time_val)
+        state.errors = int(errors_val)
+        state.timestamp = now
+        state.features.observe(state.time, state.errors)
     return now
 
 
-def mark_game_finish(time_val: float, errors_val: int):
-    now = t.time()
-    _current_game_state['status'] = 'finished'
-    _current_game_state['time'] = float(time_val)
-    _current_game_state['errors'] = int(errors_val)
-    _current_game_state['timestamp'] = now
-    best_value, improved = record_step1_result(time_val, errors_val)
+def get_run_features(device_id=None):
+    """Features of the device's current or last run."""
+    state = _peek_device(device_id)
+    with state.lock:
+        return state.features.as_dict()
+
+
+def _station_run_features(station, time_val: float, errors_val: int):
+    """Features of the station's finished run if it is the one being submitted."""
+    state = _peek_device(station)
+    with state.lock:
+        if (
+            state.status != 'finished'
+            or state.errors != int(errors_val)
+            or abs(state.time - float(time_val)) > 0.05
+        ):
+            return None
+        return state.features.as_dict()
+
+
+def mark_game_finish(time_val: float, errors_val: int, device_id=None, seq=None, boot=None, station=None):
+    """Finish the device's run and record it for the current session; None when stale.
+
+    ``station`` is the station a browser submission was read from. The
+    student's stored run gets that station's features when the submitted
+    values are its last finished run; typed-in values get none.
+    """
+    features = None
+    if seq is None and station:
+        features = _station_run_features(station, time_val, errors_val)
+    now = finish_game_state(time_val, errors_val, device_id, seq, boot)
+    if now is None:
+        return None
+    if seq is not None:
+        # A device post: no student session, the run is stored against the station.
+        features = get_run_features(device_id)
+    best_value, improved = record_step1_result(
+        time_val, errors_val, device_id=device_id, features=features
+    )
     all_done = (
         session.get(BEST_STEP1_SESSION_KEY)
         and session.get(BEST_REFLEX_SESSION_KEY)
@@ -63,7 +324,7 @@ def mark_game_finish(time_val: float, errors_val: int):
     return now, best_value, improved
 
 
-def record_step1_result(time_val: float, errors_val: int):
+def record_step1_result(time_val: float, errors_val: int, device_id=None, features=None):
     best = session.get(BEST_STEP1_SESSION_KEY)
     improved = False
     candidate = {'time': float(time_val), 'errors': int(errors_val)}
@@ -84,6 +345,20 @@ def record_step1_result(time_val: float, errors_val: int):
         improved = True
     elif not best:
         best = candidate
+    student_id, profile = session_service.current_student()
+    results_store.record_run(
+        student_id,
+        profile,
+        'wire_loop',
+        time_val=candidate['time'],
+        errors=candidate['errors'],
+        improved=improved,
+        device_id=device_id,
+        features=features,
+    )
+    if improved:
+        stats_service.observe_step1(student_id, profile, candidate['time'], candidate['errors'])
+        _refresh_peer_ranks(student_id, profile)
     return best, improved
 
 
@@ -101,4 +376,22 @@ def record_reflex_result(quantity: int, time_val: float):
         improved = True
     elif not best:
         best = candidate
+    student_id, profile = session_service.current_student()
+    results_store.record_run(
+        student_id,
+        profile,
+        'reflex',
+        time_val=candidate['time'],
+        quantity=candidate['quantity'],
+        improved=improved,
+    )
+    if improved:
+        stats_service.observe_reflex(student_id, profile, candidate['quantity'])
+        _refresh_peer_ranks(student_id, profile)
     return best, improved
+
+
+def _refresh_peer_ranks(student_id, profile):
+    ranks = stats_service.get_ranks(student_id, profile)
+    if ranks:
+        career_service.update_test_metrics(user_id=TEST_USER_ID, ranks=ranks)
@@ -0,0 +1,163 @@
+"""Detects synchronous work that blocks the gevent hub.
+
+A heartbeat greenlet records the time every ``threshold / 2``. A native
+thread polls that timestamp. When the heartbeat is late by more than
+``HUB_BLOCK_THRESHOLD_MS``, nothing else on the worker can run: no
+Socket.IO emits, no UDP frames, no other requests. While the stall lasts the
+thread samples the hub thread's stack with ``sys._current_frames()`` and
+charges each poll interval to the innermost frame that belongs to this
+project (``career_counselor_chat/service.py:412 ask``), or to the innermost
+frame when no project frame is on the stack.
+
+``get_metrics()`` returns totals, the locations with the most blocked time
+(with the last stack seen there) and the most recent stalls.
+"""
+import logging
+import os
+import sys
+import time
+import traceback
+from collections import deque
+
+from .constants import HUB_BLOCK_THRESHOLD_MS
+from .threads import native_lock, native_sleep, start_native_thread
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_MAX_LOCATIONS = 200
+_STACK_LIMIT = 25
+
+_lock = native_lock()
+_locations = {}
+_recent = deque(maxlen=20)
+_totals = {'blocked_events': 0, 'blocked_ms': 0.0, 'max_blocked_ms': 0.0}
+_state = {'pid': None, 'beat': 0.0, 'hub_ident': None, 'threshold': 0.0}
+
+
+def _is_project_file(filename: str) -> bool:
+    return filename.startswith(_PROJECT_ROOT) and 'site-packages' not in filename
+
+
+def _location(frame):
+    innermost = None
+    while frame is not None:
+        code = frame.f_code
+        if innermost is None:
+            innermost = frame
+        if _is_project_file(code.co_filename):
+            break
+        frame = frame.f_back
+    chosen = frame or innermost
+    filename = chosen.f_code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = filename[len(_PROJECT_ROOT):]
+    return f"{filename}:{chosen.f_lineno} {chosen.f_code.co_name}"
+
+
+def _heartbeat():
+    import gevent
+
+    interval = _state['threshold'] / 2
+    while True:
+        _state['beat'] = time.monotonic()
+        gevent.sleep(interval)
+
+
+def _record_sample(location, frame, elapsed_ms, new_event):
+    with _lock:
+        entry = _locations.get(location)
+        if entry is None:
+            if len(_locations) >= _MAX_LOCATIONS:
+                location = 'other'
+                entry = _locations.setdefault(location, {'events': 0, 'blocked_ms': 0.0, 'stack': []})
+            else:
+                entry = _locations[location] = {'events': 0, 'blocked_ms': 0.0, 'stack': []}
+        if new_event:
+            entry['events'] += 1
+            entry['stack'] = traceback.format_stack(frame, limit=_STACK_LIMIT)
+        entry['blocked_ms'] += elapsed_ms
+
+
+def _finish_event(location, stalled_ms):
+    with _lock:
+        _totals['blocked_events'] += 1
+        _totals['blocked_ms'] += stalled_ms
+        _totals['max_blocked_ms'] = max(_totals['max_blocked_ms'], stalled_ms)
+        _recent.append({
+            'at': round(time.time(), 3),
+            'duration_ms': round(stalled_ms, 1),
+            'location': location,
+        })
+    logger.warning(
+        "gevent hub blocked for %.0f ms at %s", stalled_ms, location,
+        extra={"component": "hub_monitor", "sampled": True},
+    )
+
+
+def _monitor():
+    threshold = _state['threshold']
+    interval = threshold / 2
+    poll = max(threshold / 4, 0.005)
+    event_location = None
+    stalled = 0.0
+    while True:
+        native_sleep(poll)
+        late = time.monotonic() - _state['beat'] - interval
+        if late < threshold:
+            if event_location is not None:
+                _finish_event(event_location, (stalled + poll) * 1000)
+                event_location = None
+            continue
+        frame = sys._current_frames().get(_state['hub_ident'])
+        if frame is None:
+            continue
+        location = _location(frame)
+        new_event = event_location is None
+        if new_event:
+            event_location = location
+            # The stall began before it crossed the threshold; charge that too.
+            elapsed = late
+        else:
+            elapsed = poll
+        stalled = late
+        _record_sample(location, frame, elapsed * 1000, new_event)
+        del frame
+
+
+def start_monitor(threshold_ms: float = HUB_BLOCK_THRESHOLD_MS):
+    """Start the heartbeat and the watcher once per process (0 disables)."""
+    if threshold_ms <= 0 or _state['pid'] == os.getpid():
+        return
+    import gevent
+    from gevent import get_hub
+
+    _state['pid'] = os.getpid()
+    _state['threshold'] = threshold_ms / 1000.0
+    _state['hub_ident'] = get_hub().thread_ident
+    _state['beat'] = time.monotonic()
+    gevent.spawn(_heartbeat)
+    start_native_thread(_monitor)
+    logger.info("Hub monitor started (threshold %.0f ms)", threshold_ms, extra={"component": "hub_monitor"})
+
+
+def get_metrics(top: int = 15):
+    with _lock:
+        locations = sorted(_locations.items(), key=lambda item: item[1]['blocked_ms'], reverse=True)[:top]
+        return {
+            'threshold_ms': round(_state['threshold'] * 1000, 1),
+            'running': _state['pid'] == os.getpid(),
+            'blocked_events': _totals['blocked_events'],
+            'blocked_ms': round(_totals['blocked_ms'], 1),
+            'max_blocked_ms': round(_totals['max_blocked_ms'], 1),
+            'locations': [
+                {
+                    'location': location,
+                    'events': entry['events'],
+                    'blocked_ms': round(entry['blocked_ms'], 1),
+                    'stack': list(entry['stack']),
+                }
+                for location, entry in locations
+            ],
+            'recent': list(_recent),
+        }
@@ -0,0 +1,194 @@
+"""Background jobs for long agent calls.
+
+``/api/final_report`` and ``/api/university_recommendations`` submit their
+agent pipeline here and answer ``202`` with a job id instead of holding the
+request open. ``JOB_WORKERS`` worker tasks (greenlets under gevent) take
+jobs from a queue bounded at ``JOB_QUEUE_MAX``. When the queue is full,
+``submit`` returns None and the caller sheds the request.
+
+A finished job is pushed as ``job_done`` to its owner's Socket.IO room
+(``session_service.student_room``). It stays readable through
+``/api/jobs/<id>`` for ``JOB_RESULT_TTL_SECONDS``, and at most
+``JOB_RESULTS_MAX`` jobs are kept. Jobs run in the worker process that
+accepted them, which also writes their state to the results database when
+they are queued, start and finish. A status request that lands on another
+worker is answered from there.
+
+The queue is a ``gevent.queue.Queue``: the workers block on it as
+greenlets, and a stdlib queue would block the whole hub when the server
+runs without monkey-patching (``python app.py``).
+"""
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from gevent.queue import Full, Queue
+
+from . import results_store, session_service
+from .constants import JOB_QUEUE_MAX, JOB_RESULT_TTL_SECONDS, JOB_RESULTS_MAX, JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_socketio = None
+_queue = Queue(maxsize=JOB_QUEUE_MAX)
+_jobs = OrderedDict()  # job id -> job dict, oldest first
+_workers_started = False
+_metrics = {
+    'submitted': 0,
+    'rejected': 0,
+    'done': 0,
+    'failed': 0,
+    'running': 0,
+    'wait_ms_total': 0.0,
+    'run_ms_total': 0.0,
+}
+
+
+def init_app(socketio):
+    global _socketio
+    _socketio = socketio
+
+
+def _ensure_workers():
+    # Started on first use so they run in the serving worker, never in a
+    # preloading master.
+    global _workers_started
+    if _workers_started or _socketio is None:
+        return
+    _workers_started = True
+    for _ in range(JOB_WORKERS):
+        _socketio.start_background_task(_run_worker)
+
+
+def _expire(now):
+    while _jobs:
+        job = next(iter(_jobs.values()))
+        finished = job['finished_at']
+        if len(_jobs) > JOB_RESULTS_MAX and finished is not None:
+            _jobs.popitem(last=False)
+        elif finished is not None and now - finished > JOB_RESULT_TTL_SECONDS:
+            _jobs.popitem(last=False)
+        else:
+            break
+
+
+def submit(kind: str, owner, func, *args, **kwargs):
+    """Queue ``func(*args, **kwargs)``; returns the job dict, or None when full.
+
+    ``owner`` (a student id) is required: it is who may read the job and
+    where its ``job_done`` push goes.
+    """
+    if not owner:
+        raise ValueError("jobs need an owner")
+    now = time.time()
+    _expire(now)
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'owner': owner,
+        'status': 'queued',
+        'result': None,
+        'error': None,
+        'created_at': now,
+        'started_at': None,
+        'finished_at': None,
+    }
+    try:
+        _queue.put_nowait((job, func, args, kwargs))
+    except Full:
+        _metrics['rejected'] += 1
+        return None
+    _jobs[job['id']] = job
+    results_store.record_job(job)
+    _metrics['submitted'] += 1
+    _ensure_workers()
+    return job
+
+
+def get(job_id: str, owner):
+    """The job if it exists, has not expired and belongs to ``owner``.
+
+    Jobs of this worker come from memory, others from the results database.
+    """
+    if not owner:
+        return None
+    now = time.time()
+    _expire(now)
+    job = _jobs.get(job_id)
+    if job is None:
+        job = results_store.load_job(job_id)
+        if job is not None and job['finished_at'] is not None and now - job['finished_at'] > JOB_RESULT_TTL_SECONDS:
+            job = None
+    if job is None or job['owner'] != owner:
+        return None
+    return job
+
+
+def public_view(job):
+    view = {key: job[key] for key in ('id', 'kind', 'status', 'created_at', 'finished_at')}
+    if job['status'] == 'done':
+        view['result'] = job['result']
+    elif job['status'] == 'failed':
+        view['error'] = job['error']
+    elif job['id'] in _jobs:
+        view['queue_position'] = queue_position(job)
+    return view
+
+
+def queue_position(job):
+    if job['status'] != 'queued':
+        return 0
+    return sum(1 for other in _jobs.values() if other['status'] == 'queued' and other['created_at'] <= job['created_at'])
+
+
+def _run_worker():
+    while True:
+        job, func, args, kwargs = _queue.get()
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        results_store.record_job(job)
+        _metrics['running'] += 1
+        _metrics['wait_ms_total'] += (job['started_at'] - job['created_at']) * 1000
+        try:
+            job['result'] = func(*args, **kwargs)
+            job['status'] = 'done'
+            _metrics['done'] += 1
+        except Exception as exc:
+            logger.exception(
+                "Job %s (%s) failed", job['id'], job['kind'], extra={"component": "jobs"}
+            )
+            # Callers raise ValueError with a message meant for the student.
+            job['error'] = str(exc) if isinstance(exc, ValueError) else 'Không thể hoàn thành yêu cầu.'
+            job['status'] = 'failed'
+            _metrics['failed'] += 1
+        finally:
+            job['finished_at'] = time.time()
+            _metrics['running'] -= 1
+            _metrics['run_ms_total'] += (job['finished_at'] - job['started_at']) * 1000
+        try:
+            results_store.record_job(job, expire_before=job['finished_at'] - JOB_RESULT_TTL_SECONDS)
+        except Exception:
+            logger.exception("Could not store job %s", job['id'], extra={"component": "jobs"})
+        _notify(job)
+
+
+def _notify(job):
+    if _socketio is None:
+        return
+    try:
+        _socketio.emit('job_done', public_view(job), to=session_service.student_room(job['owner']))
+    except Exception:
+        logger.exception("Could not push job %s", job['id'], extra={"component": "jobs"})
+
+
+def get_metrics():
+    metrics = dict(_metrics)
+    finished = metrics['done'] + metrics['failed']
+    started = finished + metrics['running']
+    metrics['queued'] = _queue.qsize()
+    metrics['stored'] = len(_jobs)
+    metrics['workers'] = JOB_WORKERS if _workers_started else 0
+    metrics['mean_wait_ms'] = round(metrics.pop('wait_ms_total') / started, 1) if started else 0.0
+    metrics['mean_run_ms'] = round(metrics.pop('run_ms_total') / finished, 1) if finished else 0.0
+    return metrics
@@ -0,0 +1,206 @@
+"""Append-only, memory-mapped ring-buffer journal of device events.
+
+One file per device under JOURNAL_DIR, named after the device id (ids are
+validated against DEVICE_ID_PATTERN, so no two ids share a file). The file
+is a fixed header followed by ``capacity`` fixed-size records; once full,
+the oldest record is overwritten. Writes are plain stores into a shared
+mapping, and the OS flushes dirty pages in the background.
+
+Every worker process maps the same file. An append holds an exclusive
+``flock`` on it and takes the record count from the mapped header, so
+workers never overwrite each other's records.
+
+    header = 8s magic | u32 version | u32 record size | u32 capacity | u64 total written | 16s device
+    record = f64 unix ts | u32 seq (0xFFFFFFFF = none) | u8 event | f32 time | u16 errors
+"""
+import fcntl
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import NamedTuple
+
+from .constants import DEVICE_ID_PATTERN, JOURNAL_CAPACITY, JOURNAL_DIR
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WLJRNL01'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIQ16s')
+RECORD = struct.Struct('<dIBfH')
+_TOTAL = struct.Struct('<Q')
+_TOTAL_OFFSET = struct.calcsize('<8sIII')
+NO_SEQ = 0xFFFFFFFF
+
+EVENT_CODES = {'start': 0, 'update': 1, 'finish': 2, 'heartbeat': 3}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+_DEVICE_ID = re.compile(DEVICE_ID_PATTERN)
+
+
+class JournalRecord(NamedTuple):
+    timestamp: float
+    device_id: str
+    seq: int
+    event: str
+    time: float
+    errors: int
+
+
+class DeviceJournal:
+    __slots__ = ('device_id', 'path', 'capacity', '_file', '_map', '_lock')
+
+    def __init__(self, path: str, device_id=None, capacity: int = JOURNAL_CAPACITY):
+        self.path = path
+        self._lock = threading.Lock()
+        # Opened without truncation and checked under the lock: another worker
+        # may be creating the same journal.
+        self._file = open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        try:
+            with self._locked():
+                header = self._file.read(HEADER.size)
+                if len(header) == HEADER.size:
+                    magic, version, record_size, capacity, _, stored_device = HEADER.unpack(header)
+                    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                        raise ValueError(f"{path} is not a compatible journal")
+                    stored_device = stored_device.rstrip(b'\0').decode('utf-8', 'replace')
+                    if device_id and device_id != stored_device:
+                        raise ValueError(f"{path} belongs to device {stored_device}")
+                    device_id = stored_device
+                    size = HEADER.size + capacity * RECORD.size
+                    self._map = mmap.mmap(self._file.fileno(), size)
+                else:
+                    if not device_id:
+                        raise ValueError("device_id is required for a new journal")
+                    size = HEADER.size + capacity * RECORD.size
+                    self._file.truncate(size)
+                    self._map = mmap.mmap(self._file.fileno(), size)
+                    HEADER.pack_into(
+                        self._map, 0, MAGIC, VERSION, RECORD.size, capacity, 0, device_id.encode('utf-8')[:16]
+                    )
+        except BaseException:
+            self._file.close()
+            raise
+        self.device_id = device_id
+        self.capacity = capacity
+
+    def _locked(self):
+        """Exclusive flock on the file, shared with the other workers."""
+        return _FileLock(self._file)
+
+    @property
+    def total(self) -> int:
+        """Records ever written, by any process."""
+        return _TOTAL.unpack_from(self._map, _TOTAL_OFFSET)[0]
+
+    def append(self, timestamp: float, event: str, seq=None, time_val: float = 0.0, errors: int = 0):
+        with self._lock, self._locked():
+            total = self.total
+            offset = HEADER.size + (total % self.capacity) * RECORD.size
+            RECORD.pack_into(
+                self._map,
+                offset,
+                timestamp,
+                NO_SEQ if seq is None else int(seq) & 0xFFFFFFFF,
+                EVENT_CODES[event],
+                float(time_val),
+                min(max(int(errors), 0), 0xFFFF),
+            )
+            _TOTAL.pack_into(self._map, _TOTAL_OFFSET, total + 1)
+
+    def __iter__(self):
+        """Yield surviving records, oldest first."""
+        with self._lock, self._locked():
+            total = self.total
+            start = max(0, total - self.capacity)
+            raw = [
+                RECORD.unpack_from(self._map, HEADER.size + (i % self.capacity) * RECORD.size)
+                for i in range(start, total)
+            ]
+        for timestamp, seq, event, time_val, errors in raw:
+            yield JournalRecord(
+                timestamp,
+                self.device_id,
+                None if seq == NO_SEQ else seq,
+                EVENT_NAMES.get(event, 'update'),
+                time_val,
+                errors,
+            )
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+
+class _FileLock:
+    __slots__ = ('_file',)
+
+    def __init__(self, file):
+        self._file = file
+
+    def __enter__(self):
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
+_journals = {}  # by file name
+_journals_lock = threading.Lock()
+_enabled = bool(JOURNAL_DIR)
+
+
+def _journal_name(device_id: str) -> str:
+    """File name of the device's journal; ValueError for an id that is not a safe name."""
+    if not _DEVICE_ID.fullmatch(device_id):
+        raise ValueError(f"invalid device id {device_id!r}")
+    return f"{device_id}.wlj"
+
+
+def get_journal(device_id: str):
+    name = _journal_name(device_id)
+    journal = _journals.get(name)
+    if journal is None:
+        with _journals_lock:
+            journal = _journals.get(name)
+            if journal is None:
+                os.makedirs(JOURNAL_DIR, exist_ok=True)
+                journal = DeviceJournal(os.path.join(JOURNAL_DIR, name), device_id)
+                _journals[name] = journal
+    return journal
+
+
+def record(device_id: str, event: str, *, timestamp: float, seq=None, time_val=0.0, errors=0):
+    """Journal one device event; failures are logged once and disable journaling."""
+    global _enabled
+    if not _enabled:
+        return
+    try:
+        get_journal(device_id).append(timestamp, event, seq, time_val, errors)
+    except (OSError, ValueError):
+        _enabled = False
+        logger.exception("Disabling device journal after write failure", extra={"component": "journal"})
+
+
+def open_journal_dir(directory: str):
+    """Open every journal in ``directory``; device ids come from the file headers."""
+    return [
+        DeviceJournal(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if name.endswith('.wlj')
+    ]
+
+
+def close_all():
+    with _journals_lock:
+        for journal in _journals.values():
+            journal.close()
+        _journals.clear()
@@ -0,0 +1,167 @@
+"""Process-wide logging: JSON lines written off the request path.
+
+Every record goes through a QueueHandler into a native queue; a listener on
+a real OS thread formats and writes it, so request greenlets never block on
+stderr. Configuration comes from the environment:
+
+    LOG_LEVEL=INFO                       root level
+    LOG_LEVELS=app=DEBUG,werkzeug=WARNING  per-logger (component) levels
+    LOG_FORMAT=json                      json | text
+    LOG_SAMPLE_PER_SECOND=1              cap for records logged with
+                                         extra={"sampled": True}
+
+Sampled records are limited per (logger, message template); the next record
+that passes carries ``suppressed`` = how many were dropped before it.
+"""
+import copy
+import json
+import logging
+import os
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from .threads import native_lock, native_queue, start_native_thread
+
+# Attributes every LogRecord has; anything else came in through ``extra``.
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limit records flagged ``sampled`` to ``per_second`` per message template."""
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self._interval = 1.0 / per_second if per_second > 0 else None
+        self._lock = native_lock()
+        self._last = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False):
+            return True
+        if self._interval is None:
+            return False
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(key, float('-inf')) < self._interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge args now (they may be mutated later) but keep the traceback
+        # separate from the message so the formatter can emit it as a field.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _NativeQueueListener(QueueListener):
+    """QueueListener whose worker is a real OS thread even under gevent."""
+
+    def start(self):
+        self._stopped = native_lock()
+        self._stopped.acquire()
+        start_native_thread(self._run)
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._stopped.release()
+
+    def stop(self, timeout: float = 5.0):
+        if getattr(self, '_stopped', None) is None:
+            return
+        self.enqueue_sentinel()
+        self._stopped.acquire(timeout=timeout)
+        self._stopped = None
+
+
+_listener = None
+_queue_handler = None
+
+
+def parse_levels(spec: str):
+    """``"app=DEBUG, werkzeug=WARNING"`` -> {"app": "DEBUG", "werkzeug": "WARNING"}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Install the queue pipeline on the root logger; safe to call more than once."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    stream = logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'text':
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    log_queue = native_queue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(float(os.environ.get('LOG_SAMPLE_PER_SECOND', '1'))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    for name, level in parse_levels(os.environ.get('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = _NativeQueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    if hasattr(os, 'register_at_fork'):
+        # The writer thread does not survive fork (gunicorn preloads the app).
+        os.register_at_fork(after_in_child=_restart_after_fork)
+    return _listener
+
+
+def _restart_after_fork():
+    log_queue = native_queue()
+    _queue_handler.queue = log_queue
+    _listener.queue = log_queue
+    _listener.start()
+
+
+def shutdown_logging():
+    """Drain queued records; registered with atexit by the app."""
+    if _listener is not None:
+        _listener.stop()
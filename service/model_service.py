@@ -1,23 +1,54 @@
 import os
+import numpy as np
 import pandas as pd
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 
-from .constants import DATA_FILE
+from . import training_store
+from .constants import DATA_FILE, TRAINING_STORE_DIR
+from .telemetry_features import FEATURE_NAMES
+
+BASE_FEATURE_COLUMNS = ['Time', 'Errors', 'Score']
+# Training columns for the streaming wire-loop features, in FEATURE_NAMES order.
+TELEMETRY_FEATURE_COLUMNS = ['ErrorRate', 'GapMean', 'GapVariance', 'LongestClean', 'BurstCount']
 
 _model = None
 _model_accuracy = 0.0
+_feature_columns = list(BASE_FEATURE_COLUMNS)
+_feature_defaults = {}
+_group_labels = None  # Group category per class code when trained from the store
 
 
-def train_model():
-    global _model, _model_accuracy
-    if not os.path.exists(DATA_FILE):
-        return "Data file not found."
+def _load_store():
+    data = training_store.load(TRAINING_STORE_DIR)
+    columns = [column for column in BASE_FEATURE_COLUMNS + TELEMETRY_FEATURE_COLUMNS if column in data.columns]
+    X = training_store.feature_matrix(data, columns)
+    # Codes, not labels: no per-row strings are built.
+    y = np.asarray(data.columns[training_store.LABEL_COLUMN])
+    return X, y, columns, data.groups
+
 
+def _load_csv():
     df = pd.read_csv(DATA_FILE)
-    X = df[['Time', 'Errors', 'Score']]
-    y = df['Group']
+    # Telemetry features are only used once the dataset carries all of them.
+    columns = list(BASE_FEATURE_COLUMNS)
+    if all(column in df.columns for column in TELEMETRY_FEATURE_COLUMNS):
+        columns += TELEMETRY_FEATURE_COLUMNS
+    return df[columns].to_numpy(dtype=np.float32), df['Group'].to_numpy(), columns, None
+
+
+def train_model():
+    """Train from the training store if one exists, else from ``DATA_FILE``."""
+    global _model, _model_accuracy, _feature_columns, _feature_defaults, _group_labels
+    if training_store.exists(TRAINING_STORE_DIR):
+        X, y, columns, group_labels = _load_store()
+    elif os.path.exists(DATA_FILE):
+        X, y, columns, group_labels = _load_csv()
+    else:
+        return "Data file not found."
+    if not len(y):
+        return "Training data is empty."
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
@@ -28,6 +59,9 @@ def train_model():
     _model_accuracy = accuracy_score(y_test, y_pred)
 
     _model = clf
+    _feature_columns = columns
+    _feature_defaults = {column: float(np.median(X[:, i])) for i, column in enumerate(columns)}
+    _group_labels = group_labels
     return "Model trained successfully."
 
 
@@ -37,6 +71,25 @@ def ensure_model():
     return _model
 
 
+def get_feature_columns():
+    return list(_feature_columns)
+
+
+def build_feature_row(time_val: float, errors_val: int, score_val: int, features=None):
+    """Order inputs like the training columns; missing telemetry falls back to medians."""
+    values = {'Time': time_val, 'Errors': errors_val, 'Score': score_val}
+    for name, column in zip(FEATURE_NAMES, TELEMETRY_FEATURE_COLUMNS):
+        if features and features.get(name) is not None:
+            values[column] = float(features[name])
+    return [values.get(column, _feature_defaults.get(column, 0.0)) for column in _feature_columns]
+
+
+def predict_group(time_val: float, errors_val: int, score_val: int, features=None):
+    model = ensure_model()
+    prediction = model.predict([build_feature_row(time_val, errors_val, score_val, features)])[0]
+    return _group_labels[prediction] if _group_labels is not None else prediction
+
+
 def get_accuracy():
     return _model_accuracy
 
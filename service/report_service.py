@@ -0,0 +1,244 @@
+"""Final reports outside the request path: local reports and whole-class runs.
+
+``generate_class_reports`` produces a report for every student of a class
+from the stored results (``results_store.class_results``). Reports run
+``concurrency`` at a time. A token bucket holds report starts to
+``rate_per_minute``. A rate-limit error from the model (429 /
+RESOURCE_EXHAUSTED) pauses every slot for a backoff before the report is
+retried. Each finished report is recorded in the results database and
+appended to a JSONL checkpoint. A rerun with the same checkpoint skips the
+students already in it, so a crash resumes where it stopped. The progress
+events are dicts, streamed as NDJSON by the admin API and the
+``tools.bulk_reports`` CLI.
+
+With enough students the wall-clock time approaches ``students /
+rate_per_minute`` minutes. Below that bound it approaches
+``students / concurrency`` times the latency of one report.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from career_counselor_chat import local_report
+from career_counselor_chat.service import career_service
+
+from . import model_service, results_store
+from .constants import (
+    BULK_REPORT_CONCURRENCY,
+    BULK_REPORT_DIR,
+    BULK_REPORT_RETRIES,
+    BULK_REPORT_RPM,
+    CAREERS_MAP,
+    REPORT_LLM_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKOFF_SECONDS = 10.0
+_RATE_LIMIT_MARKERS = ('429', 'RESOURCE_EXHAUSTED', 'rate limit', 'quota')
+
+
+def build_local(student_profile, chat_history, best_step1, best_reflex, test_metrics=None):
+    """Report from ``local_report`` with the model's group for these bests."""
+    model_service.ensure_model()
+    group = model_service.predict_group(
+        float(best_step1.get('time') or 0),
+        int(best_step1.get('errors') or 0),
+        int(best_reflex.get('quantity') or 0),
+    )
+    report = local_report.build_local_report(
+        student_profile=student_profile,
+        chat_history=chat_history,
+        test_metrics=test_metrics,
+        group=group,
+        group_careers=CAREERS_MAP.get(group, ()),
+    )
+    report['source'] = 'local'
+    return report
+
+
+def test_metrics_for(best_step1, best_reflex):
+    """The shape ``career_service.update_test_metrics`` takes."""
+    return {
+        'ingenuous': {'time': best_step1.get('time'), 'mistake': best_step1.get('errors')},
+        'reflex': {'time': best_reflex.get('time'), 'quantity': best_reflex.get('quantity')},
+    }
+
+
+class RateLimiter:
+    """Token bucket over report starts, shared by all slots of a run."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self._interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._tat = 0.0  # theoretical arrival time of the next start (GCRA)
+        self._paused_until = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            # Up to ``burst`` starts may go back to back after an idle spell.
+            start = max(now, self._paused_until, tat - self._interval * (self._burst - 1))
+            self._tat = tat + self._interval
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Hold every slot back, e.g. after the model reported a rate limit."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Resume at the steady rate rather than with a burst.
+            self._tat = max(self._tat, self._paused_until + self._interval * (self._burst - 1))
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    text = f"{type(exc).__name__} {exc}"
+    return any(marker.lower() in text.lower() for marker in _RATE_LIMIT_MARKERS)
+
+
+def checkpoint_path(class_name: str, grade=None) -> str:
+    safe = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in f"{grade or 'all'}-{class_name}")
+    return os.path.join(BULK_REPORT_DIR, f"{safe}.jsonl")
+
+
+def read_checkpoint(path: str) -> dict:
+    """student id -> report for every complete line of the checkpoint."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            done[entry['student_id']] = entry['report']
+    return done
+
+
+def _generate_one(student, limiter, timeout):
+    best_step1, best_reflex = student['best_step1'], student['best_reflex']
+    if not student['chat_history']:
+        # No transcript to counsel from: the local report still covers the tests.
+        metrics = test_metrics_for(best_step1, best_reflex)
+        return build_local(student['profile'], [], best_step1, best_reflex, metrics)
+    user_id = f"bulk-{student['student_id']}"
+    for attempt in range(BULK_REPORT_RETRIES + 1):
+        limiter.acquire()
+        career_service.update_test_metrics(user_id=user_id, **test_metrics_for(best_step1, best_reflex))
+        try:
+            report = career_service.generate_final_report(
+                student_profile=student['profile'],
+                chat_history=student['chat_history'],
+                user_id=user_id,
+                timeout=timeout,
+            )
+            report['source'] = 'llm'
+            return report
+        except Exception as exc:
+            if attempt == BULK_REPORT_RETRIES or not is_rate_limited(exc):
+                raise
+            backoff = RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random() / 2)
+            logger.warning(
+                "Rate limited on %s, pausing %.0fs", student['student_id'], backoff,
+                extra={"component": "bulk_report"},
+            )
+            limiter.pause(backoff)
+        finally:
+            career_service.reset_test_metrics(user_id=user_id)
+
+
+def generate_class_reports(
+    class_name: str,
+    grade=None,
+    *,
+    concurrency: int = BULK_REPORT_CONCURRENCY,
+    rate_per_minute: float = BULK_REPORT_RPM,
+    checkpoint=None,
+    timeout: float = REPORT_LLM_TIMEOUT,
+):
+    """Yield progress events while generating every missing report of a class."""
+    started = time.monotonic()
+    path = checkpoint or checkpoint_path(class_name, grade)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    done = read_checkpoint(path)
+    roster = results_store.class_results(class_name, grade)
+    pending = []
+    skipped = []
+    for student in roster:
+        if student['student_id'] in done:
+            continue
+        if not student['best_step1'] or not student['best_reflex']:
+            skipped.append(student['student_id'])
+            continue
+        pending.append(student)
+    yield {
+        'event': 'start',
+        'class_name': class_name,
+        'grade': grade,
+        'students': len(roster),
+        'already_done': len(roster) - len(pending) - len(skipped),
+        'pending': len(pending),
+        'missing_results': skipped,
+        'concurrency': concurrency,
+        'rate_per_minute': rate_per_minute,
+        'checkpoint': path,
+    }
+    limiter = RateLimiter(rate_per_minute, burst=concurrency)
+    completed = failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    # A closed stream (client gone) cancels the reports not yet started.
+    try:
+        with open(path, 'a', encoding='utf-8') as handle:
+            futures = {
+                pool.submit(_generate_one, student, limiter, timeout): (student, time.monotonic())
+                for student in pending
+            }
+            for future in as_completed(futures):
+                student, submitted = futures[future]
+                event = {
+                    'event': 'report',
+                    'student_id': student['student_id'],
+                    'name': student['profile']['full_name'],
+                }
+                try:
+                    report = future.result()
+                except Exception as exc:
+                    failed += 1
+                    logger.exception(
+                        "Bulk report failed for %s", student['student_id'], extra={"component": "bulk_report"}
+                    )
+                    event.update(status='failed', error=str(exc) or type(exc).__name__)
+                else:
+                    completed += 1
+                    results_store.record_report(student['student_id'], student['profile'], report)
+                    line = json.dumps({'student_id': student['student_id'], 'report': report}, ensure_ascii=False)
+                    handle.write(line + '\n')
+                    handle.flush()
+                    # The report itself is in the checkpoint and the results database.
+                    event.update(status='done', source=report.get('source'))
+                event.update(
+                    elapsed_ms=round((time.monotonic() - submitted) * 1000),
+                    completed=completed,
+                    failed=failed,
+                    remaining=len(pending) - completed - failed,
+                )
+                yield event
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    wall = time.monotonic() - started
+    yield {
+        'event': 'end',
+        'completed': completed,
+        'failed': failed,
+        'wall_seconds': round(wall, 1),
+        # Lower bound set by the rate limit alone, to compare with wall_seconds.
+        'rate_bound_seconds': round(len(pending) * 60.0 / rate_per_minute, 1) if rate_per_minute > 0 else None,
+    }
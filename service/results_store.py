@@ -0,0 +1,499 @@
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import sqlite3
+import time as t
+import uuid
+from datetime import datetime
+
+from .constants import RESULTS_DB_FILE, RESULTS_WRITE_BATCH_SIZE
+from .threads import native_lock, native_queue, run_blocking, start_native_thread
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id TEXT PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    grade TEXT,
+    class_name TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_students_class ON students (class_name, grade);
+CREATE INDEX IF NOT EXISTS idx_students_grade ON students (grade);
+CREATE INDEX IF NOT EXISTS idx_students_created ON students (created_at);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT,
+    grade TEXT,
+    class_name TEXT,
+    kind TEXT NOT NULL,
+    time REAL,
+    errors INTEGER,
+    quantity INTEGER,
+    improved INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    device_id TEXT,
+    features TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_class ON runs (class_name, grade, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_grade ON runs (grade, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_student ON runs (student_id, kind);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT,
+    grade TEXT,
+    class_name TEXT,
+    name TEXT,
+    fit_job TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_class ON reports (class_name, grade, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_grade ON reports (grade, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports (created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_student ON reports (student_id);
+
+CREATE TABLE IF NOT EXISTS faq_lookups (
+    id TEXT PRIMARY KEY,
+    student_id TEXT,
+    grade TEXT,
+    class_name TEXT,
+    message TEXT NOT NULL,
+    intent TEXT,
+    score REAL,
+    margin REAL,
+    outcome TEXT NOT NULL,
+    verdict TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_faq_lookups_created ON faq_lookups (created_at);
+
+CREATE TABLE IF NOT EXISTS chats (
+    student_id TEXT PRIMARY KEY,
+    grade TEXT,
+    class_name TEXT,
+    history TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_class ON chats (class_name, grade);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+"""
+
+EXPORT_COLUMNS = {
+    'students': ('id', 'full_name', 'grade', 'class_name', 'created_at', 'updated_at'),
+    'runs': (
+        'id', 'student_id', 'grade', 'class_name', 'kind',
+        'time', 'errors', 'quantity', 'improved', 'created_at', 'device_id', 'features',
+    ),
+    'reports': ('id', 'student_id', 'grade', 'class_name', 'name', 'fit_job', 'payload', 'created_at'),
+    'faq_lookups': (
+        'id', 'student_id', 'grade', 'class_name', 'message', 'intent',
+        'score', 'margin', 'outcome', 'verdict', 'created_at',
+    ),
+}
+_TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+_EXPORT_FETCH_SIZE = 500
+
+# Write-behind: request handlers only enqueue; a native thread owns the single
+# writer connection and commits in batches so fsync never runs on a greenlet.
+_queue = native_queue()
+_writer_lock = native_lock()
+_writer_started = False
+_FLUSH = object()
+_STOP = object()
+
+
+def new_student_id():
+    return uuid.uuid4().hex
+
+
+def _connect(path=None):
+    conn = sqlite3.connect(path or RESULTS_DB_FILE, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+
+def init_db(path=None):
+    directory = os.path.dirname(os.path.abspath(path or RESULTS_DB_FILE))
+    os.makedirs(directory, exist_ok=True)
+    conn = _connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        run_columns = {row[1] for row in conn.execute('PRAGMA table_info(runs)')}
+        for column in ('device_id', 'features'):
+            if column not in run_columns:
+                conn.execute(f'ALTER TABLE runs ADD COLUMN {column} TEXT')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _ensure_writer():
+    global _writer_started
+    if _writer_started:
+        return
+    with _writer_lock:
+        if _writer_started:
+            return
+        init_db()
+        start_native_thread(_writer_loop)
+        _writer_started = True
+
+
+def _writer_loop():
+    conn = _connect()
+    while True:
+        item = _queue.get()
+        batch = [item]
+        while len(batch) < RESULTS_WRITE_BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        waiters = []
+        writes = []
+        stop = False
+        for entry in batch:
+            if entry is _STOP:
+                stop = True
+            elif isinstance(entry, tuple) and entry and entry[0] is _FLUSH:
+                waiters.append(entry[1])
+            else:
+                writes.append(entry)
+        _commit(conn, writes)
+        for waiter in waiters:
+            waiter.release()
+        if stop:
+            conn.close()
+            return
+
+
+def _commit(conn, writes):
+    """Commit ``writes`` as one transaction; if it fails, retry them one by one.
+
+    A failing statement then only loses itself, not the whole batch.
+    """
+    if not writes:
+        return
+    try:
+        with conn:
+            for sql, params in writes:
+                conn.execute(sql, params)
+        return
+    except Exception:
+        logger.warning("Batch of %d result writes failed; retrying one by one", len(writes), exc_info=True)
+    for sql, params in writes:
+        try:
+            with conn:
+                conn.execute(sql, params)
+        except Exception:
+            logger.exception("Dropped result write: %s", sql)
+
+
+def _enqueue(sql, params):
+    _ensure_writer()
+    _queue.put((sql, params))
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Block until every write queued so far has been committed."""
+    if not _writer_started:
+        return True
+    waiter = native_lock()
+    waiter.acquire()
+    _queue.put((_FLUSH, waiter))
+    return waiter.acquire(timeout=timeout)
+
+
+def _profile_fields(profile):
+    profile = profile or {}
+    return (
+        (profile.get('full_name') or '').strip(),
+        (profile.get('grade') or '').strip() or None,
+        (profile.get('class_name') or '').strip() or None,
+    )
+
+
+def save_student(student_id: str, profile: dict):
+    full_name, grade, class_name = _profile_fields(profile)
+    now = t.time()
+    _enqueue(
+        "INSERT INTO students (id, full_name, grade, class_name, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET full_name=excluded.full_name, grade=excluded.grade, "
+        "class_name=excluded.class_name, updated_at=excluded.updated_at",
+        (student_id, full_name, grade, class_name, now, now),
+    )
+
+
+def record_run(
+    student_id,
+    profile,
+    kind: str,
+    *,
+    time_val=None,
+    errors=None,
+    quantity=None,
+    improved=False,
+    device_id=None,
+    features=None,
+):
+    _, grade, class_name = _profile_fields(profile)
+    _enqueue(
+        "INSERT INTO runs (student_id, grade, class_name, kind, time, errors, quantity, improved, "
+        "created_at, device_id, features) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            student_id,
+            grade,
+            class_name,
+            kind,
+            time_val,
+            errors,
+            quantity,
+            int(bool(improved)),
+            t.time(),
+            device_id,
+            json.dumps(features) if features else None,
+        ),
+    )
+
+
+def record_report(student_id, profile, report: dict):
+    _, grade, class_name = _profile_fields(profile)
+    _enqueue(
+        "INSERT INTO reports (student_id, grade, class_name, name, fit_job, payload, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            student_id,
+            grade,
+            class_name,
+            report.get('name'),
+            report.get('fit_job'),
+            json.dumps(report, ensure_ascii=False),
+            t.time(),
+        ),
+    )
+
+
+def record_chat(student_id, profile, history: list):
+    """Keep the latest counselling transcript per student (for bulk reports)."""
+    _, grade, class_name = _profile_fields(profile)
+    _enqueue(
+        "INSERT INTO chats (student_id, grade, class_name, history, updated_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(student_id) DO UPDATE SET grade=excluded.grade, class_name=excluded.class_name, "
+        "history=excluded.history, updated_at=excluded.updated_at",
+        (student_id, grade, class_name, json.dumps(history, ensure_ascii=False), t.time()),
+    )
+
+
+def record_faq_lookup(lookup_id, student_id, profile, *, message, intent, score, margin, outcome):
+    _, grade, class_name = _profile_fields(profile)
+    _enqueue(
+        "INSERT INTO faq_lookups (id, student_id, grade, class_name, message, intent, score, margin, "
+        "outcome, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (lookup_id, student_id, grade, class_name, message, intent, round(score, 4), round(margin, 4),
+         outcome, t.time()),
+    )
+
+
+def record_faq_verdict(lookup_id, verdict: str):
+    _enqueue("UPDATE faq_lookups SET verdict = ? WHERE id = ?", (verdict, lookup_id))
+
+
+def record_job(job: dict, *, expire_before=None):
+    """Store a job's state so any worker can answer for it; drops jobs finished before ``expire_before``."""
+    _enqueue(
+        "INSERT INTO jobs (id, kind, owner, status, result, error, created_at, started_at, finished_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET status=excluded.status, result=excluded.result, "
+        "error=excluded.error, started_at=excluded.started_at, finished_at=excluded.finished_at",
+        (
+            job['id'],
+            job['kind'],
+            job['owner'],
+            job['status'],
+            json.dumps(job['result'], ensure_ascii=False) if job['result'] is not None else None,
+            job['error'],
+            job['created_at'],
+            job['started_at'],
+            job['finished_at'],
+        ),
+    )
+    if expire_before is not None:
+        _enqueue("DELETE FROM jobs WHERE finished_at < ?", (expire_before,))
+
+
+def load_job(job_id: str):
+    """A job stored by ``record_job`` (by any worker), or None."""
+    for row in _iter_query(
+        "SELECT id, kind, owner, status, result, error, created_at, started_at, finished_at "
+        "FROM jobs WHERE id = ?",
+        (job_id,),
+    ):
+        job = dict(zip(('id', 'kind', 'owner', 'status', 'result', 'error', 'created_at', 'started_at',
+                        'finished_at'), row))
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+    return None
+
+
+def report_stored_since(student_id: str, since: float) -> bool:
+    """Whether a report for ``student_id`` was stored at or after ``since``."""
+    for _ in _iter_query(
+        "SELECT 1 FROM reports WHERE student_id = ? AND created_at >= ? LIMIT 1", (student_id, since)
+    ):
+        return True
+    return False
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def iter_rows(table: str, *, class_name=None, grade=None, since=None, until=None):
+    """Return a lazy row iterator over ``table``, using the class/grade/date indexes."""
+    columns = EXPORT_COLUMNS.get(table)
+    if columns is None:
+        raise ValueError(f"Unknown table: {table}")
+    clauses = []
+    params = []
+    if class_name:
+        clauses.append('class_name = ?')
+        params.append(class_name)
+    if grade:
+        clauses.append('grade = ?')
+        params.append(grade)
+    if since:
+        clauses.append('created_at >= ?')
+        params.append(_parse_date(since))
+    if until:
+        clauses.append('created_at < ?')
+        params.append(_parse_date(until))
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY created_at'
+    return _iter_query(sql, params)
+
+
+def iter_best_runs():
+    """Yield every personal-best run in insertion order (used to warm aggregates)."""
+    return _iter_query(
+        "SELECT student_id, grade, class_name, kind, time, errors, quantity FROM runs "
+        "WHERE improved = 1 AND student_id IS NOT NULL ORDER BY id",
+        (),
+    )
+
+
+def class_results(class_name: str, grade=None):
+    """Students of a class with their latest personal bests and chat transcript.
+
+    Returns dicts with ``student_id``, ``profile``, ``best_step1``
+    (``time``/``errors``), ``best_reflex`` (``time``/``quantity``) and
+    ``chat_history``; missing results are None or empty. Waits for queued
+    writes first so results from moments ago are included; the wait runs on
+    the native threadpool so a request greenlet does not block the hub.
+    """
+    run_blocking(flush)
+    where = 'class_name = ?' + (' AND grade = ?' if grade else '')
+    params = (class_name, grade) if grade else (class_name,)
+    students = {}
+    for student_id, full_name, student_grade, student_class in _iter_query(
+        f"SELECT id, full_name, grade, class_name FROM students WHERE {where} ORDER BY full_name", params
+    ):
+        students[student_id] = {
+            'student_id': student_id,
+            'profile': {'full_name': full_name, 'grade': student_grade or '', 'class_name': student_class or ''},
+            'best_step1': None,
+            'best_reflex': None,
+            'chat_history': [],
+        }
+    for student_id, kind, time_val, errors, quantity in _iter_query(
+        f"SELECT student_id, kind, time, errors, quantity FROM runs WHERE improved = 1 AND {where} ORDER BY id",
+        params,
+    ):
+        student = students.get(student_id)
+        if student is None:
+            continue
+        if kind == 'wire_loop':
+            student['best_step1'] = {'time': time_val, 'errors': errors}
+        elif kind == 'reflex':
+            student['best_reflex'] = {'time': time_val, 'quantity': quantity}
+    for student_id, history in _iter_query(f"SELECT student_id, history FROM chats WHERE {where}", params):
+        if student_id in students:
+            students[student_id]['chat_history'] = json.loads(history)
+    return list(students.values())
+
+
+def _iter_query(sql, params):
+    _ensure_writer()
+    conn = _connect()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(_EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def iter_csv(table: str, **filters):
+    """Stream ``table`` as CSV text chunks without materializing the result set."""
+    columns = EXPORT_COLUMNS.get(table)
+    if columns is None:
+        raise ValueError(f"Unknown table: {table}")
+    for key in ('since', 'until'):
+        _parse_date(filters.get(key))
+    return _generate_csv(columns, iter_rows(table, **filters))
+
+
+def _generate_csv(columns, rows):
+    timestamp_idx = [i for i, name in enumerate(columns) if name in _TIMESTAMP_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        row = list(row)
+        for idx in timestamp_idx:
+            if row[idx] is not None:
+                row[idx] = datetime.fromtimestamp(row[idx]).isoformat(timespec='seconds')
+        writer.writerow(row)
+        if count % _EXPORT_FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@atexit.register
+def _shutdown():
+    if _writer_started:
+        flush(timeout=2.0)
+        _queue.put(_STOP)
@@ -1,6 +1,7 @@
 from flask import session
 
 from career_counselor_chat.service import career_service
+from . import results_store
 from .constants import (
     BEST_STEP1_SESSION_KEY,
     BEST_REFLEX_SESSION_KEY,
@@ -8,14 +9,42 @@ from .constants import (
     CAREER_SUMMARY_SESSION_KEY,
     CHARACTERISTIC_READY_SESSION_KEY,
     CHAT_DONE_SESSION_KEY,
+    STUDENT_ID_SESSION_KEY,
     TEST_USER_ID,
 )
 
 
+def student_room(student_id: str) -> str:
+    return f"student:{student_id}"
+
+
+def current_student():
+    return session.get(STUDENT_ID_SESSION_KEY), session.get('student_info')
+
+
+def tests_completed() -> bool:
+    """Whether this session's tests are done.
+
+    Set in the session by the request that finishes them. A final report
+    built by a background job (on any worker) counts too: it is stored in
+    the results database, which is checked from the start of this attempt.
+    """
+    if session.get('tests_completed'):
+        return True
+    student_id = session.get(STUDENT_ID_SESSION_KEY)
+    started_at = session.get('tests_started_at')
+    if student_id and started_at and results_store.report_stored_since(student_id, started_at):
+        session['tests_completed'] = True
+        return True
+    return False
+
+
 def reset_session_state():
     session.pop('student_info', None)
+    session.pop(STUDENT_ID_SESSION_KEY, None)
     session.pop('tests_in_progress', None)
     session.pop('tests_completed', None)
+    session.pop('tests_started_at', None)
     session.pop(BEST_STEP1_SESSION_KEY, None)
     session.pop(BEST_REFLEX_SESSION_KEY, None)
     session.pop(CHAT_HISTORY_SESSION_KEY, None)
@@ -0,0 +1,176 @@
+import bisect
+import math
+import threading
+
+from . import results_store
+
+WIRE_TIME = 'wire_time'
+WIRE_ERRORS = 'wire_errors'
+REFLEX_QUANTITY = 'reflex_quantity'
+METRICS = (WIRE_TIME, WIRE_ERRORS, REFLEX_QUANTITY)
+_LOWER_IS_BETTER = {WIRE_TIME, WIRE_ERRORS}
+
+
+class RunningStats:
+    """Welford mean/variance plus a sorted sample for O(log n) percentile lookups."""
+
+    __slots__ = ('count', 'mean', '_m2', 'values')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.values = []
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        bisect.insort(self.values, value)
+
+    def remove(self, value: float):
+        idx = bisect.bisect_left(self.values, value)
+        if idx == len(self.values) or self.values[idx] != value:
+            return
+        del self.values[idx]
+        if self.count == 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.mean = (self.mean * self.count - value) / (self.count - 1)
+        self._m2 = max(self._m2 - delta * (value - self.mean), 0.0)
+        self.count -= 1
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    def standing(self, value: float, lower_is_better: bool) -> float:
+        """Percent of the sample this value beats, counting ties as half."""
+        if not self.count:
+            return 0.0
+        left = bisect.bisect_left(self.values, value)
+        right = bisect.bisect_right(self.values, value)
+        worse = self.count - right if lower_is_better else left
+        return 100.0 * (worse + (right - left) / 2) / self.count
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 3),
+            'stddev': round(math.sqrt(self.variance), 3),
+        }
+
+
+_lock = threading.Lock()
+_aggregates = {}
+# (student_id, metric) -> (scopes, value) so a new best replaces the old one.
+_student_values = {}
+_warmed = False
+
+
+def _scopes(profile):
+    """Aggregate keys of a student: their grade and their class within that grade."""
+    profile = profile or {}
+    grade = (profile.get('grade') or '').strip()
+    class_name = (profile.get('class_name') or '').strip()
+    scopes = []
+    if grade:
+        scopes.append(('grade', grade))
+    if class_name:
+        # The same class name can exist in several grades.
+        scopes.append(('class', grade, class_name))
+    return tuple(scopes)
+
+
+def _observe_locked(student_id, scopes, metric, value):
+    previous = _student_values.get((student_id, metric))
+    if previous:
+        prev_scopes, prev_value = previous
+        for scope in prev_scopes:
+            _aggregates[scope][metric].remove(prev_value)
+    for scope in scopes:
+        per_metric = _aggregates.setdefault(scope, {name: RunningStats() for name in METRICS})
+        per_metric[metric].add(value)
+    _student_values[(student_id, metric)] = (scopes, value)
+
+
+def _ensure_warm():
+    """Rebuild aggregates once from stored best runs instead of rescanning per request."""
+    global _warmed
+    if _warmed:
+        return
+    with _lock:
+        if _warmed:
+            return
+        for row in results_store.iter_best_runs():
+            student_id, grade, class_name, kind, time_val, errors, quantity = row
+            scopes = _scopes({'grade': grade, 'class_name': class_name})
+            if kind == 'wire_loop':
+                _observe_locked(student_id, scopes, WIRE_TIME, float(time_val or 0.0))
+                _observe_locked(student_id, scopes, WIRE_ERRORS, float(errors or 0))
+            elif kind == 'reflex':
+                _observe_locked(student_id, scopes, REFLEX_QUANTITY, float(quantity or 0))
+        _warmed = True
+
+
+def observe_step1(student_id, profile, time_val: float, errors_val: int):
+    if not student_id:
+        return
+    _ensure_warm()
+    scopes = _scopes(profile)
+    with _lock:
+        _observe_locked(student_id, scopes, WIRE_TIME, float(time_val))
+        _observe_locked(student_id, scopes, WIRE_ERRORS, float(errors_val))
+
+
+def observe_reflex(student_id, profile, quantity: int):
+    if not student_id:
+        return
+    _ensure_warm()
+    scopes = _scopes(profile)
+    with _lock:
+        _observe_locked(student_id, scopes, REFLEX_QUANTITY, float(quantity))
+
+
+def get_ranks(student_id, profile):
+    """Percentile standing of a student's bests within their class and grade."""
+    if not student_id:
+        return {}
+    _ensure_warm()
+    ranks = {}
+    with _lock:
+        for scope in _scopes(profile):
+            per_metric = _aggregates.get(scope)
+            if not per_metric:
+                continue
+            entry = {}
+            for metric in METRICS:
+                stored = _student_values.get((student_id, metric))
+                stats = per_metric[metric]
+                if not stored or not stats.count:
+                    continue
+                entry[metric] = round(stats.standing(stored[1], metric in _LOWER_IS_BETTER), 1)
+            if entry:
+                entry['count'] = max(per_metric[m].count for m in METRICS)
+                ranks[scope[0]] = {'name': scope[-1], **entry}
+    return ranks
+
+
+def get_summary(*, grade=None, class_name=None):
+    """Aggregates of a grade, or of ``class_name`` within ``grade``.
+
+    Class names repeat across grades, so a class needs its grade.
+    """
+    grade = (grade or '').strip()
+    class_name = (class_name or '').strip()
+    if not grade:
+        raise ValueError('grade is required')
+    _ensure_warm()
+    scope = ('class', grade, class_name) if class_name else ('grade', grade)
+    with _lock:
+        per_metric = _aggregates.get(scope)
+        if not per_metric:
+            return {}
+        return {metric: stats.summary() for metric, stats in per_metric.items()}
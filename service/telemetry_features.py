@@ -0,0 +1,76 @@
+"""Streaming features over one wire-loop run's update stream.
+
+Everything is O(1) per update and per run: no samples are kept, only running
+sums (Welford for the inter-error gaps) and a few maxima.
+"""
+
+# An error this soon after the previous one belongs to the same burst.
+BURST_GAP_SECONDS = 1.0
+
+FEATURE_NAMES = ('error_rate', 'gap_mean', 'gap_variance', 'longest_clean', 'burst_count')
+
+
+class RunFeatures:
+    __slots__ = (
+        'time', 'errors', 'last_error_time', 'longest_clean',
+        'gap_count', 'gap_mean', '_gap_m2', 'burst_count', '_in_burst',
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.time = 0.0
+        self.errors = 0
+        self.last_error_time = 0.0
+        self.longest_clean = 0.0
+        self.gap_count = 0
+        self.gap_mean = 0.0
+        self._gap_m2 = 0.0
+        self.burst_count = 0
+        self._in_burst = False
+
+    def observe(self, time_val: float, errors_val: int):
+        """Fold one cumulative (time, errors) sample into the running stats."""
+        if time_val < self.time:
+            return
+        new_errors = errors_val - self.errors
+        if new_errors > 0:
+            # Errors arriving in one sample are spread evenly since the previous
+            # one: the first closes the gap (and clean stretch) from the last
+            # error, the rest are ``step`` apart. Folded in closed form, so the
+            # cost is O(1).
+            step = (time_val - self.time) / new_errors
+            self.longest_clean = max(self.longest_clean, self.time + step - self.last_error_time)
+            if self.errors > 0:
+                self._add_gaps(self.time + step - self.last_error_time, 1)
+            if new_errors > 1:
+                self._add_gaps(step, new_errors - 1)
+            self.last_error_time = time_val
+            self.errors = errors_val
+        else:
+            self.longest_clean = max(self.longest_clean, time_val - self.last_error_time)
+        self.time = time_val
+
+    def _add_gaps(self, gap: float, count: int):
+        """Fold ``count`` equal gaps into the Welford sums (Chan's merge)."""
+        total = self.gap_count + count
+        delta = gap - self.gap_mean
+        self.gap_mean += delta * count / total
+        self._gap_m2 += delta * delta * self.gap_count * count / total
+        self.gap_count = total
+        if gap <= BURST_GAP_SECONDS:
+            if not self._in_burst:
+                self.burst_count += 1
+            self._in_burst = True
+        else:
+            self._in_burst = False
+
+    def as_dict(self):
+        return {
+            'error_rate': round(self.errors / self.time, 4) if self.time > 0 else 0.0,
+            'gap_mean': round(self.gap_mean, 4),
+            'gap_variance': round(self._gap_m2 / self.gap_count, 4) if self.gap_count else 0.0,
+            'longest_clean': round(self.longest_clean, 3),
+            'burst_count': self.burst_count,
+        }
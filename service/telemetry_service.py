@@ -0,0 +1,212 @@
+"""UDP ingestion path for ESP32 wire-loop telemetry.
+
+Each datagram carries a small batch of fixed-size binary frames:
+
+    header  = magic b'WL' | u8 frame count
+    frame   = u8 version | u8 event | 8s device id | u32 boot | u32 seq | f32 time | u16 errors
+
+All fields are little-endian. ``boot`` is a random nonce the station picks at
+power-up; a new nonce restarts the device's sequence. Version 1 frames (no
+boot field) from older firmware are still accepted; every frame of a
+datagram has the same version. Events are start/update/finish/heartbeat, and
+any frame counts as device presence. Compared to one HTTP POST per update this
+skips Flask routing, the access hook, cookie/session handling and per-event
+logging.
+"""
+import logging
+import re
+import struct
+from typing import NamedTuple
+
+from . import game_service, results_store
+from .constants import DEVICE_ID_PATTERN, MAX_RUN_ERRORS, MAX_RUN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WL'
+PROTOCOL_VERSION = 2
+HEADER = struct.Struct('<2sB')
+FRAME = struct.Struct('<BB8sIIfH')
+FRAME_V1 = struct.Struct('<BB8sIfH')
+_FRAMES = {1: FRAME_V1, PROTOCOL_VERSION: FRAME}
+_DEVICE_ID = re.compile(DEVICE_ID_PATTERN)
+
+EVENT_START = 0
+EVENT_UPDATE = 1
+EVENT_FINISH = 2
+EVENT_HEARTBEAT = 3
+EVENT_NAMES = {
+    EVENT_START: 'start',
+    EVENT_UPDATE: 'update',
+    EVENT_FINISH: 'finish',
+    EVENT_HEARTBEAT: 'heartbeat',
+}
+EVENT_CODES = {name: code for code, name in EVENT_NAMES.items()}
+
+
+class Frame(NamedTuple):
+    event: str
+    device_id: str
+    seq: int
+    time: float
+    errors: int
+    boot: int = 0  # 0 = unknown (version 1 frames, replays)
+
+
+_metrics = {
+    'datagrams': 0,
+    'frames': 0,
+    'stale_frames': 0,
+    'malformed_datagrams': 0,
+    'rejected_frames': 0,
+}
+_server = None
+
+
+def encode_frames(frames) -> bytes:
+    frames = list(frames)
+    chunks = [HEADER.pack(MAGIC, len(frames))]
+    for frame in frames:
+        chunks.append(FRAME.pack(
+            PROTOCOL_VERSION,
+            EVENT_CODES[frame.event],
+            frame.device_id.encode('ascii')[:8],
+            frame.boot,
+            frame.seq,
+            frame.time,
+            frame.errors,
+        ))
+    return b''.join(chunks)
+
+
+def decode_frames(data: bytes):
+    """Parse one datagram; raises ValueError when it is not a valid batch."""
+    if len(data) < HEADER.size:
+        raise ValueError('datagram too short')
+    magic, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('bad magic')
+    version = data[HEADER.size] if len(data) > HEADER.size else PROTOCOL_VERSION
+    frame_struct = _FRAMES.get(version)
+    if frame_struct is None:
+        raise ValueError('unsupported frame')
+    if len(data) != HEADER.size + count * frame_struct.size:
+        raise ValueError('frame count does not match datagram length')
+    frames = []
+    for offset in range(HEADER.size, len(data), frame_struct.size):
+        fields = frame_struct.unpack_from(data, offset)
+        if version == 1:
+            frame_version, event, device_id, seq, time_val, errors = fields
+            boot = 0
+        else:
+            frame_version, event, device_id, boot, seq, time_val, errors = fields
+        if frame_version != version or event not in EVENT_NAMES:
+            raise ValueError('unsupported frame')
+        if not 0.0 <= time_val <= MAX_RUN_SECONDS or errors > MAX_RUN_ERRORS:
+            raise ValueError('reading out of range')
+        device_id = device_id.rstrip(b'\0').decode('ascii', 'replace')
+        if not _DEVICE_ID.fullmatch(device_id):
+            raise ValueError('invalid device id')
+        frames.append(Frame(
+            EVENT_NAMES[event],
+            device_id,
+            seq,
+            time_val,
+            errors,
+            boot,
+        ))
+    return frames
+
+
+def apply_frame(frame: Frame) -> bool:
+    """Feed one frame into game_service; False when it was stale."""
+    if frame.event == 'heartbeat':
+        game_service.record_heartbeat(frame.device_id, frame.seq)
+        return True
+    game_service.touch_device(frame.device_id)
+    boot = frame.boot or None
+    if frame.event == 'start':
+        return game_service.mark_game_start(frame.device_id, frame.seq, boot) is not None
+    if frame.event == 'update':
+        return game_service.update_game_state(
+            frame.time, frame.errors, frame.device_id, frame.seq, boot
+        ) is not None
+    if game_service.finish_game_state(frame.time, frame.errors, frame.device_id, frame.seq, boot) is None:
+        return False
+    # No browser session on this path; the run is stored against the station.
+    results_store.record_run(
+        None,
+        None,
+        'wire_loop',
+        time_val=frame.time,
+        errors=frame.errors,
+        device_id=frame.device_id,
+        features=game_service.get_run_features(frame.device_id),
+    )
+    return True
+
+
+def handle_datagram(data: bytes, on_update=None):
+    """Apply a batch and notify ``on_update(device_id, event)`` once per device.
+
+    The batch is applied in order so start/finish transitions are not lost,
+    but only the last accepted event of each device is announced.
+    """
+    _metrics['datagrams'] += 1
+    try:
+        frames = decode_frames(data)
+    except (ValueError, struct.error):
+        _metrics['malformed_datagrams'] += 1
+        logger.debug("Dropping malformed telemetry datagram (%d bytes)", len(data))
+        return
+    latest = {}
+    for frame in frames:
+        _metrics['frames'] += 1
+        try:
+            accepted = apply_frame(frame)
+        except ValueError:
+            # A new station beyond MAX_DEVICES.
+            _metrics['rejected_frames'] += 1
+            continue
+        if not accepted:
+            _metrics['stale_frames'] += 1
+            continue
+        if frame.event != 'heartbeat':
+            latest[frame.device_id] = frame.event
+    if on_update is not None:
+        for device_id, event in latest.items():
+            on_update(device_id, event)
+
+
+def start_listener(port: int, on_update=None, host: str = '0.0.0.0'):
+    """Start the UDP listener on the gevent hub; returns False if the port is taken."""
+    global _server
+    if _server is not None:
+        return True
+    from gevent import socket as gsocket
+    from gevent.server import DatagramServer
+
+    # Bind without SO_REUSEADDR (DatagramServer's default on POSIX): with
+    # several gunicorn workers exactly one must own the port, or datagrams
+    # from one station would be spread over workers with separate state.
+    sock = gsocket.socket(gsocket.AF_INET, gsocket.SOCK_DGRAM)
+    try:
+        sock.bind((host, port))
+        server = DatagramServer(sock, lambda data, _addr: handle_datagram(data, on_update))
+        server.start()
+    except OSError as exc:
+        sock.close()
+        logger.warning(
+            "Telemetry UDP listener not started on port %s: %s",
+            port,
+            exc,
+            extra={"component": "telemetry"},
+        )
+        return False
+    _server = server
+    logger.info("Telemetry UDP listener on %s:%s", host, port, extra={"component": "telemetry"})
+    return True
+
+
+def get_metrics():
+    return dict(_metrics)
@@ -0,0 +1,53 @@
+"""Helpers for work that must stay on a real OS thread.
+
+Under gunicorn's gevent worker the stdlib is monkey-patched, so
+``threading.Thread`` becomes a greenlet and any blocking syscall it makes
+(fsync, file writes) stalls the hub. These helpers hand back the original,
+unpatched primitives when gevent has patched them.
+"""
+import _thread
+import queue
+import time
+
+try:
+    from gevent import monkey as _monkey
+except ImportError:  # pragma: no cover - gevent is a hard dependency in prod
+    _monkey = None
+
+
+def _original(module: str, name: str, default):
+    if _monkey is None or not _monkey.is_module_patched(module):
+        return default
+    return _monkey.get_original(module, name)
+
+
+def start_native_thread(target, *args):
+    """Run ``target(*args)`` on a real OS thread, even when gevent is patched."""
+    start = _original('_thread', 'start_new_thread', _thread.start_new_thread)
+    return start(target, args)
+
+
+def native_queue():
+    """A SimpleQueue safe to ``put`` from greenlets and ``get`` from a native thread."""
+    factory = _original('queue', 'SimpleQueue', queue.SimpleQueue)
+    return factory()
+
+
+def native_lock():
+    """A lock that is not swapped for a gevent lock by monkey-patching."""
+    factory = _original('_thread', 'allocate_lock', _thread.allocate_lock)
+    return factory()
+
+
+def run_blocking(func, *args):
+    """Run ``func(*args)`` on gevent's native threadpool; the calling greenlet waits without blocking the hub."""
+    if _monkey is None:
+        return func(*args)
+    from gevent import get_hub
+
+    return get_hub().threadpool.apply(func, args)
+
+
+def native_sleep(seconds: float):
+    """Block the calling native thread without touching the gevent hub."""
+    _original('time', 'sleep', time.sleep)(seconds)
@@ -0,0 +1,231 @@
+"""Columnar, memory-mapped store of model training rows.
+
+One raw little-endian file per column under TRAINING_STORE_DIR, plus
+``meta.json`` with the committed row count, the column dtypes and the
+``Group`` categories:
+
+    Time.col    f4   wire-loop time in seconds
+    Errors.col  i4   wire-loop errors
+    Score.col   i4   reflex score
+    Group.col   i2   code into meta["groups"]
+    <telemetry columns>.col  f4, when the imported CSV carries all of them
+
+The store is append-only. An append writes past the end of every column
+file, fsyncs them, then atomically replaces ``meta.json``. That replace is
+the commit: readers only map ``rows`` values, so a crash mid-append leaves
+an ignored tail that the next append truncates. Categories are only ever
+added, so existing codes never change.
+
+``load`` maps the columns read-only. Nothing is parsed or copied until the
+caller reads them, and string columns such as ``Career`` are never stored.
+"""
+import csv
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+from .constants import TRAINING_STORE_DIR
+
+META_FILE = 'meta.json'
+LOCK_FILE = '.lock'
+VERSION = 1
+LABEL_COLUMN = 'Group'
+BASE_COLUMNS = {'Time': '<f4', 'Errors': '<i4', 'Score': '<i4'}
+TELEMETRY_DTYPE = '<f4'
+CODE_DTYPE = '<i2'
+IMPORT_CHUNK_ROWS = 100_000
+
+_lock = threading.Lock()
+
+
+class TrainingData(NamedTuple):
+    rows: int
+    columns: Dict[str, np.ndarray]  # read-only memmaps, label column holds codes
+    groups: List[str]  # category of each Group code
+
+
+def _column_path(directory: str, column: str) -> str:
+    return os.path.join(directory, f"{column}.col")
+
+
+def exists(directory: str = TRAINING_STORE_DIR) -> bool:
+    return os.path.exists(os.path.join(directory, META_FILE))
+
+
+def read_meta(directory: str = TRAINING_STORE_DIR) -> dict:
+    with open(os.path.join(directory, META_FILE), encoding='utf-8') as handle:
+        meta = json.load(handle)
+    if meta.get('version') != VERSION:
+        raise ValueError(f"{directory} is not a compatible training store")
+    return meta
+
+
+def _write_meta(directory: str, meta: dict):
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as tmp:
+            json.dump(meta, tmp, indent=2)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, os.path.join(directory, META_FILE))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class _WriterLock:
+    """Serializes appends across threads and processes."""
+
+    def __init__(self, directory: str):
+        self._path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        _lock.acquire()
+        try:
+            self._file = open(self._path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            _lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        finally:
+            _lock.release()
+
+
+def create(feature_columns, directory: str = TRAINING_STORE_DIR):
+    """Start an empty store with the base columns plus ``feature_columns`` (float32)."""
+    if exists(directory):
+        raise FileExistsError(f"{directory} already holds a training store")
+    os.makedirs(directory, exist_ok=True)
+    columns = dict(BASE_COLUMNS)
+    columns.update((column, TELEMETRY_DTYPE) for column in feature_columns)
+    columns[LABEL_COLUMN] = CODE_DTYPE
+    for column in columns:
+        open(_column_path(directory, column), 'wb').close()
+    _write_meta(directory, {'version': VERSION, 'rows': 0, 'columns': columns, 'groups': []})
+
+
+def _encode(values, column: str, dtype: str) -> np.ndarray:
+    array = np.asarray(values)
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        as_float = array.astype('f8')
+        if np.isnan(as_float).any() or (as_float != np.round(as_float)).any():
+            raise ValueError(f"column {column} must hold whole numbers")
+    return np.ascontiguousarray(array, dtype=dtype)
+
+
+def append(data, directory: str = TRAINING_STORE_DIR) -> int:
+    """Append rows given as column -> sequence (``Group`` as labels); returns the new row count.
+
+    Every stored column must be present and all of equal length. Unknown
+    group labels become new categories.
+    """
+    with _WriterLock(directory):
+        meta = read_meta(directory)
+        missing = [column for column in meta['columns'] if column not in data]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+        lengths = {len(data[column]) for column in meta['columns']}
+        if len(lengths) != 1:
+            raise ValueError("columns differ in length")
+        count = lengths.pop()
+        if not count:
+            return meta['rows']
+
+        groups = list(meta['groups'])
+        index = {label: code for code, label in enumerate(groups)}
+        labels, inverse = np.unique(np.asarray(data[LABEL_COLUMN]).astype(str), return_inverse=True)
+        for label in labels.tolist():
+            if label not in index:
+                index[label] = len(groups)
+                groups.append(label)
+        codes = np.array([index[label] for label in labels.tolist()], dtype=CODE_DTYPE)[inverse.ravel()]
+        encoded = {
+            column: codes if column == LABEL_COLUMN else _encode(data[column], column, dtype)
+            for column, dtype in meta['columns'].items()
+        }
+
+        rows = meta['rows']
+        for column, dtype in meta['columns'].items():
+            with open(_column_path(directory, column), 'r+b') as handle:
+                handle.truncate(rows * np.dtype(dtype).itemsize)  # drop a torn tail
+                handle.seek(0, os.SEEK_END)
+                handle.write(encoded[column].tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+        meta.update(rows=rows + count, groups=groups)
+        _write_meta(directory, meta)
+        return meta['rows']
+
+
+def load(directory: str = TRAINING_STORE_DIR) -> TrainingData:
+    """Committed rows as read-only memmaps."""
+    meta = read_meta(directory)
+    rows = meta['rows']
+    columns = {}
+    for column, dtype in meta['columns'].items():
+        if rows:
+            columns[column] = np.memmap(_column_path(directory, column), dtype=dtype, mode='r', shape=(rows,))
+        else:
+            columns[column] = np.empty(0, dtype=dtype)  # mmap cannot map an empty file
+    return TrainingData(rows, columns, list(meta['groups']))
+
+
+def feature_matrix(data: TrainingData, columns) -> np.ndarray:
+    """Fortran-ordered float32 matrix of ``columns``.
+
+    float32 in column-major order is what the tree builder works on, so
+    scikit-learn uses this matrix as is. Each column is copied once, straight
+    from its mapping.
+    """
+    matrix = np.empty((data.rows, len(columns)), dtype=np.float32, order='F')
+    for i, column in enumerate(columns):
+        matrix[:, i] = data.columns[column]
+    return matrix
+
+
+def append_csv(path: str, directory: str = TRAINING_STORE_DIR, *, chunk_rows: int = IMPORT_CHUNK_ROWS) -> int:
+    """Append the rows of a CSV carrying the store's columns; returns the row count.
+
+    Other columns (``Career``) are ignored. Rows go in chunks of
+    ``chunk_rows``, each its own commit.
+    """
+    columns = list(read_meta(directory)['columns'])
+    with open(path, newline='', encoding='utf-8') as handle:
+        reader = csv.DictReader(handle)
+        missing = [column for column in columns if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} lacks columns: {', '.join(missing)}")
+        chunk = {column: [] for column in columns}
+        for record in reader:
+            for column in columns:
+                value = record[column]
+                chunk[column].append(value if column == LABEL_COLUMN else float(value))
+            if len(chunk[LABEL_COLUMN]) >= chunk_rows:
+                append(chunk, directory)
+                chunk = {column: [] for column in columns}
+        return append(chunk, directory)
+
+
+def import_csv(path: str, directory: str = TRAINING_STORE_DIR, *, chunk_rows: int = IMPORT_CHUNK_ROWS) -> int:
+    """Create a store from a training CSV like ``career_data.csv``; returns the row count.
+
+    Telemetry columns are kept when the header carries all of them.
+    """
+    from .model_service import TELEMETRY_FEATURE_COLUMNS
+
+    with open(path, newline='', encoding='utf-8') as handle:
+        header = next(csv.reader(handle), [])
+    features = TELEMETRY_FEATURE_COLUMNS if all(column in header for column in TELEMETRY_FEATURE_COLUMNS) else []
+    create(features, directory)
+    return append_csv(path, directory, chunk_rows=chunk_rows)
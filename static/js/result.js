@@ -0,0 +1,285 @@
+// Server-rendered values come from the #page-data JSON block in the template.
+const PAGE_DATA = JSON.parse(document.getElementById('page-data').textContent);
+const storedStudentInfo = sessionStorage.getItem('student_info');
+const storedBestStep1 = sessionStorage.getItem('best_step1');
+const storedBestReflex = sessionStorage.getItem('best_reflex');
+const storedReportPayload = sessionStorage.getItem('final_report_payload');
+const storedUniversityPayload = sessionStorage.getItem('university_payload');
+const studentInfo = storedStudentInfo ? JSON.parse(storedStudentInfo) : (PAGE_DATA.student_info || null);
+const bestStep1 = storedBestStep1 ? JSON.parse(storedBestStep1) : null;
+const bestReflex = storedBestReflex ? JSON.parse(storedBestReflex) : null;
+
+const reportStatus = document.getElementById('report-status');
+const reportNameEl = document.getElementById('report-name');
+const reportClassEl = document.getElementById('report-class');
+const reportFitJobEl = document.getElementById('report-fit-job');
+let reportFitJobs = '';
+const reportExplanationEl = document.getElementById('report-explanation');
+const reportDownloads = document.getElementById('report-downloads');
+const reportDownloadHtml = document.getElementById('report-download-html');
+const reportDownloadPdf = document.getElementById('report-download-pdf');
+const universityStatus = document.getElementById('university-status');
+const universityContent = document.getElementById('university-content');
+const cachedReportPayload = storedReportPayload ? JSON.parse(storedReportPayload) : null;
+const cachedUniversityPayload = storedUniversityPayload ? JSON.parse(storedUniversityPayload) : null;
+const JOB_POLL_MS = 5000;
+const JOB_MAX_WAIT_MS = 15 * 60 * 1000; // JOB_RESULT_TTL_SECONDS on the server
+const jobWaiters = new Map();
+let resultSocket = null;
+
+function escapeHtml(input) {
+    return (input || '')
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function renderMarkdown(text) {
+    const escaped = escapeHtml(text);
+    const lines = escaped.split(/\r?\n/);
+    let html = '';
+    let inList = false;
+    const formatInline = (value) => {
+        const withBold = value.replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>');
+        return withBold.replace(/\[(.+?)\]\((https?:\/\/[^\s)]+)\)/g, '<a href="$2" class="text-emerald-300 underline" target="_blank" rel="noreferrer">$1</a>');
+    };
+    lines.forEach((line) => {
+        if (/^#{2,6}\s/.test(line)) {
+            if (inList) {
+                html += '</ul>';
+                inList = false;
+            }
+            const level = Math.min(line.match(/^#+/)[0].length, 6);
+            const content = line.replace(/^#{2,6}\s+/, '');
+            html += `<h${level} class="mt-4 mb-2 text-slate-100 font-semibold">${formatInline(content)}</h${level}>`;
+            return;
+        }
+        if (/^\*\s+/.test(line)) {
+            if (!inList) {
+                html += '<ul class="list-disc pl-5 space-y-1">';
+                inList = true;
+            }
+            const item = line.replace(/^\*\s+/, '');
+            html += `<li>${formatInline(item)}</li>`;
+            return;
+        }
+        if (/^\d+\.\s+/.test(line)) {
+            if (inList) {
+                html += '</ul>';
+                inList = false;
+            }
+            const item = line.replace(/^\d+\.\s+/, '');
+            html += `<p class="mt-2 text-slate-100 text-sm leading-relaxed font-semibold">${formatInline(item)}</p>`;
+            return;
+        }
+        if (inList) {
+            html += '</ul>';
+            inList = false;
+        }
+        if (line.trim() === '---') {
+            html += '<hr class="my-4 border-slate-700">';
+            return;
+        }
+        html += `<p class="text-slate-100 text-sm leading-relaxed">${formatInline(line)}</p>`;
+    });
+    if (inList) {
+        html += '</ul>';
+    }
+    return html;
+}
+
+function setStatus(el, text) {
+    if (el) {
+        el.textContent = text;
+    }
+}
+
+function applyReportPayload(payload) {
+    if (!payload) return;
+    if (reportNameEl) reportNameEl.textContent = payload.name || studentInfo?.full_name || '--';
+    if (reportClassEl) reportClassEl.textContent = payload.class || studentInfo?.class_name || '--';
+    if (reportFitJobEl) reportFitJobEl.textContent = payload.fit_job || '--';
+    if (reportExplanationEl) reportExplanationEl.textContent = payload.explanation || '--';
+    reportFitJobs = payload.fit_job || reportFitJobs;
+    applyDownloadLinks(payload.download);
+}
+
+// Stored reports come with links to their printable HTML and PDF.
+function applyDownloadLinks(download) {
+    if (!reportDownloads) return;
+    reportDownloads.classList.toggle('hidden', !download);
+    if (!download) return;
+    if (reportDownloadHtml) reportDownloadHtml.href = download.html;
+    if (reportDownloadPdf) {
+        reportDownloadPdf.classList.toggle('hidden', !download.pdf);
+        if (download.pdf) reportDownloadPdf.href = download.pdf;
+    }
+}
+
+function applyUniversityPayload(payload) {
+    if (!payload) return;
+    if (universityContent) {
+        universityContent.innerHTML = renderMarkdown(payload.recommendations || '--');
+    }
+}
+
+async function generateFinalReport() {
+    setStatus(reportStatus, "Đang xử lý");
+    console.log('final_report payload', {
+        student_info: studentInfo,
+        best_step1: bestStep1,
+        best_reflex: bestReflex
+    });
+    try {
+        const payload = await postJob('/api/final_report', {
+            student_info: studentInfo,
+            best_step1: bestStep1,
+            best_reflex: bestReflex
+        }, 'Không thể tạo báo cáo.');
+
+        applyReportPayload(payload);
+        reportFitJobs = payload.fit_job || '';
+        sessionStorage.setItem('final_report_payload', JSON.stringify(payload));
+        setStatus(reportStatus, payload.upgrade_pending ? "Bản nhanh" : "Hoàn tất");
+        return true;
+    } catch (err) {
+        setStatus(reportStatus, "Lỗi");
+        if (reportExplanationEl) {
+            reportExplanationEl.textContent = err.message || 'Có lỗi xảy ra.';
+        }
+        return false;
+    }
+}
+
+async function getUniversitySuggestions() {
+    setStatus(universityStatus, "Đang xử lý");
+    try {
+        const payload = await postJob('/api/university_recommendations', {
+            student_info: studentInfo,
+            fit_jobs: reportFitJobs
+        }, 'Không thể tìm đại học phù hợp.');
+        applyUniversityPayload(payload);
+        sessionStorage.setItem('university_payload', JSON.stringify(payload));
+        setStatus(universityStatus, "Hoàn tất");
+    } catch (err) {
+        setStatus(universityStatus, "Lỗi");
+        if (universityContent) {
+            universityContent.textContent = err.message || 'Có lỗi xảy ra.';
+        }
+    }
+}
+
+async function loadResultsSequentially() {
+    if (cachedReportPayload) {
+        applyReportPayload(cachedReportPayload);
+        reportFitJobs = cachedReportPayload.fit_job || reportFitJobs;
+        setStatus(reportStatus, "Đã lưu");
+    }
+    if (cachedUniversityPayload) {
+        applyUniversityPayload(cachedUniversityPayload);
+        setStatus(universityStatus, "Đã lưu");
+    }
+    if (cachedReportPayload && cachedUniversityPayload) {
+        return;
+    }
+    const reportOk = cachedReportPayload ? true : await generateFinalReport();
+    if (reportOk) {
+        if (!cachedUniversityPayload) {
+            await getUniversitySuggestions();
+        }
+    } else {
+        setStatus(universityStatus, "Chờ báo cáo");
+        if (universityContent) {
+            universityContent.textContent = "Cần báo cáo nghề nghiệp trước khi gợi ý đại học.";
+        }
+    }
+}
+
+// Long agent calls run as server jobs. Completion arrives as `job_done` on
+// the socket; the status endpoint is polled as a fallback. A quick local
+// report is replaced by the AI report when the server pushes `report_upgraded`.
+function connectResultSocket() {
+    if (typeof io === 'undefined') return;
+    resultSocket = io({ transports: PAGE_DATA.socketio_transports || ['polling', 'websocket'] });
+    resultSocket.on('job_done', (job) => {
+        const resolve = jobWaiters.get(job.id);
+        if (resolve) resolve(job);
+    });
+    resultSocket.on('report_upgraded', (payload) => {
+        applyReportPayload(payload);
+        sessionStorage.setItem('final_report_payload', JSON.stringify(payload));
+        setStatus(reportStatus, "Đã cập nhật");
+    });
+}
+
+function waitForJob(jobId, statusUrl) {
+    return new Promise((resolve) => {
+        let timer = null;
+        const deadline = Date.now() + JOB_MAX_WAIT_MS;
+        const finish = (job) => {
+            jobWaiters.delete(jobId);
+            clearTimeout(timer);
+            resolve(job);
+        };
+        const poll = async () => {
+            try {
+                const response = await fetch(statusUrl);
+                const job = await response.json();
+                if (response.ok && (job.status === 'done' || job.status === 'failed')) {
+                    finish(job);
+                    return;
+                }
+                // 5xx is worth another poll; any other error (404: unknown or expired) is final.
+                if (!response.ok && response.status < 500) {
+                    finish({ status: 'failed', error: job.error });
+                    return;
+                }
+            } catch (err) {
+                // Network hiccup: keep waiting for the push or the next poll.
+            }
+            if (Date.now() > deadline) {
+                finish({ status: 'failed' });
+                return;
+            }
+            timer = setTimeout(poll, JOB_POLL_MS);
+        };
+        jobWaiters.set(jobId, finish);
+        timer = setTimeout(poll, JOB_POLL_MS);
+    });
+}
+
+async function postJob(url, body, errorMessage) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    const payload = await response.json();
+    if (!response.ok || payload.error) {
+        throw new Error(payload.error || errorMessage);
+    }
+    if (response.status !== 202) {
+        return payload;
+    }
+    const job = await waitForJob(payload.job_id, payload.status_url);
+    if (job.status !== 'done') {
+        throw new Error(job.error || errorMessage);
+    }
+    return job.result;
+}
+
+if (studentInfo) {
+    connectResultSocket();
+    loadResultsSequentially();
+} else {
+    setStatus(reportStatus, "Thiếu dữ liệu");
+    setStatus(universityStatus, "Thiếu dữ liệu");
+    if (reportExplanationEl) {
+        reportExplanationEl.textContent = "Vui lòng quay lại trang test và nhập thông tin học sinh.";
+    }
+    if (universityContent) {
+        universityContent.textContent = "Vui lòng quay lại trang test và nhập thông tin học sinh.";
+    }
+}
@@ -0,0 +1,827 @@
+// Server-rendered values come from the #page-data JSON block in the template.
+const PAGE_DATA = JSON.parse(document.getElementById('page-data').textContent);
+// State
+const storedStudentInfo = sessionStorage.getItem('student_info');
+const storedBestStep1 = sessionStorage.getItem('best_step1');
+const storedBestReflex = sessionStorage.getItem('best_reflex');
+let bestStep1 = storedBestStep1 ? JSON.parse(storedBestStep1) : (PAGE_DATA.best_step1 || null);
+let bestReflex = storedBestReflex ? JSON.parse(storedBestReflex) : (PAGE_DATA.best_reflex || null);
+let wireLoopResult = {
+    time: bestStep1?.time || 0,
+    errors: bestStep1?.errors || 0,
+    done: Boolean(bestStep1)
+};
+let whackResult = {
+    score: bestReflex?.quantity || 0,
+    done: Boolean(bestReflex)
+};
+let studentInfo = storedStudentInfo ? JSON.parse(storedStudentInfo) : (PAGE_DATA.student_info || null);
+let testsCompleted = PAGE_DATA.tests_completed || false;
+let reflexBestScore = bestReflex?.quantity || 0;
+let lastTimestamp = 0;
+let chatInitialized = false;
+let chatWaiting = false;
+const REFLEX_DURATION_SECONDS = 10;
+let reflexGameActive = false;
+let reflexScore = 0;
+let reflexTimeRemaining = REFLEX_DURATION_SECONDS;
+let reflexSpawnInterval = null;
+let reflexCountdownInterval = null;
+let reflexGameTimeout = null;
+
+const chatModal = document.getElementById('chat-modal');
+const chatMessages = document.getElementById('chat-messages');
+const chatInput = document.getElementById('chat-input');
+const chatSendBtn = document.getElementById('chat-send-btn');
+const step1MessageEl = document.getElementById('step1-api-message');
+const step2MessageEl = document.getElementById('step2-api-message');
+const studentModal = document.getElementById('student-info-modal');
+const studentForm = document.getElementById('student-info-form');
+const studentErrorEl = document.getElementById('student-info-error');
+const studentFullNameInput = document.getElementById('student-fullname');
+const studentGradeSelect = document.getElementById('student-grade');
+const studentClassInput = document.getElementById('student-class');
+const homeLink = document.getElementById('home-link');
+const homeLockMessage = document.getElementById('home-lock-message');
+const characteristicStatusEl = document.getElementById('characteristic-status');
+const chatDoneBanner = document.getElementById('chat-done-banner');
+let characteristicReady = Boolean(PAGE_DATA.characteristic_ready);
+let chatDone = Boolean(PAGE_DATA.chat_done);
+const reflexTimeRemainingEl = document.getElementById('reflex-time-remaining');
+const reflexScoreEl = document.getElementById('reflex-score');
+const reflexStatusEl = document.getElementById('reflex-status');
+const reflexStartBtn = document.getElementById('reflex-start-btn');
+const step1BestSummary = document.getElementById('step1-best-summary');
+const step1BestTimeEl = document.getElementById('best-step1-time');
+const step1BestErrorsEl = document.getElementById('best-step1-errors');
+const reflexBestDisplay = document.getElementById('reflex-best-display');
+const reflexBestScoreEl = document.getElementById('reflex-best-score');
+const step1DeviceStatusEl = document.getElementById('step1-device-status');
+const liveMonitorEl = document.getElementById('live-monitor');
+const liveTimeEl = document.getElementById('live-time');
+const liveErrorsEl = document.getElementById('live-errors');
+const wireSubmitBtn = document.getElementById('wire-submit-btn');
+const stationInput = document.getElementById('station-id');
+let pairedDeviceId = new URLSearchParams(window.location.search).get('device')
+    || localStorage.getItem('device_id')
+    || 'default';
+// game_update carries only changed fields; keep the merged station state here.
+let deviceState = null;
+
+function showStudentInfoModal() {
+    if (studentModal) {
+        studentModal.classList.remove('hidden');
+    }
+}
+
+function hideStudentInfoModal() {
+    if (studentModal) {
+        studentModal.classList.add('hidden');
+    }
+}
+
+function updateHomeLinkState() {
+    if (!homeLink) return;
+    if (testsCompleted) {
+        homeLink.setAttribute('aria-disabled', 'false');
+        if (homeLockMessage) {
+            homeLockMessage.classList.add('hidden');
+        }
+    } else {
+        homeLink.setAttribute('aria-disabled', 'false');
+        if (homeLockMessage) {
+            homeLockMessage.classList.remove('hidden');
+        }
+    }
+}
+
+function updateReflexDisplays() {
+    if (reflexTimeRemainingEl) {
+        reflexTimeRemainingEl.textContent = `${Math.max(reflexTimeRemaining, 0)}s`;
+    }
+    if (reflexScoreEl) {
+        reflexScoreEl.textContent = reflexScore.toString();
+    }
+}
+
+function setReflexStatus(text) {
+    if (reflexStatusEl) {
+        reflexStatusEl.textContent = text;
+    }
+}
+
+function setStep1Best(best) {
+    if (!step1BestSummary || !step1BestTimeEl || !step1BestErrorsEl) return;
+    if (!best) {
+        step1BestSummary.classList.add('hidden');
+        return;
+    }
+    const bestTime = typeof best.time === 'number' ? best.time : parseFloat(best.time || 0);
+    const bestErrors = typeof best.errors === 'number' ? best.errors : parseInt(best.errors || 0);
+    step1BestTimeEl.textContent = bestTime.toFixed(2);
+    step1BestErrorsEl.textContent = bestErrors.toString();
+    step1BestSummary.classList.remove('hidden');
+}
+
+function setReflexBest(score) {
+    if (!reflexBestDisplay || !reflexBestScoreEl) return;
+    if (!score || score <= 0) {
+        reflexBestDisplay.classList.add('hidden');
+        return;
+    }
+    reflexBestScoreEl.textContent = score.toString();
+    reflexBestDisplay.classList.remove('hidden');
+}
+
+async function handleStudentInfoSubmit(event) {
+    event.preventDefault();
+    const fullName = (studentFullNameInput?.value || '').trim();
+    const grade = studentGradeSelect?.value || '';
+    const className = (studentClassInput?.value || '').trim();
+
+    if (!fullName || !grade || !className) {
+        if (studentErrorEl) {
+            studentErrorEl.textContent = "Vui lòng điền đầy đủ thông tin.";
+            studentErrorEl.classList.remove('hidden');
+        }
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/student_info', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                full_name: fullName,
+                grade,
+                class_name: className
+            })
+        });
+        const data = await response.json();
+        if (!response.ok || data.error) {
+            throw new Error(data.error || 'Không thể lưu thông tin.');
+        }
+        studentInfo = data.student_info || {
+            full_name: fullName,
+            grade,
+            class_name: className
+        };
+        sessionStorage.setItem('student_info', JSON.stringify(studentInfo));
+        if (studentErrorEl) {
+            studentErrorEl.classList.add('hidden');
+        }
+        hideStudentInfoModal();
+    } catch (err) {
+        if (studentErrorEl) {
+            studentErrorEl.textContent = err.message || 'Không thể lưu thông tin.';
+            studentErrorEl.classList.remove('hidden');
+        }
+    }
+}
+
+if (studentForm) {
+    studentForm.addEventListener('submit', handleStudentInfoSubmit);
+}
+
+if (homeLink) {
+    homeLink.addEventListener('click', (event) => {
+        if (!testsCompleted) {
+            const ok = confirm(
+                'Bạn đang rời trang khi bài test chưa hoàn tất. Dữ liệu hiện tại sẽ bị mất. Bạn có chắc muốn quay lại trang chủ không?'
+            );
+            if (!ok) {
+                event.preventDefault();
+                return;
+            }
+            event.preventDefault();
+            window.location.href = `${homeLink.href}?abandon=1`;
+        }
+    });
+}
+
+// --- Socket.IO Connection (Step 1) ---
+function showLiveMonitor(show) {
+    if (!liveMonitorEl) return;
+    liveMonitorEl.classList.toggle('hidden', !show);
+}
+
+function updateLiveValues(timeVal, errorVal) {
+    if (liveTimeEl) {
+        liveTimeEl.textContent = Number(timeVal || 0).toFixed(1);
+    }
+    if (liveErrorsEl) {
+        liveErrorsEl.textContent = Number(errorVal || 0).toString();
+    }
+}
+
+function setStep1DeviceStatus(connected, note = '') {
+    if (!step1DeviceStatusEl) return;
+    step1DeviceStatusEl.classList.remove('text-slate-500', 'text-emerald-300', 'text-rose-300');
+    if (connected) {
+        step1DeviceStatusEl.textContent = `Thiết bị: đã kết nối${note ? ` (${note})` : ''}`;
+        step1DeviceStatusEl.classList.add('text-emerald-300');
+    } else {
+        step1DeviceStatusEl.textContent = 'Thiết bị: chưa kết nối';
+        step1DeviceStatusEl.classList.add('text-rose-300');
+    }
+    if (wireSubmitBtn) {
+        wireSubmitBtn.classList.toggle('hidden', connected);
+    }
+}
+
+
+const socket = io({ transports: PAGE_DATA.socketio_transports });
+
+function pairDevice(deviceId) {
+    pairedDeviceId = (deviceId || '').trim() || 'default';
+    localStorage.setItem('device_id', pairedDeviceId);
+    if (stationInput) stationInput.value = pairedDeviceId;
+    deviceState = null;
+    setStep1DeviceStatus(false);
+    showLiveMonitor(false);
+    socket.emit('pair_device', { device_id: pairedDeviceId });
+}
+
+if (stationInput) {
+    stationInput.value = pairedDeviceId;
+    stationInput.addEventListener('change', () => pairDevice(stationInput.value));
+}
+
+socket.on('connect', () => {
+    console.log('Connected to WebSocket server');
+    pairDevice(pairedDeviceId);
+});
+
+socket.on('disconnect', () => {
+    console.log('Disconnected from server');
+    showLiveMonitor(false);
+    setStep1DeviceStatus(false);
+});
+
+function mergeDeviceUpdate(payload) {
+    if (payload.full) {
+        deviceState = { ...payload };
+        return deviceState;
+    }
+    if (!deviceState) return null; // wait for a snapshot or keyframe
+    if (payload.bseq !== deviceState.bseq + 1) {
+        // Missed a delta: the server sends a full keyframe every few
+        // seconds, so drop state and catch up from the next one.
+        deviceState = null;
+        return null;
+    }
+    Object.assign(deviceState, payload);
+    return deviceState;
+}
+
+socket.on('game_update', (payload) => {
+    if (!payload || (payload.device_id && payload.device_id !== pairedDeviceId)) return;
+    const data = mergeDeviceUpdate(payload);
+    if (!data) return;
+    if (payload.full && typeof payload.online === 'boolean') {
+        setStep1DeviceStatus(payload.online, payload.online ? 'đang hoạt động' : '');
+    }
+    console.log('game_update', data);
+    if (!data || data.status === 'idle') return;
+    if (data.status === 'playing') {
+        showLiveMonitor(true);
+        document.getElementById('step1-manual-form').classList.remove('hidden');
+        document.getElementById('step1-result-display').classList.add('hidden');
+        updateLiveValues(data.time, data.errors);
+        updateStep1Status(false);
+    } else if (data.status === 'finished' && data.timestamp > lastTimestamp) {
+        lastTimestamp = data.timestamp;
+        const latestData = { time: data.time, errors: data.errors };
+        bestStep1 = latestData;
+        sessionStorage.setItem('best_step1', JSON.stringify(latestData));
+        document.getElementById('input-time').value = latestData.time;
+        document.getElementById('input-errors').value = latestData.errors;
+        document.getElementById('display-time').innerText = latestData.time;
+        document.getElementById('display-errors').innerText = latestData.errors;
+        wireLoopResult.time = latestData.time;
+        wireLoopResult.errors = latestData.errors;
+        wireLoopResult.done = true;
+        setStep1Best(latestData);
+        showLiveMonitor(false);
+        document.getElementById('step1-manual-form').classList.add('hidden');
+        document.getElementById('step1-result-display').classList.remove('hidden');
+        updateStep1Status(true);
+        if (typeof payload.improved === 'boolean') {
+            setInlineMessage(step1MessageEl, "ℹ️ Đã lưu kết quả.", false);
+        }
+    }
+});
+
+// Presence is tracked on the server and pushed once per transition.
+socket.on('device_presence', (data) => {
+    if (!data || data.device_id !== pairedDeviceId) return;
+    setStep1DeviceStatus(Boolean(data.online), data.online ? 'đang hoạt động' : '');
+});
+
+// Manual Input Listener Step 1
+const inputTime = document.getElementById('input-time');
+const inputErrors = document.getElementById('input-errors');
+let wireLoopAutosaveTimer = null;
+function onManualInput() {
+    if (inputTime.value !== '' && inputErrors.value !== '') {
+        updateStep1Status(true);
+    } else {
+        updateStep1Status(false);
+    }
+    if (wireLoopAutosaveTimer) {
+        clearTimeout(wireLoopAutosaveTimer);
+    }
+    if (inputTime.value !== '' && inputErrors.value !== '') {
+        wireLoopAutosaveTimer = setTimeout(() => {
+            saveWireLoopIfNeeded();
+        }, 400);
+    }
+}
+inputTime.addEventListener('input', onManualInput);
+inputErrors.addEventListener('input', onManualInput);
+inputTime.addEventListener('blur', () => saveWireLoopIfNeeded());
+inputErrors.addEventListener('blur', () => saveWireLoopIfNeeded());
+
+function setInlineMessage(el, text, isError = false) {
+    if (!el) return;
+    el.textContent = text;
+    el.classList.remove('hidden');
+    el.classList.toggle('text-emerald-400', !isError);
+    el.classList.toggle('text-red-400', isError);
+}
+
+function clearInlineMessage(el) {
+    if (!el) return;
+    el.classList.add('hidden');
+}
+
+async function submitWireLoopResult() {
+    const submitBtn = document.getElementById('wire-submit-btn');
+    const timeVal = parseFloat(inputTime.value);
+    const errorVal = parseInt(inputErrors.value);
+    if (isNaN(timeVal) || isNaN(errorVal)) {
+        console.warn('[wireloop] invalid input', { timeVal, errorVal });
+        setInlineMessage(step1MessageEl, "Vui lòng nhập đủ thời gian và số lỗi.", true);
+        return;
+    }
+    console.log('[wireloop] submit start', { timeVal, errorVal });
+    setInlineMessage(step1MessageEl, "⏳ Đang gửi kết quả...", false);
+    submitBtn.disabled = true;
+    submitBtn.classList.add('opacity-70', 'cursor-not-allowed');
+    try {
+        const response = await fetch('/api/game_event', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ event: 'finish', time: timeVal, errors: errorVal, station: pairedDeviceId })
+        });
+        const data = await response.json();
+        if (!response.ok || data.error) {
+            throw new Error(data.error || 'Không thể lưu kết quả.');
+        }
+        const latestData = { time: timeVal, errors: errorVal };
+        console.log('[wireloop] submit response', { data, latestData });
+        bestStep1 = latestData;
+        wireLoopResult.time = latestData.time;
+        wireLoopResult.errors = latestData.errors;
+        wireLoopResult.done = true;
+        console.log('[wireloop] sessionStorage set best_step1', latestData);
+        sessionStorage.setItem('best_step1', JSON.stringify(latestData));
+        console.log('[wireloop] sessionStorage get best_step1', sessionStorage.getItem('best_step1'));
+        inputTime.value = latestData.time;
+        inputErrors.value = latestData.errors;
+        document.getElementById('display-time').innerText = latestData.time;
+        document.getElementById('display-errors').innerText = latestData.errors;
+        document.getElementById('step1-manual-form').classList.add('hidden');
+        document.getElementById('step1-result-display').classList.remove('hidden');
+        updateStep1Status(true);
+        setStep1Best(latestData);
+        setInlineMessage(step1MessageEl, "ℹ️ Đã lưu kết quả.", false);
+        setStep1InputsDisabled(true);
+    } catch (err) {
+        setInlineMessage(step1MessageEl, err.message || 'Có lỗi xảy ra.', true);
+    } finally {
+        submitBtn.disabled = false;
+        submitBtn.classList.remove('opacity-70', 'cursor-not-allowed');
+    }
+}
+
+async function saveWireLoopIfNeeded() {
+    const timeVal = parseFloat(inputTime.value);
+    const errorVal = parseInt(inputErrors.value);
+    if (isNaN(timeVal) || isNaN(errorVal)) {
+        console.warn('[wireloop] autosave invalid input', { timeVal, errorVal });
+        return false;
+    }
+    try {
+        console.log('[wireloop] autosave start', { timeVal, errorVal, bestStep1 });
+        const response = await fetch('/api/game_event', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ event: 'finish', time: timeVal, errors: errorVal, station: pairedDeviceId })
+        });
+        const data = await response.json();
+        if (!response.ok || data.error) {
+            throw new Error(data.error || 'Không thể lưu kết quả.');
+        }
+        const latestData = { time: timeVal, errors: errorVal };
+        console.log('[wireloop] autosave response', { data, latestData });
+        bestStep1 = latestData;
+        wireLoopResult.time = latestData.time;
+        wireLoopResult.errors = latestData.errors;
+        wireLoopResult.done = true;
+        console.log('[wireloop] autosave sessionStorage set best_step1', latestData);
+        sessionStorage.setItem('best_step1', JSON.stringify(latestData));
+        console.log('[wireloop] autosave sessionStorage get best_step1', sessionStorage.getItem('best_step1'));
+        setStep1Best(latestData);
+        return true;
+    } catch (err) {
+        setInlineMessage(step1MessageEl, err.message || 'Có lỗi xảy ra.', true);
+        return false;
+    }
+}
+
+function updateStep1Status(isDone) {
+    wireLoopResult.done = isDone;
+    document.getElementById('step1-status').classList.toggle('hidden', !isDone);
+    checkAllDone();
+}
+
+function setStep1InputsDisabled(disabled) {
+    if (inputTime) inputTime.disabled = disabled;
+    if (inputErrors) inputErrors.disabled = disabled;
+    const submitBtn = document.getElementById('wire-submit-btn');
+    if (submitBtn) {
+        submitBtn.disabled = disabled;
+        submitBtn.classList.toggle('opacity-70', disabled);
+        submitBtn.classList.toggle('cursor-not-allowed', disabled);
+    }
+}
+
+function resetStep1() {
+    document.getElementById('step1-result-display').classList.add('hidden');
+    document.getElementById('step1-manual-form').classList.remove('hidden');
+    document.getElementById('input-time').value = '';
+    document.getElementById('input-errors').value = '';
+    clearInlineMessage(step1MessageEl);
+    setStep1InputsDisabled(false);
+    updateStep1Status(false);
+}
+
+// --- Reflex Game Logic ---
+const punchBoardController = {
+    clear() {},
+    spawn() {}
+};
+
+function initPunchBoard() {
+    const board = document.getElementById('punch-board');
+    if (!board) return;
+
+    const holes = Array.from(board.querySelectorAll('.punch-hole'));
+    let lastIdx = -1;
+
+    function randomIdx() {
+        if (holes.length === 1) return 0;
+        let i = Math.floor(Math.random() * holes.length);
+        if (i === lastIdx) i = (i + 1) % holes.length;
+        lastIdx = i;
+        return i;
+    }
+
+    function clearHoles() {
+        holes.forEach((hole) => hole.classList.remove('up'));
+    }
+
+    function spawnHole() {
+        if (!reflexGameActive) {
+            clearHoles();
+            return;
+        }
+        clearHoles();
+        const idx = randomIdx();
+        const hole = holes[idx];
+        hole.classList.add('up');
+        setTimeout(() => hole.classList.remove('up'), 600);
+    }
+
+    holes.forEach((hole) => {
+        hole.addEventListener('pointerdown', (event) => {
+            event.preventDefault();
+            if (!event.isTrusted) return;
+            if (!reflexGameActive) return;
+            if (!hole.classList.contains('up')) return;
+            hole.classList.add('hit');
+            setTimeout(() => hole.classList.remove('hit'), 220);
+            hole.classList.remove('up');
+            reflexScore += 1;
+            updateReflexDisplays();
+        }, { passive: false });
+    });
+
+    punchBoardController.clear = clearHoles;
+    punchBoardController.spawn = spawnHole;
+}
+
+initPunchBoard();
+
+function stopReflexTimers() {
+    if (reflexSpawnInterval) {
+        clearInterval(reflexSpawnInterval);
+        reflexSpawnInterval = null;
+    }
+    if (reflexCountdownInterval) {
+        clearInterval(reflexCountdownInterval);
+        reflexCountdownInterval = null;
+    }
+    if (reflexGameTimeout) {
+        clearTimeout(reflexGameTimeout);
+        reflexGameTimeout = null;
+    }
+}
+
+function enableReflexStartBtn(enable) {
+    if (!reflexStartBtn) return;
+    reflexStartBtn.disabled = !enable;
+    reflexStartBtn.classList.toggle('opacity-70', !enable);
+    reflexStartBtn.classList.toggle('cursor-not-allowed', !enable);
+}
+
+function startReflexGame() {
+    if (reflexGameActive) return;
+    reflexGameActive = true;
+    reflexScore = 0;
+    reflexTimeRemaining = REFLEX_DURATION_SECONDS;
+    setReflexStatus("Đang chơi...");
+    updateReflexDisplays();
+    clearInlineMessage(step2MessageEl);
+    enableReflexStartBtn(false);
+
+    punchBoardController.clear();
+    punchBoardController.spawn();
+    reflexSpawnInterval = setInterval(() => punchBoardController.spawn(), 650);
+
+    reflexCountdownInterval = setInterval(() => {
+        reflexTimeRemaining -= 1;
+        updateReflexDisplays();
+        if (reflexTimeRemaining <= 0) {
+            finishReflexGame();
+        }
+    }, 1000);
+
+    reflexGameTimeout = setTimeout(() => {
+        finishReflexGame();
+    }, REFLEX_DURATION_SECONDS * 1000);
+}
+
+function finishReflexGame() {
+    if (!reflexGameActive) return;
+    reflexGameActive = false;
+    stopReflexTimers();
+    reflexTimeRemaining = 0;
+    updateReflexDisplays();
+    punchBoardController.clear();
+    setReflexStatus("Đang gửi kết quả...");
+    submitReflexResult();
+}
+
+async function saveReflexResult(timeVal, quantityVal) {
+    const response = await fetch('/api/reflex_result', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ time: timeVal, quantity: quantityVal })
+    });
+    const data = await response.json();
+    if (!response.ok || data.error) {
+        throw new Error(data.error || 'Không thể lưu kết quả phản xạ.');
+    }
+    return data;
+}
+
+async function submitReflexResult() {
+    setInlineMessage(step2MessageEl, "⏳ Đang gửi kết quả...", false);
+    try {
+        const payload = await saveReflexResult(REFLEX_DURATION_SECONDS, reflexScore);
+        const latestData = { quantity: reflexScore, time: REFLEX_DURATION_SECONDS };
+        bestReflex = latestData;
+        sessionStorage.setItem('best_reflex', JSON.stringify(latestData));
+        reflexBestScore = latestData.quantity || reflexScore;
+        whackResult.score = reflexBestScore;
+        whackResult.done = true;
+        document.getElementById('step2-status').classList.remove('hidden');
+        checkAllDone();
+        setReflexBest(reflexBestScore);
+        setInlineMessage(step2MessageEl, "ℹ️ Đã lưu kết quả.", false);
+        setReflexStatus(`Hoàn tất! Điểm gần nhất: ${reflexBestScore}`);
+    } catch (err) {
+        setInlineMessage(step2MessageEl, err.message || 'Có lỗi xảy ra.', true);
+        setReflexStatus("Gửi dữ liệu thất bại. Vui lòng thử lại.");
+    } finally {
+        enableReflexStartBtn(true);
+    }
+}
+
+// --- Final Submission ---
+function checkAllDone() {
+    const btn = document.getElementById('get-result-btn');
+    if (!btn) return;
+    btn.classList.remove('opacity-50');
+    btn.disabled = false;
+}
+
+async function getFinalAdvice() {
+    if (!studentInfo) {
+        alert("Vui lòng nhập thông tin học sinh trước khi xem báo cáo.");
+        showStudentInfoModal();
+        return;
+    }
+
+    if (!chatDone) {
+        const proceed = confirm(
+            "Bạn chưa hoàn thành phần trò chuyện DISC. Báo cáo có thể không chính xác.\n\nNhấn OK để lấy báo cáo, hoặc Cancel để quay lại trò chuyện."
+        );
+        if (!proceed) {
+            return;
+        }
+    }
+    const allDone = wireLoopResult.done && whackResult.done && (chatDone || characteristicReady);
+    if (!allDone) {
+        const proceed = confirm(
+            "Bạn chưa hoàn thành tất cả bài test. Báo cáo có thể không chính xác.\n\nNhấn OK để tiếp tục, hoặc Cancel để tiếp tục làm bài."
+        );
+        if (!proceed) {
+            return;
+        }
+    }
+    const reportBtn = document.getElementById('get-result-btn');
+
+    try {
+        if (reportBtn) {
+            reportBtn.innerText = "⏳ Đang chuyển...";
+        }
+        const saved = await saveWireLoopIfNeeded();
+        if (!saved && !wireLoopResult.done) {
+            throw new Error('Vui lòng nhập và lưu kết quả Wire Loop trước.');
+        }
+        ensureBestResultsStored();
+        window.location.href = "/result";
+        if (reportBtn) {
+            reportBtn.innerText = "📘 Nhận báo cáo";
+        }
+
+    } catch (err) {
+        console.error(err);
+        alert(err.message || 'Lỗi kết nối server!');
+        if (reportBtn) {
+            reportBtn.innerText = "📘 Nhận báo cáo";
+        }
+    }
+}
+
+// --- Chatbot Modal ---
+function openChatModal() {
+    chatModal.classList.remove('hidden');
+    if (!chatInitialized) {
+        appendChatMessage('bot', 'Xin chào! Tôi có thể giải đáp thắc mắc về quy trình kiểm tra và gợi ý nghề nghiệp.');
+        chatInitialized = true;
+    }
+    if (chatDone) {
+        if (chatDoneBanner) {
+            chatDoneBanner.classList.remove('hidden');
+        }
+        chatSendBtn.disabled = true;
+    }
+    setTimeout(() => chatInput.focus(), 100);
+}
+
+function closeChatModal() {
+    chatModal.classList.add('hidden');
+}
+
+function ensureBestResultsStored() {
+    if (wireLoopResult.done && bestStep1) {
+        sessionStorage.setItem('best_step1', JSON.stringify(bestStep1));
+    }
+    if (whackResult.done) {
+        if (!bestReflex) {
+            bestReflex = { quantity: whackResult.score, time: REFLEX_DURATION_SECONDS };
+        }
+        sessionStorage.setItem('best_reflex', JSON.stringify(bestReflex));
+    }
+}
+
+function sanitizeMarkdownEmphasis(input) {
+    return input.replace(/\*\*(.*?)\*\*/g, '$1');
+}
+
+function appendChatMessage(role, text) {
+    const wrapper = document.createElement('div');
+    wrapper.className = `chat-message ${role}`;
+
+    const avatar = document.createElement('div');
+    avatar.className = 'chat-avatar';
+    avatar.textContent = role === 'bot' ? '🤖' : '🧑';
+
+    const bubble = document.createElement('div');
+    bubble.className = 'chat-bubble';
+    bubble.textContent = sanitizeMarkdownEmphasis(text);
+
+    if (role === 'user') {
+        wrapper.appendChild(bubble);
+        wrapper.appendChild(avatar);
+    } else {
+        wrapper.appendChild(avatar);
+        wrapper.appendChild(bubble);
+    }
+
+    chatMessages.appendChild(wrapper);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function setChatLoading(state) {
+    chatWaiting = state;
+    chatSendBtn.disabled = state;
+    chatSendBtn.textContent = state ? 'Đang trả lời...' : (chatDone ? 'Đã hoàn tất' : 'Gửi');
+}
+
+function stripFinalConclusion(text) {
+    const normalized = (text || '').toLowerCase();
+    const marker = 'kết luận cuối';
+    const idx = normalized.indexOf(marker);
+    if (idx === -1) return text || '';
+    return (text || '').slice(0, idx).trim();
+}
+
+async function sendChatMessage() {
+    if (chatWaiting) return;
+    if (chatDone) {
+        appendChatMessage('bot', 'Phần trò chuyện đã hoàn tất. Bạn có thể xem báo cáo hoặc gợi ý đại học nhé.');
+        return;
+    }
+    const message = chatInput.value.trim();
+    if (!message) return;
+
+    appendChatMessage('user', message);
+    chatInput.value = '';
+    setChatLoading(true);
+
+    try {
+        const response = await fetch('/chat', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message, student_info: studentInfo })
+        });
+        const data = await response.json();
+        if (data.error) {
+            appendChatMessage('bot', 'Xin lỗi, tôi chưa nhận được câu hỏi. Vui lòng thử lại nhé!');
+        } else {
+            const replyText = stripFinalConclusion(data.reply || '');
+            appendChatMessage('bot', replyText || data.reply || '');
+            if (data.characteristic_ready) {
+                characteristicReady = true;
+                if (characteristicStatusEl) {
+                    characteristicStatusEl.classList.remove('hidden');
+                }
+                checkAllDone();
+            }
+            const rawReplyText = data.reply || '';
+            if (data.chat_done || rawReplyText.toLowerCase().includes('kết luận cuối')) {
+                chatDone = true;
+                if (chatDoneBanner) {
+                    chatDoneBanner.classList.remove('hidden');
+                }
+                chatSendBtn.disabled = true;
+                chatSendBtn.textContent = 'Đã hoàn tất';
+            }
+        }
+    } catch (err) {
+        console.error(err);
+        appendChatMessage('bot', 'Có lỗi kết nối. Bạn thử lại sau nhé!');
+    } finally {
+        setChatLoading(false);
+    }
+}
+
+chatInput.addEventListener('keydown', (event) => {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        sendChatMessage();
+    }
+});
+
+setStep1Best(bestStep1);
+setReflexBest(reflexBestScore);
+if (characteristicReady && characteristicStatusEl) {
+    characteristicStatusEl.classList.remove('hidden');
+}
+if (chatDone && chatDoneBanner) {
+    chatDoneBanner.classList.remove('hidden');
+    chatSendBtn.disabled = true;
+    chatSendBtn.textContent = 'Đã hoàn tất';
+}
+checkAllDone();
+updateHomeLinkState();
+if (studentInfo) {
+    hideStudentInfoModal();
+} else {
+    showStudentInfoModal();
+}
@@ -0,0 +1,20 @@
+"""Fixtures for the unit tests.
+
+The environment is pinned before any app module is imported so tests never
+touch the real journal, results database, UDP port or a hosted model.
+
+    python -m pytest tests
+"""
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='wl-tests-')
+os.environ.update({
+    'JOURNAL_DIR': os.path.join(_scratch, 'journal'),
+    'RESULTS_DB_PATH': os.path.join(_scratch, 'results.db'),
+    'CAREER_SESSION_BACKEND': 'memory',
+    'CAREER_AGENT_MODEL': 'stub',
+    'TELEMETRY_UDP_PORT': '0',
+    'APP_DEFER_BACKGROUND_SERVICES': '1',
+    'LOG_LEVEL': 'WARNING',
+})
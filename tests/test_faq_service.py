@@ -0,0 +1,41 @@
+import pytest
+
+from service import faq_service
+
+
+@pytest.mark.parametrize('message, intent', [
+    ('Nhóm A là gì?', 'group_meaning'),
+    ('nhóm B có ý nghĩa gì?', 'group_meaning'),
+    ('Trò đập chuột chơi thế nào?', 'reflex_rules'),
+    ('Đập chuột có được chơi lại không?', 'reflex_rules'),
+    ('Đập chuột tính điểm thế nào?', 'reflex_rules'),
+    ('Độ chính xác của mô hình là bao nhiêu?', 'model_accuracy'),
+    ('Có mấy bước?', 'test_steps'),
+    ('Wire loop là gì?', 'wire_loop_rules'),
+    ('Xem báo cáo ở đâu?', 'report_access'),
+    ('DISC là gì?', 'disc_meaning'),
+])
+def test_procedural_questions_are_answered_locally(message, intent):
+    match = faq_service.lookup(message, accuracy=90)
+    assert match is not None and match.intent == intent
+
+
+@pytest.mark.parametrize('message', [
+    'Mình thuộc nhóm nào?',
+    'Em thuộc nhóm nào vậy?',
+    'Mình có hợp với nhóm A không?',
+    'Mình thích chơi đập chuột không?',
+    'Mình chơi đập chuột giỏi không?',
+    'Bạn có thích đập chuột không?',
+    'Mình cần làm gì tiếp theo để trở thành bác sĩ?',
+    'Mình nên làm gì tiếp theo?',
+    'Mình đoán đúng không?',
+])
+def test_questions_about_the_student_go_to_the_agent(message):
+    assert faq_service.lookup(message, accuracy=90) is None
+
+
+def test_every_example_names_its_topic():
+    for entry in faq_service.FAQ_ENTRIES:
+        for example in entry.examples:
+            assert faq_service.has_keyword(entry, example), (entry.intent, example)
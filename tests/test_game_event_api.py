@@ -0,0 +1,37 @@
+import pytest
+
+from service import game_service, results_store
+
+
+@pytest.fixture(scope='module')
+def client():
+    from app import app
+
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.mark.parametrize('errors', [10**12, -1])
+def test_out_of_range_errors_are_rejected(client, errors):
+    response = client.post('/api/game_event', json={
+        'event': 'update', 'device_id': 't-range', 'seq': 1, 'time': 1.0, 'errors': errors,
+    })
+    assert response.status_code == 400
+
+
+def test_browser_submission_keeps_the_station_features(client, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(results_store, 'record_run', lambda *args, **kwargs: recorded.append(kwargs))
+    game_service.mark_game_start('t-feat', 1)
+    game_service.update_game_state(2.0, 1, 't-feat', 2)
+    game_service.update_game_state(4.0, 3, 't-feat', 3)
+    game_service.finish_game_state(6.0, 3, 't-feat', 4)
+
+    response = client.post('/api/game_event', json={'event': 'finish', 'time': 6.0, 'errors': 3, 'station': 't-feat'})
+    assert response.status_code == 200
+    assert recorded[-1]['features'] == game_service.get_run_features('t-feat')
+    assert recorded[-1]['features']['gap_mean'] > 0
+
+    # Typed-in values that are not the station's run carry no telemetry.
+    client.post('/api/game_event', json={'event': 'finish', 'time': 5.0, 'errors': 3, 'station': 't-feat'})
+    assert recorded[-1]['features'] is None
@@ -0,0 +1,71 @@
+import pytest
+
+from service import game_service
+
+
+def _device(name):
+    return game_service.DeviceState(name)
+
+
+def test_updates_drop_stale_and_duplicate_seq():
+    state = _device('t-seq')
+    assert state.accept(1, reset=True)
+    assert state.accept(2)
+    assert not state.accept(2)
+    assert not state.accept(1)
+    assert state.accept(5)
+
+
+def test_posts_without_seq_are_always_accepted():
+    state = _device('t-noseq')
+    assert state.accept(7)
+    assert state.accept(None)
+    assert state.accept(None, reset=True)
+
+
+def test_start_with_lower_seq_is_a_reboot():
+    state = _device('t-reboot')
+    for seq in range(1, 40):
+        assert state.accept(seq, reset=seq == 1)
+    assert state.accept(1, reset=True)
+    assert state.accept(2)
+
+
+def test_duplicated_start_is_not_a_restart():
+    state = _device('t-dup')
+    assert state.accept(1, reset=True)
+    assert not state.accept(1, reset=True)
+    assert state.accept(2)
+    assert state.accept(3, reset=True)
+    assert not state.accept(3, reset=True)
+
+
+def test_duplicated_early_start_keeps_run_state():
+    device_id = 't-dup'
+    # The firmware sends start twice back to back.
+    assert game_service.mark_game_start(device_id, 1) is not None
+    assert game_service.mark_game_start(device_id, 1) is None
+    assert game_service.update_game_state(4.2, 1, device_id, 2) is not None
+    state = game_service.get_device(device_id)
+    assert (state.status, state.time, state.errors) == ('playing', 4.2, 1)
+
+
+@pytest.mark.parametrize('device_id', ['../etc', 'a b', 'x' * 9])
+def test_invalid_device_ids_are_refused(device_id):
+    with pytest.raises(ValueError):
+        game_service.mark_game_start(device_id, 1)
+    assert device_id not in game_service._devices
+
+
+def test_new_devices_are_capped(monkeypatch):
+    monkeypatch.setattr(game_service, 'MAX_DEVICES', len(game_service._devices) + 1)
+    game_service.mark_game_start('cap-a', 1)
+    with pytest.raises(ValueError):
+        game_service.touch_device('cap-b')
+    assert 'cap-b' not in game_service._devices
+    game_service.update_game_state(1.0, 0, 'cap-a', 2)  # known devices keep working
+
+
+def test_reading_an_unknown_device_does_not_register_it():
+    assert game_service.get_current_game_state('ghost')['status']
+    assert 'ghost' not in game_service._devices
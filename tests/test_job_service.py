@@ -0,0 +1,78 @@
+import time
+
+import gevent.queue
+import pytest
+
+from service import job_service, results_store
+from service.constants import STUDENT_ID_SESSION_KEY
+
+
+@pytest.fixture(scope='module')
+def client():
+    from app import app
+
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+def _finished_job(kind, owner, status='done'):
+    job = {
+        'id': f"t-{kind}-{owner}-{status}", 'kind': kind, 'owner': owner, 'status': status,
+        'result': {'ok': True}, 'error': None, 'created_at': time.time(),
+        'started_at': None, 'finished_at': None if status == 'queued' else time.time(),
+    }
+    job_service._jobs[job['id']] = job
+    return job
+
+
+def test_jobs_need_an_owner():
+    with pytest.raises(ValueError):
+        job_service.submit('final_report', None, lambda: None)
+
+
+def test_get_refuses_a_missing_owner():
+    job = _finished_job('final_report', 'hs-1')
+    assert job_service.get(job['id'], 'hs-1') is job
+    assert job_service.get(job['id'], None) is None
+    assert job_service.get(job['id'], 'hs-2') is None
+
+
+def test_workers_block_on_a_gevent_queue():
+    assert isinstance(job_service._queue, gevent.queue.Queue)
+
+
+def test_any_worker_answers_for_a_stored_job():
+    job = _finished_job('final_report', 'hs-4')
+    results_store.record_job(job)
+    assert results_store.flush()
+    del job_service._jobs[job['id']]  # as seen from a worker that did not run it
+
+    stored = job_service.get(job['id'], 'hs-4')
+    assert stored['status'] == 'done' and stored['result'] == {'ok': True}
+    assert job_service.get(job['id'], 'hs-5') is None
+
+
+def test_a_report_stored_by_a_job_completes_the_tests(client):
+    with client.session_transaction() as sess:
+        sess['access_granted'] = True
+        sess[STUDENT_ID_SESSION_KEY] = 'hs-6'
+        sess['tests_in_progress'] = True
+        sess['tests_completed'] = False
+        sess['tests_started_at'] = time.time() - 1
+    assert client.get('/home').status_code == 302  # still held on the test page
+
+    results_store.record_report('hs-6', {'full_name': 'HS'}, {'name': 'HS', 'source': 'llm'})
+    assert results_store.flush()
+    assert client.get('/home').status_code == 200
+
+
+def test_final_report_needs_a_student(client):
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess['access_granted'] = True
+        sess['student_info'] = {'name': 'HS'}
+        sess['chat_history'] = [{'role': 'user', 'content': 'xin chào'}]
+    response = client.post('/api/final_report', json={
+        'best_step1': {'time': 10.0, 'errors': 1}, 'best_reflex': {'time': 30, 'quantity': 12},
+    })
+    assert response.status_code == 400
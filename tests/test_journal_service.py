@@ -0,0 +1,55 @@
+import multiprocessing
+
+import pytest
+
+from service import journal_service
+from service.journal_service import DeviceJournal
+
+
+def _append_many(path, count):
+    journal = DeviceJournal(path, 'st01')
+    for index in range(count):
+        journal.append(float(index), 'update', seq=index, time_val=1.0, errors=0)
+    journal.close()
+
+
+def test_workers_share_one_record_count(tmp_path):
+    path = str(tmp_path / 'st01.wlj')
+    ctx = multiprocessing.get_context('fork')
+    workers = [ctx.Process(target=_append_many, args=(path, 500)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    journal = DeviceJournal(path)
+    assert journal.total == 1500
+    assert len(list(journal)) == 1500
+    journal.close()
+
+
+def test_a_journal_belongs_to_one_device(tmp_path):
+    path = str(tmp_path / 'st01.wlj')
+    DeviceJournal(path, 'st01').close()
+    with pytest.raises(ValueError):
+        DeviceJournal(path, 'st02')
+
+
+@pytest.mark.parametrize('device_id', ['a/b', 'a.b', '', 'x' * 9])
+def test_unsafe_ids_get_no_journal(device_id):
+    with pytest.raises(ValueError):
+        journal_service.get_journal(device_id)
+
+
+def test_replay_copies_of_similar_stations_stay_distinct(tmp_path):
+    from tools.replay_journal import merged_records
+
+    journals = []
+    for device_id in ('station1', 'station2'):
+        journal = DeviceJournal(str(tmp_path / f'{device_id}.wlj'), device_id)
+        journal.append(1.0, 'update', seq=1, time_val=1.0, errors=0)
+        journals.append(journal)
+    device_ids = [record.device_id for record in merged_records(journals, copies=12)]
+    for journal in journals:
+        journal.close()
+    assert len(set(device_ids)) == 24
+    assert all(len(device_id) <= 8 for device_id in device_ids)
@@ -0,0 +1,20 @@
+from service import report_service, results_store
+
+
+def test_progress_events_leave_the_report_out(tmp_path, monkeypatch):
+    student = {
+        'student_id': 'rp-1',
+        'profile': {'full_name': 'A', 'grade': '10', 'class_name': 'RP'},
+        'best_step1': 1.0,
+        'best_reflex': 1.0,
+    }
+    monkeypatch.setattr(results_store, 'class_results', lambda class_name, grade=None: [student])
+    monkeypatch.setattr(report_service, '_generate_one', lambda *_: {'source': 'local', 'summary': 'x' * 1000})
+
+    events = list(report_service.generate_class_reports('RP', '10', checkpoint=str(tmp_path / 'rp.jsonl')))
+
+    report_event = next(event for event in events if event['event'] == 'report')
+    assert report_event['status'] == 'done'
+    assert report_event['source'] == 'local'
+    assert 'report' not in report_event
+    assert report_service.read_checkpoint(str(tmp_path / 'rp.jsonl'))['rp-1']['summary'] == 'x' * 1000
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from career_counselor_chat.service import career_service
+from handler import api
+
+
+@pytest.mark.parametrize('attempt', [1, 2, 3, 10])
+def test_upgrade_backoff_grows_and_is_capped(attempt):
+    ceiling = min(api.REPORT_UPGRADE_POLL_SECONDS * 2 ** attempt, api.REPORT_UPGRADE_BACKOFF_MAX_SECONDS)
+    for _ in range(50):
+        assert ceiling / 2 <= api._upgrade_backoff(attempt) <= ceiling
+
+
+def test_invalid_report_input_does_not_degrade_the_service(monkeypatch):
+    monkeypatch.setattr(career_service, '_report_failed_at', 0.0)
+    with pytest.raises(ValueError):
+        asyncio.run(career_service.generate_final_report_async(student_profile={}, chat_history=[]))
+    with pytest.raises(ValueError):
+        asyncio.run(career_service.generate_final_report_async(student_profile={'name': 'HS'}, chat_history=[]))
+    assert not career_service.llm_degraded()
+    assert career_service._reports_inflight == 0
+
+
+def test_agent_failures_start_the_cooldown(monkeypatch):
+    async def failing(**kwargs):
+        raise RuntimeError("agent unavailable")
+
+    monkeypatch.setattr(career_service, '_report_failed_at', 0.0)
+    monkeypatch.setattr(career_service, '_generate_career_summary_async', failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(career_service.generate_final_report_async(
+            student_profile={'name': 'HS'}, chat_history=[{'role': 'user', 'content': 'xin chào'}],
+        ))
+    assert career_service.llm_degraded()
@@ -0,0 +1,35 @@
+import pytest
+
+from service import results_store
+
+
+@pytest.fixture(scope='module')
+def client():
+    from app import app
+
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+def test_a_failing_write_does_not_drop_its_batch():
+    results_store.save_student('rs-1', {'full_name': 'A', 'grade': '10', 'class_name': 'RS'})
+    results_store._enqueue("INSERT INTO no_such_table VALUES (?)", (1,))
+    results_store.save_student('rs-2', {'full_name': 'B', 'grade': '10', 'class_name': 'RS'})
+    assert results_store.flush()
+    names = {row[1] for row in results_store.iter_rows('students', class_name='RS')}
+    assert names == {'A', 'B'}
+
+
+@pytest.mark.parametrize('path', ['/api/admin/export/reports.csv', '/api/admin/stats?grade=10'])
+def test_exports_and_stats_need_the_admin_key(client, monkeypatch, path):
+    monkeypatch.setitem(client.application.config, 'ADMIN_KEY', 'secret')
+    with client.session_transaction() as sess:
+        sess['access_granted'] = True  # the classroom key alone is not enough
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'X-Admin-Key': 'secret'}).status_code == 200
+
+
+def test_old_export_path_is_gone(client):
+    with client.session_transaction() as sess:
+        sess['access_granted'] = True
+    assert client.get('/api/export/reports.csv').status_code == 404
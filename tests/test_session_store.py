@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+from google.adk.sessions import InMemorySessionService
+
+from career_counselor_chat import session_store
+
+
+def test_sqlite_backend_uses_the_async_driver(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, 'SESSION_DB_PATH', str(tmp_path / 'sessions.db'))
+    monkeypatch.setattr(session_store, 'SESSION_DB_URL', '')
+    monkeypatch.setattr(session_store, '_prune_path', None)
+    service = session_store.build_session_service('sqlite')
+    assert not isinstance(service, InMemorySessionService)
+
+    async def roundtrip():
+        session = await service.create_session(app_name='agents', user_id='hs-1')
+        return await service.get_session(app_name='agents', user_id='hs-1', session_id=session.id)
+
+    assert asyncio.run(roundtrip()) is not None
+
+
+def test_plain_sqlite_urls_get_the_async_driver():
+    assert session_store._async_url('sqlite:///a.db') == 'sqlite+aiosqlite:///a.db'
+    assert session_store._async_url('sqlite+aiosqlite:///a.db') == 'sqlite+aiosqlite:///a.db'
+    assert session_store._async_url('postgresql+asyncpg://h/db') == 'postgresql+asyncpg://h/db'
+
+
+def test_memory_fallback_is_logged_as_an_error(monkeypatch, caplog):
+    monkeypatch.setattr(session_store, 'SESSION_DB_URL', 'nosuchdriver://nowhere')
+    with caplog.at_level(logging.WARNING, logger=session_store.logger.name):
+        service = session_store.build_session_service('database')
+    assert isinstance(service, InMemorySessionService)
+    assert any(record.levelno >= logging.ERROR for record in caplog.records)
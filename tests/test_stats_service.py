@@ -0,0 +1,39 @@
+import pytest
+
+from service import stats_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_aggregates(monkeypatch):
+    monkeypatch.setattr(stats_service, '_aggregates', {})
+    monkeypatch.setattr(stats_service, '_student_values', {})
+    monkeypatch.setattr(stats_service, '_warmed', True)
+
+
+def test_same_class_name_in_two_grades_is_two_classes():
+    stats_service.observe_reflex('hs-10', {'grade': '10', 'class_name': 'A1'}, 10)
+    stats_service.observe_reflex('hs-11', {'grade': '11', 'class_name': 'A1'}, 30)
+
+    tenth = stats_service.get_summary(grade='10', class_name='A1')
+    eleventh = stats_service.get_summary(grade='11', class_name='A1')
+    assert tenth[stats_service.REFLEX_QUANTITY]['count'] == 1
+    assert eleventh[stats_service.REFLEX_QUANTITY]['count'] == 1
+
+    ranks = stats_service.get_ranks('hs-11', {'grade': '11', 'class_name': 'A1'})
+    assert ranks['class']['name'] == 'A1'
+    assert ranks['class']['count'] == 1
+
+
+def test_a_class_without_its_grade_is_rejected():
+    stats_service.observe_reflex('hs-10', {'grade': '10', 'class_name': 'A1'}, 10)
+    with pytest.raises(ValueError):
+        stats_service.get_summary(class_name='A1')
+
+
+def test_admin_stats_answers_400_without_a_grade(monkeypatch):
+    from app import app
+
+    monkeypatch.setitem(app.config, 'ADMIN_KEY', 'secret')
+    response = app.test_client().get('/api/admin/stats?class_name=A1', headers={'X-Admin-Key': 'secret'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'grade is required'}
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from service.telemetry_features import BURST_GAP_SECONDS, RunFeatures
+
+
+class _ReferenceFeatures(RunFeatures):
+    """The original per-error loop, kept as the oracle for the closed form."""
+
+    def observe(self, time_val, errors_val):
+        if time_val < self.time:
+            return
+        new_errors = errors_val - self.errors
+        if new_errors > 0:
+            step = (time_val - self.time) / new_errors
+            for idx in range(new_errors):
+                error_time = self.time + step * (idx + 1)
+                self.longest_clean = max(self.longest_clean, error_time - self.last_error_time)
+                if self.errors + idx > 0:
+                    self._add_gaps(error_time - self.last_error_time, 1)
+                self.last_error_time = error_time
+            self.errors = errors_val
+        else:
+            self.longest_clean = max(self.longest_clean, time_val - self.last_error_time)
+        self.time = time_val
+
+
+SAMPLES = [(0.2, 0), (1.0, 1), (1.4, 1), (2.0, 4), (2.2, 5), (5.0, 5), (5.5, 9), (9.0, 9), (9.2, 30)]
+
+
+def test_closed_form_matches_per_error_loop():
+    fast, reference = RunFeatures(), _ReferenceFeatures()
+    for time_val, errors_val in SAMPLES:
+        fast.observe(time_val, errors_val)
+        reference.observe(time_val, errors_val)
+    expected = reference.as_dict()
+    got = fast.as_dict()
+    assert got['burst_count'] == expected['burst_count']
+    for name in ('error_rate', 'gap_mean', 'gap_variance', 'longest_clean'):
+        assert got[name] == pytest.approx(expected[name], abs=1e-3)
+
+
+def test_longest_clean_ends_at_the_first_new_error():
+    # (time, errors, longest clean stretch so far), worked out by hand.
+    steps = [
+        (1.0, 0, 1.0),
+        (5.0, 4, 2.0),  # errors spread over 1..5 land at 2, 3, 4, 5: clean 0..2
+        (6.0, 4, 2.0),
+        (9.0, 5, 4.0),  # one error over 6..9 lands at 9: clean 5..9
+        (9.5, 5, 4.0),
+    ]
+    features, reference = RunFeatures(), _ReferenceFeatures()
+    for time_val, errors_val, longest_clean in steps:
+        features.observe(time_val, errors_val)
+        reference.observe(time_val, errors_val)
+        assert features.longest_clean == pytest.approx(longest_clean)
+        assert reference.longest_clean == pytest.approx(longest_clean)
+
+
+def test_huge_error_jump_is_constant_time():
+    features = RunFeatures()
+    started = time.perf_counter()
+    features.observe(10.0, 10**12)
+    assert time.perf_counter() - started < 0.01
+    assert features.as_dict()['burst_count'] == 1
+    assert features.gap_mean <= BURST_GAP_SECONDS
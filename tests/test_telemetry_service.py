@@ -0,0 +1,80 @@
+import struct
+
+import pytest
+
+from service import game_service, telemetry_service
+from service.telemetry_service import Frame
+
+
+def _send(*frames):
+    telemetry_service.handle_datagram(telemetry_service.encode_frames(frames))
+
+
+def _play_run(device_id, boot, first_seq):
+    _send(Frame('start', device_id, first_seq, 0.0, 0, boot))
+    _send(Frame('update', device_id, first_seq + 1, 3.5, 1, boot))
+
+
+def test_frames_round_trip():
+    frames = [Frame('start', 'st01', 1, 0.0, 0, 77), Frame('update', 'st01', 2, 1.5, 2, 77)]
+    assert telemetry_service.decode_frames(telemetry_service.encode_frames(frames)) == frames
+
+
+def test_version_1_frames_are_still_decoded():
+    v1 = telemetry_service.FRAME_V1.pack(1, telemetry_service.EVENT_UPDATE, b'st01', 9, 2.0, 3)
+    data = telemetry_service.HEADER.pack(telemetry_service.MAGIC, 1) + v1
+    assert telemetry_service.decode_frames(data) == [Frame('update', 'st01', 9, 2.0, 3, 0)]
+
+
+def test_reboot_then_idle_heartbeats_then_start():
+    device_id = 't-boot'
+    _play_run(device_id, boot=101, first_seq=1)
+    for seq in range(3, 60):
+        _send(Frame('update', device_id, seq, seq / 5, 1, 101))
+    # Reboot: new nonce, seq counts from 0 again and the station idles for a while.
+    for _ in range(10):
+        _send(Frame('heartbeat', device_id, 0, 0.0, 0, 202))
+    _send(Frame('start', device_id, 1, 0.0, 0, 202))
+    _send(Frame('update', device_id, 2, 0.8, 0, 202))
+    state = game_service.get_device(device_id)
+    assert (state.status, state.seq, state.boot) == ('playing', 2, 202)
+    assert state.time == pytest.approx(0.8)
+
+
+def test_reboot_without_nonce_after_idle_heartbeats():
+    # Older firmware: no nonce, heartbeats must not push the start out of the restart window.
+    device_id = 't-bootv1'
+    _play_run(device_id, boot=0, first_seq=1)
+    for seq in range(3, 60):
+        _send(Frame('update', device_id, seq, seq / 5, 1))
+    for _ in range(10):
+        _send(Frame('heartbeat', device_id, 0, 0.0, 0))
+    _send(Frame('start', device_id, 1, 0.0, 0))
+    assert game_service.get_device(device_id).status == 'playing'
+    assert game_service.get_device(device_id).seq == 1
+
+
+def test_stale_frames_within_a_boot_are_dropped():
+    device_id = 't-stale'
+    _play_run(device_id, boot=5, first_seq=1)
+    before = telemetry_service.get_metrics()['stale_frames']
+    _send(Frame('update', device_id, 1, 9.9, 9, 5))
+    assert telemetry_service.get_metrics()['stale_frames'] == before + 1
+    assert game_service.get_device(device_id).time == 3.5
+
+
+def test_malformed_datagram_is_counted():
+    before = telemetry_service.get_metrics()['malformed_datagrams']
+    telemetry_service.handle_datagram(struct.pack('<2sB', b'WL', 2) + b'\x02' * 5)
+    assert telemetry_service.get_metrics()['malformed_datagrams'] == before + 1
+
+
+def test_new_boot_nonce_restarts_at_the_same_seq():
+    # Without a nonce this start would be a duplicate of the pre-reboot one.
+    device_id = 't-nonce'
+    _send(Frame('start', device_id, 1, 0.0, 0, 11))
+    _send(Frame('finish', device_id, 2, 7.0, 1, 11))
+    _send(Frame('start', device_id, 1, 0.0, 0, 12))
+    _send(Frame('finish', device_id, 2, 9.0, 0, 12))
+    state = game_service.get_device(device_id)
+    assert (state.status, state.errors, state.boot) == ('finished', 0, 12)
@@ -0,0 +1,260 @@
+"""Build self-hosted, fingerprinted, precompressed static assets.
+
+Usage:
+    pip install -r requirements-build.txt
+    python -m tools.build_assets            # needs network for fonts/socket.io
+    python -m tools.build_assets --offline  # CSS, JS and images only
+
+Writes ``static/dist/`` (restart the server afterwards to pick up the new
+manifest):
+
+* ``css/app.<hash>.css``: Tailwind v3 purged against templates/ and
+  static/js/, plus self-hosted Inter @font-face rules. Needs the Tailwind
+  CLI: ``$TAILWIND_BIN``, ``tailwindcss`` on PATH, or ``npx tailwindcss@3``.
+* ``fonts/``: Inter woff2 subsets (latin, latin-ext, vietnamese).
+* ``vendor/socket.io.<hash>.min.js``: pinned socket.io client.
+* ``js/*.<hash>.js``: minified page scripts from static/js/ (rjsmin).
+* ``img/``: AVIF/WebP at several widths plus a re-encoded JPEG fallback.
+* ``*.gz`` / ``*.br`` next to every text asset.
+* ``manifest.json`` mapping logical static paths to the hashed files,
+  read by handler/assets.py.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+from service.constants import ASSET_MANIFEST_FILE, SOCKETIO_CLIENT_VERSION, STATIC_DIST_DIR
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, 'static')
+JS_DIR = os.path.join(STATIC_DIR, 'js')
+IMG_DIR = os.path.join(STATIC_DIR, 'img')
+TAILWIND_CONFIG = os.path.join(ROOT, 'tools', 'tailwind.config.js')
+
+FONT_CSS_URL = 'https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700;800&display=swap'
+FONT_SUBSETS = ('vietnamese', 'latin-ext', 'latin')
+PRELOAD_FONT_SUBSETS = ('latin', 'vietnamese')
+SOCKETIO_URL = f'https://cdn.socket.io/{SOCKETIO_CLIENT_VERSION}/socket.io.min.js'
+# Google Fonts only serves woff2 with unicode-range subsets to modern agents.
+_BROWSER_UA = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+IMAGE_WIDTHS = (480, 960, 1600)
+WEBP_QUALITY = 78
+AVIF_QUALITY = 55
+JPEG_QUALITY = 82
+HASH_LENGTH = 10
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg')
+
+
+class BuildError(RuntimeError):
+    pass
+
+
+class AssetWriter:
+    """Writes content-hashed files (and .gz/.br siblings) under the dist dir."""
+
+    def __init__(self, dist_dir: str):
+        self.dist_dir = dist_dir
+        self.bytes_out = 0
+
+    def write(self, subdir: str, stem: str, ext: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        name = f"{stem}.{digest}{ext}"
+        folder = os.path.join(self.dist_dir, subdir)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as handle:
+            handle.write(data)
+        self.bytes_out += len(data)
+        if ext in COMPRESSIBLE:
+            self._precompress(path, data)
+        return f"{STATIC_DIST_DIR}/{subdir}/{name}"
+
+    def _precompress(self, path: str, data: bytes):
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as handle:
+                    handle.write(compressed)
+
+
+def _fetch(url: str) -> bytes:
+    request = urllib.request.Request(url, headers={'User-Agent': _BROWSER_UA})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def build_fonts(writer: AssetWriter):
+    """Download Inter subsets; returns (@font-face css, preload paths)."""
+    css = _fetch(FONT_CSS_URL).decode('utf-8')
+    blocks = re.findall(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*{[^}]*})', css)
+    downloaded = {}
+    preload = []
+    rules = []
+    for subset, block in blocks:
+        if subset not in FONT_SUBSETS:
+            continue
+        url = re.search(r'url\((https://[^)]+)\)', block).group(1)
+        if url not in downloaded:
+            path = writer.write('fonts', f'inter-{subset}', '.woff2', _fetch(url))
+            downloaded[url] = path
+            if subset in PRELOAD_FONT_SUBSETS:
+                preload.append(path)
+        relative = '../fonts/' + downloaded[url].rsplit('/', 1)[1]
+        rules.append(block.replace(url, relative))
+    if not rules:
+        raise BuildError(f"no Inter subsets found in {FONT_CSS_URL}")
+    return '\n'.join(rules), preload
+
+
+def _tailwind_command():
+    binary = os.environ.get('TAILWIND_BIN') or shutil.which('tailwindcss')
+    if binary:
+        return [binary]
+    if shutil.which('npx'):
+        return ['npx', '--yes', 'tailwindcss@3']
+    raise BuildError("Tailwind CLI not found; set TAILWIND_BIN or install tailwindcss v3")
+
+
+def build_css(font_css: str) -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'input.css')
+        output = os.path.join(tmp, 'app.css')
+        with open(source, 'w', encoding='utf-8') as handle:
+            handle.write('@tailwind base;\n@tailwind components;\n@tailwind utilities;\n')
+        subprocess.run(
+            [*_tailwind_command(), '-c', TAILWIND_CONFIG, '-i', source, '-o', output, '--minify'],
+            cwd=ROOT,
+            check=True,
+        )
+        with open(output, 'rb') as handle:
+            css = handle.read()
+    return (font_css.encode('utf-8') + b'\n' + css) if font_css else css
+
+
+def minify_js(source: str) -> str:
+    try:
+        import rjsmin
+    except ImportError:
+        print("rjsmin not installed; page scripts are fingerprinted but not minified", file=sys.stderr)
+        return source
+    return rjsmin.jsmin(source)
+
+
+def build_scripts(writer: AssetWriter, files: dict):
+    for name in sorted(os.listdir(JS_DIR)):
+        if not name.endswith('.js'):
+            continue
+        with open(os.path.join(JS_DIR, name), encoding='utf-8') as handle:
+            source = handle.read()
+        minified = minify_js(source).encode('utf-8')
+        files[f'js/{name}'] = writer.write('js', name[:-3], '.js', minified)
+
+
+def _avif_supported(image_module) -> bool:
+    try:
+        import pillow_avif  # noqa: F401  (registers the plugin on older Pillow)
+    except ImportError:
+        pass
+    image_module.init()
+    return 'AVIF' in image_module.SAVE
+
+
+def build_images(writer: AssetWriter, files: dict, images: dict):
+    from PIL import Image, ImageOps
+
+    formats = [('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6})]
+    if _avif_supported(Image):
+        formats.insert(0, ('avif', 'AVIF', {'quality': AVIF_QUALITY}))
+    else:
+        print("Pillow has no AVIF encoder; emitting WebP only", file=sys.stderr)
+
+    for name in sorted(os.listdir(IMG_DIR)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in ('.jpg', '.jpeg', '.png'):
+            continue
+        path = os.path.join(IMG_DIR, name)
+        with Image.open(path) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+        widths = [width for width in IMAGE_WIDTHS if width < image.width] or [image.width]
+        if image.width <= IMAGE_WIDTHS[-1] and image.width not in widths:
+            widths.append(image.width)
+
+        def resized(width):
+            if width >= image.width:
+                return image
+            height = round(image.height * width / image.width)
+            return image.resize((width, height), Image.LANCZOS)
+
+        sources = {}
+        for fmt, pil_format, options in formats:
+            variants = []
+            for width in widths:
+                buffer = io.BytesIO()
+                resized(width).save(buffer, pil_format, **options)
+                variants.append([width, writer.write('img', f'{stem}-{width}', f'.{fmt}', buffer.getvalue())])
+            sources[fmt] = variants
+
+        buffer = io.BytesIO()
+        resized(widths[-1]).save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        fallback = writer.write('img', stem, '.jpg', buffer.getvalue())
+        logical = f'img/{name}'
+        files[logical] = fallback
+        largest = resized(widths[-1])
+        images[logical] = {'width': largest.width, 'height': largest.height, 'sources': sources}
+
+
+def build(offline: bool = False, dist_dir: str = None):
+    dist_dir = dist_dir or os.path.join(STATIC_DIR, STATIC_DIST_DIR)
+    staging = dist_dir + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    writer = AssetWriter(staging)
+    files, images, preload = {}, {}, []
+
+    font_css = ''
+    if not offline:
+        font_css, preload = build_fonts(writer)
+        files['vendor/socket.io.min.js'] = writer.write(
+            'vendor', 'socket.io', '.min.js', _fetch(SOCKETIO_URL)
+        )
+    files['css/app.css'] = writer.write('css', 'app', '.css', build_css(font_css))
+    build_scripts(writer, files)
+    build_images(writer, files, images)
+
+    manifest = {'version': 1, 'files': files, 'images': images, 'preload_fonts': preload}
+    with open(os.path.join(staging, ASSET_MANIFEST_FILE), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.replace(staging, dist_dir)
+    return manifest, writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--offline', action='store_true', help='skip downloading fonts and the socket.io client')
+    args = parser.parse_args(argv)
+    try:
+        manifest, writer = build(offline=args.offline)
+    except (BuildError, subprocess.CalledProcessError, OSError) as exc:
+        parser.exit(1, f"asset build failed: {exc}\n")
+    print(f"built {len(manifest['files'])} assets and {len(manifest['images'])} responsive images "
+          f"({writer.bytes_out / 1024:.0f} KiB before precompression) into static/{STATIC_DIST_DIR}/")
+
+
+if __name__ == '__main__':
+    main()
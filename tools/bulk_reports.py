@@ -0,0 +1,49 @@
+"""Generate final reports for a whole class from the stored results.
+
+Usage:
+    python -m tools.bulk_reports 11A2 --grade 11 --concurrency 4 --rpm 30
+    python -m tools.bulk_reports 11A2 --checkpoint out/11A2.jsonl > progress.ndjson
+
+Runs in this process against the results database (``RESULTS_DB_PATH``)
+and the configured agent model, like ``POST /api/admin/reports/bulk``.
+Progress events go to stdout as NDJSON. Reports are appended to the
+checkpoint (default ``$BULK_REPORT_DIR/<grade>-<class>.jsonl``). Rerunning
+after a crash or Ctrl-C only generates the students missing from it.
+Delete the checkpoint to regenerate everything. The exit status is 1 when
+any report failed.
+"""
+import argparse
+import json
+import sys
+
+from service import report_service
+from service.constants import BULK_REPORT_CONCURRENCY, BULK_REPORT_RPM, REPORT_LLM_TIMEOUT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('class_name')
+    parser.add_argument('--grade')
+    parser.add_argument('--concurrency', type=int, default=BULK_REPORT_CONCURRENCY)
+    parser.add_argument('--rpm', type=float, default=BULK_REPORT_RPM, help='report starts per minute; 0 = no limit')
+    parser.add_argument('--timeout', type=float, default=REPORT_LLM_TIMEOUT, help='seconds per report attempt')
+    parser.add_argument('--checkpoint')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for event in report_service.generate_class_reports(
+        args.class_name,
+        args.grade,
+        concurrency=max(1, args.concurrency),
+        rate_per_minute=args.rpm,
+        checkpoint=args.checkpoint,
+        timeout=args.timeout,
+    ):
+        if event['event'] == 'end':
+            failed = event['failed']
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Replay recorded device journals against a running server.
+
+Usage:
+    python -m tools.replay_journal journal/ --target http://localhost:5000
+    python -m tools.replay_journal journal/ --target udp://localhost:5005 --speed 10 --copies 8
+
+Records from every ``*.wlj`` file in the directory are merged by timestamp
+and re-sent with their original spacing divided by ``--speed`` (0 sends as
+fast as possible). ``--copies`` fans each station out to N virtual stations
+(``st01`` -> ``st01-1``, ``st01-2`` ...) to turn one classroom into load. Copy
+numbers run across all journals and long ids are cut to fit the 8-char limit.
+"""
+import argparse
+import heapq
+import http.client
+import json
+import socket
+import time
+from urllib.parse import urlparse
+
+from service import journal_service, telemetry_service
+
+
+class HttpSink:
+    """Posts to /api/game_event over one keep-alive connection."""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self._conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+        self._path = (parsed.path.rstrip('/') or '') + '/api/game_event'
+
+    def send(self, record):
+        body = json.dumps({
+            'event': record.event,
+            'device_id': record.device_id,
+            'seq': record.seq,
+            'time': round(record.time, 3),
+            'errors': record.errors,
+        })
+        self._conn.request('POST', self._path, body, {'Content-Type': 'application/json'})
+        response = self._conn.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self._conn.close()
+
+
+class UdpSink:
+    """Sends one telemetry frame per datagram to the UDP listener."""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self._addr = (parsed.hostname, parsed.port or 5005)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, record):
+        frame = telemetry_service.Frame(
+            record.event,
+            record.device_id,
+            record.seq or 0,
+            record.time,
+            record.errors,
+        )
+        self._sock.sendto(telemetry_service.encode_frames([frame]), self._addr)
+        return 0
+
+    def close(self):
+        self._sock.close()
+
+
+def build_sink(target: str):
+    scheme = urlparse(target).scheme
+    if scheme in ('http', 'https'):
+        return HttpSink(target)
+    if scheme == 'udp':
+        return UdpSink(target)
+    raise ValueError(f"Unsupported target: {target}")
+
+
+def _copy_device_id(device_id: str, copy: int) -> str:
+    # Device ids are at most 8 chars. ``copy`` is unique per replay and holds no
+    # '-', so the last '-' always starts the suffix and no two copies collide.
+    suffix = f"-{copy}"
+    if len(suffix) >= 8:
+        raise ValueError(f"too many copies for 8-char device ids: {copy}")
+    return device_id[:8 - len(suffix)] + suffix
+
+
+def merged_records(journals, copies: int = 1):
+    streams = []
+    copy = 0
+    for journal in journals:
+        records = list(journal)
+        if copies <= 1:
+            streams.append(records)
+            continue
+        for _ in range(copies):
+            copy += 1
+            device_id = _copy_device_id(journal.device_id, copy)
+            streams.append([record._replace(device_id=device_id) for record in records])
+    return heapq.merge(*streams, key=lambda record: record.timestamp)
+
+
+def replay(records, sink, speed: float = 1.0, on_sent=None):
+    """Send ``records`` to ``sink`` honouring their recorded spacing / ``speed``."""
+    sent = 0
+    origin = None
+    started = time.monotonic()
+    for record in records:
+        if origin is None:
+            origin = record.timestamp
+        if speed > 0:
+            delay = (record.timestamp - origin) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        status = sink.send(record)
+        sent += 1
+        if on_sent is not None:
+            on_sent(record, status)
+    return sent, time.monotonic() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('journal_dir')
+    parser.add_argument('--target', default='http://localhost:5000')
+    parser.add_argument('--speed', type=float, default=1.0, help='time compression factor; 0 = no delays')
+    parser.add_argument('--copies', type=int, default=1, help='virtual stations per recorded station')
+    parser.add_argument('--include-heartbeats', action='store_true')
+    parser.add_argument('--seq-base', type=int, default=None,
+                        help='added to recorded seqs (default: current unix time)')
+    args = parser.parse_args(argv)
+
+    journals = journal_service.open_journal_dir(args.journal_dir)
+    if not journals:
+        parser.error(f"no *.wlj journals in {args.journal_dir}")
+    records = merged_records(journals, args.copies)
+    # Recorded seqs are lower than what the server has already seen for these
+    # stations; shift them above anything earlier while keeping their order.
+    seq_base = int(time.time()) if args.seq_base is None else args.seq_base
+    records = (
+        record._replace(seq=None if record.seq is None else (seq_base + record.seq) & 0xFFFFFFFF)
+        for record in records
+    )
+    if not args.include_heartbeats:
+        records = (record for record in records if record.event != 'heartbeat')
+
+    sink = build_sink(args.target)
+    failures = 0
+
+    def count_failures(_record, status):
+        nonlocal failures
+        if status >= 400:
+            failures += 1
+
+    try:
+        sent, elapsed = replay(records, sink, args.speed, count_failures)
+    finally:
+        sink.close()
+        for journal in journals:
+            journal.close()
+    rate = sent / elapsed if elapsed else 0.0
+    print(f"replayed {sent} events from {len(journals)} journal(s) in {elapsed:.2f}s "
+          f"({rate:.0f} events/s, {failures} failed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Generate a synthetic training dataset shaped like ``career_data.csv``.
+
+Usage:
+    python -m tools.synth_dataset 1000000 --csv synth_1m.csv
+    python -m tools.synth_dataset 10000000 --store synth_10m_store --seed 7
+
+The generator is fitted to a source CSV (``DATA_FILE`` by default). It
+keeps the share of each ``Group``, the per-group mean and covariance of
+``Time``/``Errors``/``Score``, their per-group ranges and integer support,
+and the per-group ``Career`` frequencies. Rows are drawn from a
+multivariate normal per group, then rounded and clipped. Output goes to a
+CSV (the pandas training path), a training store (``service.training_store``),
+or both. Rows are produced in chunks, so 10^7 rows fit in modest memory.
+The same seed gives the same rows.
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from service import training_store
+from service.constants import DATA_FILE
+
+FEATURES = ['Time', 'Errors', 'Score']
+CHUNK_ROWS = 1_000_000
+
+
+def fit_profile(path: str = DATA_FILE) -> dict:
+    """Per-group statistics of a training CSV."""
+    df = pd.read_csv(path)
+    profile = {}
+    for group, rows in df.groupby('Group'):
+        values = rows[FEATURES].to_numpy(dtype=np.float64)
+        careers = rows['Career'].value_counts(normalize=True) if 'Career' in rows else pd.Series(dtype=float)
+        profile[str(group)] = {
+            'share': len(rows) / len(df),
+            'mean': values.mean(axis=0),
+            'cov': np.cov(values, rowvar=False),
+            'min': values.min(axis=0),
+            'max': values.max(axis=0),
+            'careers': list(careers.index),
+            'career_p': careers.to_numpy(),
+        }
+    return profile
+
+
+def generate(profile: dict, rows: int, *, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+    """Yield DataFrames of at most ``chunk_rows`` rows, ``rows`` in total."""
+    rng = np.random.default_rng(seed)
+    groups = list(profile)
+    shares = np.array([profile[group]['share'] for group in groups])
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        counts = rng.multinomial(size, shares / shares.sum())
+        parts = []
+        for group, count in zip(groups, counts):
+            if not count:
+                continue
+            stats = profile[group]
+            values = rng.multivariate_normal(stats['mean'], stats['cov'], size=count, method='eigh')
+            values = np.clip(np.rint(values), stats['min'], stats['max']).astype(np.int64)
+            part = pd.DataFrame(values, columns=FEATURES)
+            part['Group'] = group
+            if stats['careers']:
+                part['Career'] = rng.choice(stats['careers'], size=count, p=stats['career_p'])
+            parts.append(part)
+        chunk = pd.concat(parts, ignore_index=True)
+        # Shuffle so groups are interleaved like real, session-ordered data.
+        yield chunk.iloc[rng.permutation(len(chunk))].reset_index(drop=True)
+
+
+def write(chunks, *, csv_path=None, store_dir=None) -> int:
+    """Write chunks to a CSV and/or a new training store; returns the row count."""
+    if store_dir:
+        training_store.create([], store_dir)
+    rows = 0
+    for index, chunk in enumerate(chunks):
+        if csv_path:
+            chunk.to_csv(csv_path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        if store_dir:
+            training_store.append({column: chunk[column].to_numpy() for column in FEATURES + ['Group']}, store_dir)
+        rows += len(chunk)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--source', default=DATA_FILE, help='CSV the statistics are fitted to')
+    parser.add_argument('--csv', help='write the rows to this CSV')
+    parser.add_argument('--store', help='write the rows to a new training store in this directory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not args.csv and not args.store:
+        parser.error('give --csv, --store or both')
+    rows = write(generate(fit_profile(args.source), args.rows, seed=args.seed), csv_path=args.csv, store_dir=args.store)
+    print(f"wrote {rows} rows")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+// Tailwind v3 config for tools/build_assets.py. Paths are relative to the
+// repo root (the build runs the CLI from there).
+module.exports = {
+  content: ['./templates/**/*.html', './static/js/**/*.js'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
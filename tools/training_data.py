@@ -0,0 +1,48 @@
+"""Manage the columnar training store the model is trained from.
+
+Usage:
+    python -m tools.training_data import career_data.csv
+    python -m tools.training_data append new_rows.csv
+    python -m tools.training_data info
+
+``import`` creates the store (``TRAINING_STORE_DIR``) from a training CSV,
+once. ``append`` adds the rows of a CSV with the same columns to an
+existing store. Unknown ``Group`` labels become new categories. Extra columns
+such as ``Career`` are ignored. Once a store exists, ``model_service`` trains
+from it instead of ``DATA_FILE``. Retrain the server (or restart it) to pick
+up appended rows.
+"""
+import argparse
+import json
+import sys
+
+from service import training_store
+from service.constants import TRAINING_STORE_DIR
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('import', 'append', 'info'))
+    parser.add_argument('csv', nargs='?')
+    parser.add_argument('--dir', default=TRAINING_STORE_DIR, help='store directory')
+    args = parser.parse_args(argv)
+
+    if args.command != 'info' and not args.csv:
+        parser.error(f"{args.command} needs a CSV file")
+    if args.command == 'import':
+        rows = training_store.import_csv(args.csv, args.dir)
+        print(f"imported {rows} rows into {args.dir}")
+    elif args.command == 'append':
+        if not training_store.exists(args.dir):
+            parser.error(f"no training store in {args.dir}; run import first")
+        rows = training_store.append_csv(args.csv, args.dir)
+        print(f"{args.dir} now holds {rows} rows")
+    else:
+        if not training_store.exists(args.dir):
+            parser.error(f"no training store in {args.dir}")
+        print(json.dumps(training_store.read_meta(args.dir), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())